@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+
+benchmark_stream
+-------
+Script to measure the speed and memory usage of the stream tools. Synthetic stream files of several sizes are
+generated (always the same for the same settings), and parsing, get_stream_summary, get_cell_stats,
+save_random_indexed_images and save_random_indexed_crystals are timed on them. Every operation is run in a separate
+process to measure its peak memory. The results can be saved and compared with an earlier run.
+
+Usage and example
+-------
+To get the help message:
+python benchmark_stream.py -h
+
+To run the benchmark on stream files with 1000 and 10000 chunks and save the results as baseline:
+python benchmark_stream.py -s 1000 10000 -o baseline.json
+
+To run the same benchmark after a code change and compare with the baseline:
+python benchmark_stream.py -s 1000 10000 -b baseline.json
+
+To only generate a synthetic stream file with 5000 chunks and 3 crystals per indexed frame:
+python benchmark_stream.py -g synthetic.stream -s 5000 --crystals 3
+
+"""
+import os
+import sys
+import argparse
+from stream import benchmark
+from stream import synthetic
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = 'Benchmark the stream tools on synthetic stream files')
+
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 10000], help='Number of chunks of the synthetic stream files. Default 1000 10000.')
+    parser.add_argument('-c', '--cases', type=str, nargs='+', default=list(benchmark.CASES), help='Operations to time. Default: all ({:s}).'.format(', '.join(benchmark.CASES)))
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Number of times every operation is run, the best time is kept. Default 1.')
+    parser.add_argument('-d', '--work_dir', type=str, default='.', help='Directory for the synthetic and output stream files. Default the current directory.')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Save the results to this json file, e.g. to be used as baseline.')
+    parser.add_argument('-b', '--baseline', type=str, default=None, help='Compare the results with those of an earlier run, saved with -o.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change in time from which an operation is reported as slower or faster. Default 0.1 (10%%).')
+    parser.add_argument('-k', '--keep_streams', action='store_true', help='Keep the synthetic stream files, and reuse them in a next run.')
+    parser.add_argument('-g', '--generate', type=str, default=None, help='Only write a synthetic stream file with this name (with the first size as number of chunks), no benchmark.')
+    parser.add_argument('--indexed_fraction', type=float, default=0.5, help='Fraction of the chunks that is indexed. Default 0.5.')
+    parser.add_argument('--crystals', type=int, default=2, help='Maximum number of crystals per indexed frame. Default 2.')
+    parser.add_argument('--reflections', type=int, default=100, help='Number of reflections per crystal. Default 100.')
+    parser.add_argument('--peaks', type=int, default=50, help='Average number of peaks per frame. Default 50.')
+    parser.add_argument('--methods', type=str, nargs='+', default=list(synthetic.METHODS[:2]), help='Indexing methods used in the synthetic stream files.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator of the synthetic stream files. Default 0.')
+
+    args = parser.parse_args()
+
+    #print help if no arguments provided
+    if len(sys.argv) < 2:
+           parser.print_help()
+           sys.exit(1)
+
+    settings = {'indexed_fraction': args.indexed_fraction, 'crystals_per_frame': args.crystals,
+                'reflections_per_crystal': args.reflections, 'peaks_per_frame': args.peaks,
+                'methods': args.methods, 'seed': args.seed}
+
+    if args.generate:
+        stats = synthetic.write_synthetic_stream(args.generate, chunks=args.sizes[0], **settings)
+        print("%s written: %d chunks, %d indexed frames, %d crystals" %(args.generate, stats['chunks'], stats['indexed'], stats['crystals']))
+        sys.exit(0)
+
+    for case in args.cases:
+        if case not in benchmark.CASES:
+            print("Unknown operation '{:s}'. Possible operations are:".format(case))
+            print("\n".join(benchmark.CASES))
+            sys.exit(1)
+
+    if not os.path.isdir(args.work_dir):
+        print("Directory not found: {:s}".format(args.work_dir))
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        if os.path.isfile(args.baseline):
+            baseline = benchmark.load_report(args.baseline)
+        else:
+            print("File not found: {:s}".format(args.baseline))
+            sys.exit(1)
+
+    report = benchmark.run_benchmark(sizes=args.sizes, cases=args.cases, work_dir=args.work_dir, repeat=args.repeat,
+                                     keep_streams=args.keep_streams, **settings)
+    print("------------------")
+    if args.output:
+        benchmark.save_report(report, args.output)
+        print("Results saved to %s" %(args.output))
+    if baseline is not None:
+        slower = benchmark.compare_reports(report, baseline, threshold=args.threshold)
+        print("------------------")
+        if slower:
+            print("%d operations are slower than the baseline" %(len(slower)))
+            sys.exit(2)
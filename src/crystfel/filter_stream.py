@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+
+filter_stream
+-------
+Script to save the crystals that fulfill a number of criteria (unit cell, resolution, indexing method, event range,
+list of images and events) to a new stream file. Either the complete frames with at least one selected crystal are saved, or every
+selected crystal is saved as a separate frame (as with save_random_indexed_crystals.py). Alternatively, the
+reflections of the selected crystals are exported to memory-mappable .npy files (one per column) for merging or
+scaling with other tools.
+
+Usage and example
+-------
+To get the help message:
+python filter_stream.py -h
+
+To save the frames with a crystal within 1% of the cell 79 79 38 A, 90 90 90 deg, with a resolution better than 2.5 A,
+indexed by xgandalf and with events 1000 to 50000, to a stream file called my_output_<number>selected_images.stream:
+python filter_stream.py -i my_input.stream -o my_output -c 7.9 7.9 3.8 90 90 90 -t 0.01 -r 2.5 -m xgandalf-nolatt-cell -e 1000 50000
+
+To save the crystals of the second largest unit cell cluster (see show_stream_stats.py -c) as separate frames:
+python filter_stream.py -i my_input.stream -o polymorph_2 --cluster 1 --crystals
+
+To save the indexed frames of a list of images and events (one "filename //event" per line, e.g. from a hit
+classification):
+python filter_stream.py -i my_input.stream -o my_hits -l my_hits.lst
+
+To export the reflections of the crystals with a resolution better than 2.5 A to the directory my_reflections:
+python filter_stream.py -i my_input.stream -r 2.5 --export my_reflections
+The columns can then be opened in python with stream.export.open_export("my_reflections").
+
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from stream import stream
+from stream import profiling
+from stream import lookup
+from stream import cli
+
+def filter_stream(stream_file, output_prefix, cell=None, tolerance=0.01, angle_tolerance=1., resolution=None,
+                  indexing_methods=None, events=None, crystals=False, cluster=None, cluster_tolerance=0.02,
+                  cluster_min_count=10, event_list=None, export=None, profile=False, use_cache=False):
+
+    profiler = profiling.Profiler(progress=profiling.print_progress, memory=True) if profile else None
+    S = stream.Stream(stream_file, in_memory=False, use_index=True, summary_only=True, use_cache=use_cache,
+                      profiler=profiler)
+    print("----> %s <---- " %(stream_file))
+    if indexing_methods:
+        for m in indexing_methods:
+            if m not in S.indexing_methods:
+                print("Requested indexing method '{:s}' not found. Possible indexing methods are:".format(m))
+                print("\n".join(S.indexing_methods))
+                print("----")
+    mask = S.get_crystal_mask(cell=cell, tolerance=tolerance, angle_tolerance=angle_tolerance, resolution=resolution,
+                              methods=indexing_methods, events=events)
+    if cluster is not None:
+        labels = S.get_cluster_summary(tolerance=cluster_tolerance, min_count=cluster_min_count)
+        mask &= labels == cluster
+    if event_list is not None:
+        mask &= S.get_event_mask(lookup.read_event_list(event_list))
+    print("%d out of %d crystals selected" %(np.count_nonzero(mask), len(mask)))
+    if export is not None:
+        _ = S.export_reflections(export, mask)
+    elif crystals:
+        _ = S.save_selected_crystals(output_prefix, mask)
+    else:
+        _ = S.save_selected_images(output_prefix, mask)
+    print("------------------")
+    if profile:
+        S.profiler.report()
+        print("------------------")
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-i', '--stream_file', type=str, default='input.stream',help='Input stream file.')
+    parser.add_argument('-o', '--output_prefix', type=str, default = None, help='Name prefix for the output stream file. The number of selected images or crystals will be mentioned in the output stream file anyway. If not provided, the prefix of the input file will be taken.')
+    parser.add_argument('-c', '--cell', type=float, nargs='+', default=None, help='Target unit cell: a b c (in nm) and optionally alpha beta gamma (in deg), e.g. "7.9 7.9 3.8 90 90 90".')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.01, help='Maximum relative deviation of a, b and c from the target cell. Default 0.01 (1%%).')
+    parser.add_argument('-a', '--angle_tolerance', type=float, default=1., help='Maximum deviation of the cell angles from the target cell (in deg). Default 1.')
+    parser.add_argument('-r', '--resolution', type=float, default=None, help='Only select crystals with a resolution better than this resolution (in A).')
+    parser.add_argument('-m', '--method', type=str, action="append", help='Indexing method, should be literal method names as used within the stream file, e.g. "xgandalf-nolatt-cell". This argument can be repeated to include multiple methods. All indexing methods will be used if this argument is not used.')
+    parser.add_argument('-e', '--events', type=int, nargs=2, default=None, help='First and last event number to select (both included).')
+    parser.add_argument('-l', '--event_list', type=str, default=None, help='Only select the crystals of the images in this list file, with an image filename and optionally the event ("//3", "3" or a tag) per line, e.g. the hits of a classification or a CrystFEL input list.')
+    parser.add_argument('--cluster', type=int, default=None, help='Only select the crystals of this unit cell cluster (0 is the largest cluster). The clusters are shown with show_stream_stats.py -c.')
+    parser.add_argument('--cluster_tolerance', type=float, default=0.02, help='Bin width of the unit cell clustering, relative to the median cell. Default 0.02 (2%%).')
+    parser.add_argument('--cluster_min_count', type=int, default=10, help='Minimum number of crystals in a unit cell bin to be part of a cluster. Default 10.')
+    cli.add_cache_argument(parser)
+    parser.add_argument('--profile', action='store_true', help='Print the time spent reading, parsing, selecting and writing, the number of bytes, lines, chunks and crystals processed, and the peak memory.')
+    parser.add_argument('--crystals', action='store_true', help='Save every selected crystal as a separate frame instead of the frames with at least one selected crystal.')
+    parser.add_argument('--export', type=str, default=None, metavar='DIRECTORY', help='Instead of saving a stream file, export the reflections of the selected crystals to DIRECTORY as memory-mappable .npy files: a file per column (h, k, l, I, sigma, peak, background, fs, ss, panel), the crystal of every reflection, the reflection offsets per crystal and the crystal metadata.')
+
+    args = parser.parse_args()
+
+    #print help if no arguments provided
+    if len(sys.argv) < 2:
+           parser.print_help()
+           sys.exit(1)
+
+    if os.path.isfile(args.stream_file):
+        stream_file = args.stream_file
+    else:
+        print("File not found: {:s}".format(args.stream_file))
+        sys.exit(1)
+
+    if args.event_list is not None and not os.path.isfile(args.event_list):
+        print("File not found: {:s}".format(args.event_list))
+        sys.exit(1)
+
+    if args.cell is not None and len(args.cell) not in (3, 6):
+        print("The unit cell should be given as a b c or a b c alpha beta gamma")
+        sys.exit(1)
+
+    output_prefix = args.output_prefix
+    if output_prefix == None:
+        output_prefix = cli.get_filename(stream_file, 'stream')
+
+    filter_stream(stream_file, output_prefix, cell=args.cell, tolerance=args.tolerance, angle_tolerance=args.angle_tolerance,
+                  resolution=args.resolution, indexing_methods=args.method, events=args.events, crystals=args.crystals,
+                  cluster=args.cluster, cluster_tolerance=args.cluster_tolerance, cluster_min_count=args.cluster_min_count,
+                  event_list=args.event_list, export=args.export, profile=args.profile,
+                  use_cache=args.cache)
@@ -29,17 +29,30 @@ python save_random_indexed_crystals.py -h
 To save 50 random images to a streamfile called my_output_50indexed.stream:
 python save_random_indexed_crystals.py -i my_input.stream -o my_output -n 50
 
+To divide all indexed crystals over two half-datasets, my_output_part1_<number>indexed_crystals.stream and my_output_part2_<number>indexed_crystals.stream:
+python save_random_indexed_crystals.py -i my_input.stream -o my_output -k 2 -s 1
+
+To write 20 bootstrap samples:
+python save_random_indexed_crystals.py -i my_input.stream -o my_output -k 20 --bootstrap
+
 """
 import os
 import sys
-import re
+import random
 import argparse
 from stream import stream
+from stream import profiling
+from stream import cli
 
-def select_indexed_images(stream_file, output_prefix, number, indexing_methods=[]):
+def select_indexed_images(stream_file, output_prefix, number, indexing_methods=[], seed=None, profile=False,
+                          partitions=0, bootstrap=False, use_cache=False):
 
-    S = stream.Stream(stream_file)
+    profiler = profiling.Profiler(progress=profiling.print_progress, memory=True) if profile else None
+    S = stream.Stream(stream_file, in_memory=False, use_index=True, use_cache=use_cache, profiler=profiler)
     print("----> %s <---- " %(stream_file))
+    #the frames are read from the stream file with the chunk index, the selection is the same as with all frames
+    #in memory for the same seed
+    random.seed(seed)
     if indexing_methods:
         final_methods = []
         for m in indexing_methods:
@@ -52,28 +65,26 @@ def select_indexed_images(stream_file, output_prefix, number, indexing_methods=[
         print("Requested indexing methods found:")
         print("\n".join(final_methods))
         print("----")
-        if final_methods:
+        if final_methods and partitions:
+            _ = S.save_random_partitions(output_prefix, partitions, crystals=True, bootstrap=bootstrap, methods=final_methods, seed=seed)
+        elif final_methods:
             S.select_indexing_methods(final_methods)
             S.copy_frame_head_to_crystal(frames=False, indexing=True)
             S.detach_crystals_from_frames(frames=False, indexing=True)
             _ = S.save_random_indexed_crystals(output_prefix, number)
         else:
             print("Sorry, cannot proceed")
+    elif partitions:
+        _ = S.save_random_partitions(output_prefix, partitions, crystals=True, bootstrap=bootstrap, seed=seed)
     else:
         S.copy_frame_head_to_crystal(frames=True, indexing=False)
         S.detach_crystals_from_frames(frames=True, indexing=False)
         _ = S.save_random_indexed_crystals(output_prefix, number)
     print("------------------")
+    if profile:
+        S.profiler.report()
+        print("------------------")
     
-def get_filename(fle, suffix):
-    if "/" in fle:
-        name = re.search(r"\/(.+?)\.%s" %(suffix), fle).group(1).split("/")[-1]
-    else:
-        name = re.sub("\.%s"%(suffix),"",fle)
-        
-    return name
-
-
 if __name__ == '__main__':
     
     parser = argparse.ArgumentParser()
@@ -82,6 +93,11 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--output_prefix', type=str, default = None, help='Name prefix for the output stream file. The number of selected crystals will be mentioned in the output stream file anyway. If not provided, the prefix of the input file will be taken.')
     parser.add_argument('-n', '--number', type=int, default=0, help='Number of random crystals to be selected')
     parser.add_argument('-m', '--method', type=str, action="append", help='Indexing method, should be literal method names as used within the stream file, e.g. "xgandalf-nolatt-cell". This argument can be repeated to include multiple methods. All indexing methods will be used if this argument is not used.')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='Seed of the random number generator, to obtain the same selection when the script is run again.')
+    parser.add_argument('-k', '--partitions', type=int, default=0, help='Instead of a single random selection, divide all indexed crystals randomly over this number of disjoint stream files of (almost) equal size, e.g. 2 for half-datasets. All stream files are written in a single pass. The number of crystals (-n) is not used.')
+    parser.add_argument('--bootstrap', action='store_true', help='With -k, write this number of bootstrap samples instead: random selections with replacement with as many crystals as the full dataset.')
+    cli.add_cache_argument(parser)
+    parser.add_argument('--profile', action='store_true', help='Print the time spent reading, parsing, selecting and writing, the number of bytes, lines, chunks and crystals processed, and the peak memory.')
     
     args = parser.parse_args()
     
@@ -104,6 +120,7 @@ if __name__ == '__main__':
         
     output_prefix = args.output_prefix
     if output_prefix == None:
-        output_prefix = get_filename(stream_file, 'stream')
+        output_prefix = cli.get_filename(stream_file, 'stream')
     
-    select_indexed_images(stream_file, output_prefix, number, indexing_methods=args.method)
+    select_indexed_images(stream_file, output_prefix, number, indexing_methods=args.method, seed=args.seed, profile=args.profile,
+                          partitions=args.partitions, bootstrap=args.bootstrap, use_cache=args.cache)
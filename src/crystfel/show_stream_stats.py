@@ -17,6 +17,8 @@ https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
 show_stream_stats
 -------
 Script to show the indexing statistics of a Stream file. The Stream file has to be given as the -i argument. 
+Multiple stream files (or glob patterns) can be given, e.g. the partial stream files of a cluster run. Their statistics
+are combined, followed by the statistics of every file.
 
 Usage and example
 -------
@@ -27,18 +29,47 @@ python show_stream_stats.py -h
 To get the stats of your my_fancy_experiment.stream file:
 python show_stream_stats.py -i my_fancy_experiment.stream
 
+To get the combined stats of all stream files of a cluster run, parsed with 4 processes:
+python show_stream_stats.py -i "my_fancy_experiment_*.stream" -j 4
+
+To follow a stream file that is still being written, and update the stats every 2 minutes with the newly written frames:
+python show_stream_stats.py -i my_fancy_experiment.stream -f -t 120
+
+To also show the unit cell clusters, e.g. to detect a second polymorph:
+python show_stream_stats.py -i my_fancy_experiment.stream -c
+
+To also show the number of reflections, multiplicity and mean I/sigma(I) in 20 resolution shells up to 2 A:
+python show_stream_stats.py -i my_fancy_experiment.stream -s --n_shells 20 --d_min 2
+
 """
 import os
 import sys
 import argparse
 from stream import stream
+from stream import streamset
+from stream import follow
+from stream import profiling
+from stream import cli
 
 
 if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description = 'Show the indexing statistics of a Stream file')
 
-    parser.add_argument('-i', '--stream_file', type=str, default='input.stream',help='Input stream file')
+    parser.add_argument('-i', '--stream_file', type=str, nargs='+', default=['input.stream'],help='Input stream file(s) or glob pattern(s)')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='Number of processes used to parse the stream file')
+    parser.add_argument('-p', '--peaks', action='store_true', help='Also show statistics on the peak lists (number of peaks per indexed and unindexed image, peak resolution)')
+    parser.add_argument('-c', '--clusters', action='store_true', help='Also cluster the unit cells (e.g. to detect polymorphs) and show the statistics of every cluster')
+    parser.add_argument('--cluster_tolerance', type=float, default=0.02, help='Bin width of the unit cell clustering, relative to the median cell. Default 0.02 (2%%).')
+    parser.add_argument('--cluster_min_count', type=int, default=10, help='Minimum number of crystals in a unit cell bin to be part of a cluster. Default 10.')
+    parser.add_argument('-s', '--shells', action='store_true', help='Also show the statistics of the reflections per resolution shell: number of reflections, unique Miller indices (symmetry equivalents are not merged), multiplicity, mean I and mean I/sigma(I). The reflections are read from the stream file in batches.')
+    parser.add_argument('--n_shells', type=int, default=10, help='Number of resolution shells, of equal reciprocal volume. Default 10.')
+    parser.add_argument('--d_min', type=float, default=None, help='High resolution limit of the shells (in A). If not provided, the best resolution limit of the crystals will be taken.')
+    parser.add_argument('--d_max', type=float, default=None, help='Low resolution limit of the shells (in A). If not provided, the first shell includes all low resolution reflections.')
+    cli.add_cache_argument(parser)
+    parser.add_argument('--profile', action='store_true', help='Print the time spent reading, parsing, selecting and writing, the number of bytes, lines, chunks and crystals processed, and the peak memory. In follow mode, this is printed after every update, summed over all updates.')
+    parser.add_argument('-f', '--follow', action='store_true', help='Follow a stream file that is still being written: only the newly written frames are parsed at every update. Stop with Ctrl-C.')
+    parser.add_argument('-t', '--interval', type=float, default=60, help='Time between two updates in follow mode (in s)')
 
     args = parser.parse_args()
 
@@ -47,13 +78,50 @@ if __name__ == "__main__":
            parser.print_help()
            sys.exit(1)
     
-    if os.path.isfile(args.stream_file):
-        stream_file = args.stream_file
-    else:
-        print("File not found: {:s}".format(args.stream_file))
-        sys.exit(1)
+    profiler = profiling.Profiler(progress=profiling.print_progress, memory=True) if args.profile else None
 
-    S = stream.Stream(stream_file)
-    print(("----> %s <---- " %(stream_file)))
-    S.get_stream_summary()
-    print("------------------")
+    if args.follow:
+        if len(args.stream_file) != 1 or not os.path.isfile(args.stream_file[0]):
+            print("Follow mode requires a single existing stream file")
+            sys.exit(1)
+        S = follow.StreamFollower(args.stream_file[0], profiler=profiler)
+        S.follow(interval=args.interval, report=args.profile)
+    elif len(args.stream_file) == 1 and os.path.isfile(args.stream_file[0]):
+        stream_file = args.stream_file[0]
+        S = stream.Stream(stream_file, in_memory=False, workers=args.workers, summary_only=True, use_cache=args.cache,
+                          profiler=profiler)
+        print(("----> %s <---- " %(stream_file)))
+        S.get_stream_summary()
+        print("------------------")
+        if args.peaks:
+            S.get_peak_summary()
+            print("------------------")
+        if args.clusters:
+            _ = S.get_cluster_summary(tolerance=args.cluster_tolerance, min_count=args.cluster_min_count)
+            print("------------------")
+        if args.shells:
+            _ = S.get_shell_summary(n_shells=args.n_shells, d_min=args.d_min, d_max=args.d_max)
+            print("------------------")
+    else:
+        stream_files = streamset.expand_streamfiles(args.stream_file)
+        if not stream_files:
+            sys.exit(1)
+        S = streamset.StreamSet(stream_files, in_memory=False, workers=args.workers, summary_only=True,
+                                use_cache=args.cache, profiler=profiler)
+        print(("----> %d stream files <---- " %(len(stream_files))))
+        S.get_stream_summary()
+        print("------------------")
+        S.get_file_summary()
+        print("------------------")
+        if args.peaks:
+            S.get_peak_summary()
+            print("------------------")
+        if args.clusters:
+            _ = S.get_cluster_summary(tolerance=args.cluster_tolerance, min_count=args.cluster_min_count)
+            print("------------------")
+        if args.shells:
+            _ = S.get_shell_summary(n_shells=args.n_shells, d_min=args.d_min, d_max=args.d_max)
+            print("------------------")
+    if args.profile and not args.follow:
+        S.profiler.report()
+        print("------------------")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+
+split_stream
+-------
+Script to split a stream file into several stream files in a single pass over the stream file, e.g. per time delay in
+time-resolved experiments. The chunks are attributed to the output stream files based on the time delay tag in the
+image filename (e.g. run_0001_tag_100ps.h5), an event range or a pattern in the image filename. The number of frames
+and crystals and the unit cell statistics of every output stream file are printed at the end.
+
+Usage and example
+-------
+To get the help message:
+python split_stream.py -h
+
+To write the indexed frames of every time delay to a separate stream file (my_output_<tag>.stream):
+python split_stream.py -i my_input.stream -o my_output --by_timeline
+
+To write the frames with tag 0ps to dark.stream and those of runs 10 to 19 to late.stream:
+python split_stream.py -i my_input.stream --tag 0ps dark --pattern "run_001[0-9]" late
+
+To write events 0 to 999 and 1000 to 1999 to different stream files, including the frames that were not indexed:
+python split_stream.py -i my_input.stream --events 0 999 first --events 1000 1999 second --all
+
+"""
+import os
+import sys
+import argparse
+from stream import split
+from stream import profiling
+from stream import cli
+from stream.compression import get_compression
+
+def split_stream_file(stream_file, output_prefix, tags=None, events=None, patterns=None, by_timeline=False,
+                      indexed_only=True, profile=False):
+
+    extension = '.stream' + get_compression(stream_file)
+    bins = []
+    for tag, name in tags or []:
+        bins.append(split.StreamBin(name + extension, timeline=tag))
+    for first, last, name in events or []:
+        bins.append(split.StreamBin(name + extension, events=(int(first), int(last))))
+    for pattern, name in patterns or []:
+        bins.append(split.StreamBin(name + extension, pattern=pattern))
+
+    #no Stream object is needed, the stream file is only read once, while splitting
+    print("----> %s <---- " %(stream_file))
+    profiler = profiling.Profiler(memory=True)
+    with profiler.phase('write'):
+        bins, skipped = split.split_stream(stream_file, bins, timeline_root=output_prefix if by_timeline else None,
+                                           indexed_only=indexed_only)
+    split.get_split_summary(bins, skipped)
+    print("------------------")
+    if profile:
+        for b in bins:
+            profiler.count('written_chunks', b.chunks)
+        profiler.report()
+        print("------------------")
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-i', '--stream_file', type=str, default='input.stream',help='Input stream file.')
+    parser.add_argument('-o', '--output_prefix', type=str, default = None, help='Name prefix for the output stream files with --by_timeline, followed by the time delay tag. If not provided, the prefix of the input file will be taken.')
+    parser.add_argument('--by_timeline', action='store_true', help='Write the frames of every time delay tag to a separate stream file <output_prefix>_<tag>.stream. Frames that are selected with --tag, --events or --pattern are not written to these files.')
+    parser.add_argument('--tag', type=str, nargs=2, action="append", metavar=('TAG', 'NAME'), help='Write the frames with this time delay tag (as in the image filename after "tag_") to NAME.stream. This argument can be repeated.')
+    parser.add_argument('--events', type=str, nargs=3, action="append", metavar=('FIRST', 'LAST', 'NAME'), help='Write the frames with an event number from FIRST to LAST (both included) to NAME.stream. This argument can be repeated.')
+    parser.add_argument('--pattern', type=str, nargs=2, action="append", metavar=('PATTERN', 'NAME'), help='Write the frames of which the image filename contains the regular expression PATTERN to NAME.stream. This argument can be repeated.')
+    parser.add_argument('--all', action='store_true', help='Also write the frames that were not indexed.')
+    parser.add_argument('--profile', action='store_true', help='Print the time spent reading, parsing, selecting and writing, the number of bytes, lines, chunks and crystals processed, and the peak memory.')
+
+    args = parser.parse_args()
+
+    #print help if no arguments provided
+    if len(sys.argv) < 2:
+           parser.print_help()
+           sys.exit(1)
+
+    if os.path.isfile(args.stream_file):
+        stream_file = args.stream_file
+    else:
+        print("File not found: {:s}".format(args.stream_file))
+        sys.exit(1)
+
+    if not (args.by_timeline or args.tag or args.events or args.pattern):
+        print("Please specify how to split the stream file with --by_timeline, --tag, --events and/or --pattern")
+        sys.exit(1)
+
+    output_prefix = args.output_prefix
+    if output_prefix == None:
+        output_prefix = cli.get_filename(stream_file, 'stream')
+
+    split_stream_file(stream_file, output_prefix, tags=args.tag, events=args.events, patterns=args.pattern,
+                      by_timeline=args.by_timeline, indexed_only=not args.all, profile=args.profile)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import io
+import time
+import json
+import platform
+import contextlib
+import multiprocessing
+import numpy as np
+from .synthetic import write_synthetic_stream
+from .profiling import get_peak_memory
+
+#operations that are timed, every case is run in a fresh process so that its peak memory can be measured.
+#The _pipelined case forces the reader/formatter/writer threads of save_random_indexed_images (see pipeline.py).
+CASES = ('parse', 'parse_summary_only', 'get_stream_summary', 'get_cell_stats', 'save_random_indexed_images',
+         'save_random_indexed_images_pipelined', 'save_random_indexed_crystals')
+
+
+def run_case(streamfile, case, output_dir):
+    """
+    Run a single benchmark case on a stream file, the output of the operation itself is discarded.
+
+    Returns
+    ----------
+    result (dict)
+        wall-clock time of the operation (in s) and peak memory of the process (in MB)
+    """
+    from .stream import Stream
+
+    root = os.path.join(output_dir, case)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case == 'parse_summary_only':
+            t0 = time.perf_counter()
+            S = Stream(streamfile, in_memory=False, summary_only=True, use_cache=False)
+            t = time.perf_counter() - t0
+        else:
+            t0 = time.perf_counter()
+            S = Stream(streamfile, use_cache=False)
+            t = time.perf_counter() - t0
+            if case != 'parse':
+                n = S.indexed_images // 2
+                t0 = time.perf_counter()
+                if case == 'get_stream_summary':
+                    S.get_stream_summary()
+                elif case == 'get_cell_stats':
+                    S.get_cell_stats()
+                    S.get_angle_stats()
+                elif case.startswith('save_random_indexed_images'):
+                    S.save_random_indexed_images(root, n, frames=True, pipeline=case.endswith('_pipelined') or None)
+                elif case == 'save_random_indexed_crystals':
+                    S.copy_frame_head_to_crystal(frames=True)
+                    S.detach_crystals_from_frames(frames=True)
+                    S.save_random_indexed_crystals(root, n)
+                t = time.perf_counter() - t0
+    return {'time': t, 'peak_rss_mb': get_peak_memory()}
+
+
+def _run_case(streamfile, case, output_dir, queue):
+    queue.put(run_case(streamfile, case, output_dir))
+
+
+def run_isolated(streamfile, case, output_dir):
+    """
+    Run a benchmark case in a new python process (see run_case), so that earlier cases do not influence the
+    memory usage or the timing.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    p = context.Process(target=_run_case, args=(streamfile, case, output_dir, queue))
+    p.start()
+    try:
+        result = queue.get()
+    finally:
+        p.join()
+    return result
+
+
+def run_benchmark(sizes=(1000, 10000), cases=CASES, work_dir='.', repeat=1, keep_streams=False, **settings):
+    """
+    Generate synthetic stream files of several sizes (see synthetic.write_synthetic_stream) and time the
+    operations on them. The best time of the repeats is kept.
+
+    Parameters
+    ----------
+    sizes (list)
+        number of chunks of the synthetic stream files
+    cases (list)
+        operations to time, see CASES
+    work_dir (str)
+        directory for the synthetic stream files and the output stream files
+    repeat (int)
+        number of times every case is run
+    keep_streams (bool)
+        do not remove the synthetic stream files afterwards (they are reused if they exist)
+    settings
+        passed to write_synthetic_stream (indexed_fraction, crystals_per_frame, ...)
+
+    Returns
+    ----------
+    report (dict)
+        the settings, platform, and a list with a result per size and case: time (in s), throughput (in MB/s and
+        chunks/s) and peak memory (in MB)
+    """
+    report = {'settings': dict(settings, sizes=list(sizes), repeat=repeat),
+              'platform': {'python': platform.python_version(), 'numpy': np.__version__,
+                           'machine': platform.machine(), 'system': platform.system()},
+              'results': []}
+    for size in sizes:
+        streamfile = os.path.join(work_dir, 'synthetic_%d.stream' %(size))
+        if not (keep_streams and os.path.isfile(streamfile)):
+            print("Generating %s" %(streamfile))
+            write_synthetic_stream(streamfile, chunks=size, **settings)
+        megabytes = os.path.getsize(streamfile) / 1024.**2
+        for case in cases:
+            runs = [run_isolated(streamfile, case, work_dir) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r['time'])
+            result = {'chunks': size, 'case': case, 'size_mb': megabytes, 'time': best['time'],
+                      'mb_per_s': megabytes / best['time'] if best['time'] > 0 else float('inf'),
+                      'chunks_per_s': size / best['time'] if best['time'] > 0 else float('inf'),
+                      'peak_rss_mb': best['peak_rss_mb']}
+            report['results'].append(result)
+            print(format_result(result))
+        #output stream files of the save cases
+        for f in os.listdir(work_dir):
+            if f.startswith(('save_random_indexed_images_', 'save_random_indexed_crystals_')) and f.endswith('.stream'):
+                os.remove(os.path.join(work_dir, f))
+        if not keep_streams:
+            os.remove(streamfile)
+    return report
+
+
+def format_result(result):
+    """
+    Return a benchmark result as a single line of text
+    """
+    rss = 'n/a' if result['peak_rss_mb'] is None else '%.0f MB' %(result['peak_rss_mb'])
+    return "%8d chunks %-40s %8.3f s %8.1f MB/s %10.0f chunks/s   peak memory %s" %(
+           result['chunks'], result['case'], result['time'], result['mb_per_s'], result['chunks_per_s'], rss)
+
+
+def save_report(report, filename):
+    """
+    Save a benchmark report as json file
+    """
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+def load_report(filename):
+    """
+    Load a benchmark report saved with save_report
+    """
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compare_reports(report, baseline, threshold=0.1):
+    """
+    Print the time of every case relative to a baseline report, for the sizes and cases in both reports.
+
+    Parameters
+    ----------
+    report (dict)
+        see run_benchmark
+    baseline (dict)
+        earlier report, see load_report
+    threshold (float)
+        relative change in time from which a case is reported as slower or faster, e.g. 0.1 for 10%
+
+    Returns
+    ----------
+    slower (list)
+        (chunks, case) of the cases that are slower than the baseline
+    """
+    ignore = ('sizes', 'repeat')
+    if {k: v for k, v in report['settings'].items() if k not in ignore} != {k: v for k, v in baseline['settings'].items() if k not in ignore}:
+        print("Warning: the benchmark settings differ from the baseline settings")
+    reference = {(r['chunks'], r['case']): r for r in baseline['results']}
+    slower = []
+    for result in report['results']:
+        key = (result['chunks'], result['case'])
+        if key not in reference:
+            continue
+        ratio = result['time'] / reference[key]['time'] if reference[key]['time'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'SLOWER'
+            slower.append(key)
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        print("%8d chunks %-40s %8.3f s (baseline %8.3f s) x%.2f %s" %(
+              result['chunks'], result['case'], result['time'], reference[key]['time'], ratio, verdict))
+    return slower
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import hashlib
+import numpy as np
+from .table import CrystalTable, COLUMNS
+
+#increase when the parser output changes, so that older cache files are not used anymore
+PARSER_VERSION = 1
+CACHE_DIR = os.environ.get('SX_STREAM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'sx_toolbox', 'streams'))
+#maximum size of the cache directory, in MB
+CACHE_SIZE = int(os.environ.get('SX_STREAM_CACHE_SIZE', 2048))
+
+
+class ParseCache(object):
+    """
+    On-disk cache of parsed stream files: the stream header, the counters and the crystal table, stored as .npz file.
+    A cache file is only used if the path, size and modification time of the stream file and the parser version
+    match. The least recently used cache files are removed when the cache directory exceeds its maximum size.
+    Only used when a Stream is created with use_cache=True (--cache in the scripts).
+
+    Parameters
+    ----------
+    cache_dir (str)
+        cache directory, by default ~/.cache/sx_toolbox/streams or the SX_STREAM_CACHE environment variable
+    max_size (int)
+        maximum size of the cache directory (in MB), by default 2048 or the SX_STREAM_CACHE_SIZE environment variable
+    """
+
+    def __init__(self, cache_dir=None, max_size=None):
+        self.cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        self.max_size = (CACHE_SIZE if max_size is None else max_size) * 1024 * 1024
+
+    def get_cache_file(self, streamfile):
+        """
+        Return the cache file of a stream file, named after the hash of its absolute path
+        """
+        key = hashlib.sha1(os.path.abspath(streamfile).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get_key(self, streamfile):
+        stat = os.stat(streamfile)
+        return os.path.abspath(streamfile), stat.st_size, stat.st_mtime_ns
+
+    def load(self, stream):
+        """
+        Set the header, the counters and the crystal table of a Stream from its cache file.
+
+        Returns
+        ----------
+        loaded (bool)
+            False if there is no valid cache file
+        """
+        cache_file = self.get_cache_file(stream.streamfile)
+        if not os.path.isfile(cache_file):
+            return False
+        path, size, mtime = self.get_key(stream.streamfile)
+        try:
+            with np.load(cache_file) as data:
+                if (int(data['version']) != PARSER_VERSION or str(data['path']) != path
+                        or int(data['size']) != size or int(data['mtime']) != mtime):
+                    return False
+                stream.header = str(data['header'])
+                stream.end_chunk_line = [str(line) for line in data['end_chunk_line']]
+                stream.images = int(data['images'])
+                stream.indexed_images = int(data['indexed_images'])
+                stream.indexing_methods = [str(m) for m in data['indexing_methods']]
+                stream.frames_per_method = dict(zip(stream.indexing_methods, data['frames_per_method'].tolist()))
+                stream.crystals_per_method = dict(zip(stream.indexing_methods, data['crystals_per_method'].tolist()))
+
+                table = CrystalTable()
+                for name in COLUMNS:
+                    setattr(table, name, data['table_' + name])
+                table.methods = [str(m) for m in data['table_methods']]
+                table.filenames = [str(f) for f in data['table_filenames']]
+                table.events = [int(e) if is_int else str(e) for e, is_int in zip(data['table_events'], data['table_event_is_int'])]
+                table._columns = None
+                table._codes = None
+        except (OSError, KeyError, ValueError):
+            return False
+        stream._crystal_table = table
+        #mark as recently used
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return True
+
+    def save(self, stream):
+        """
+        Write the header, the counters and the crystal table of a parsed Stream to its cache file and evict the least
+        recently used cache files if required. Nothing is written if the cache directory is not writable.
+        """
+        table = stream._crystal_table
+        if table is None:
+            return
+        cache_file = self.get_cache_file(stream.streamfile)
+        tmp_file = cache_file + '.tmp'
+        path, size, mtime = self.get_key(stream.streamfile)
+        methods = stream.indexing_methods
+        arrays = dict(('table_' + name, getattr(table, name)) for name in COLUMNS)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_file, 'wb') as out:
+                np.savez(out,
+                         version = np.array(PARSER_VERSION),
+                         path = np.array(path),
+                         size = np.array(size),
+                         mtime = np.array(mtime),
+                         header = np.array(stream.header),
+                         end_chunk_line = np.array(stream.end_chunk_line, dtype=str),
+                         images = np.array(stream.images),
+                         indexed_images = np.array(stream.indexed_images),
+                         indexing_methods = np.array(methods, dtype=str),
+                         frames_per_method = np.array([stream.frames_per_method[m] for m in methods], dtype=np.int64),
+                         crystals_per_method = np.array([stream.crystals_per_method[m] for m in methods], dtype=np.int64),
+                         table_methods = np.array(table.methods, dtype=str),
+                         table_filenames = np.array(table.filenames, dtype=str),
+                         table_events = np.array([str(e) for e in table.events], dtype=str),
+                         table_event_is_int = np.array([isinstance(e, int) for e in table.events], dtype=bool),
+                         **arrays)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print("Could not save stream cache to %s: %s" %(cache_file, e))
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used cache files until the cache directory is within its maximum size.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.npz')]
+            files = sorted((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in entries)
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, cache_file in files:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(cache_file)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import itertools
+import numpy as np
+from .table import CELL_PARAMETERS
+
+
+def get_cell_histograms(cell, bins=50, ranges=None):
+    """
+    Histogram of every unit cell parameter.
+
+    Parameters
+    ----------
+    cell (numpy array)
+        (n, 6) unit cell parameters: a, b, c (in nm), alpha, beta, gamma (in degr.), e.g. CrystalTable.get_cell()
+    bins (int)
+        number of bins per parameter
+    ranges (list)
+        (min, max) per parameter, the range of the values by default
+
+    Returns
+    ----------
+    histograms (dict)
+        (edges, hist) per cell parameter name
+    """
+    histograms = {}
+    for i, name in enumerate(CELL_PARAMETERS):
+        hist, edges = np.histogram(cell[:, i], bins=bins, range=None if ranges is None else ranges[i])
+        histograms[name] = (edges, hist)
+    return histograms
+
+
+def normalize_cells(cell, reference=None):
+    """
+    Divide every unit cell parameter by a reference value (the median cell by default), so that a grid with the same
+    relative bin width can be used for the axes and the angles. A parameter with a reference value of 0 (e.g. all
+    cells missing from the stream file are 0) is not normalized.
+    """
+    if reference is None:
+        reference = np.median(cell, axis=0) if len(cell) else np.ones(len(CELL_PARAMETERS))
+    reference = np.array(reference, dtype=np.float64)
+    reference[reference == 0] = 1.
+    return cell / reference
+
+
+def get_cell_grid(cell, tolerance=0.02, reference=None):
+    """
+    Sparse 6-D histogram of the normalized unit cells: the normalized cells are binned on a grid with bin width
+    tolerance, only the occupied bins are returned.
+
+    Parameters
+    ----------
+    cell (numpy array)
+        (n, 6) unit cell parameters
+    tolerance (float)
+        bin width, relative to the reference cell (see normalize_cells)
+    reference (list)
+        reference cell, the median cell by default
+
+    Returns
+    ----------
+    bins (numpy array)
+        (m, 6) integer grid coordinates of the occupied bins
+    counts (numpy array)
+        number of crystals per occupied bin
+    inverse (numpy array)
+        occupied bin of every crystal, bins[inverse[i]] is the bin of crystal i
+    """
+    coords = np.floor(normalize_cells(cell, reference) / tolerance).astype(np.int64)
+    if len(coords) == 0:
+        return coords, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    low = coords.min(axis=0)
+    extent = coords.max(axis=0) - low + 1
+    if not fits_int64(extent):
+        bins, inverse, counts = np.unique(coords, axis=0, return_inverse=True, return_counts=True)
+        return bins, counts, inverse.reshape(-1)
+    #sorting single integers is much faster than sorting rows
+    keys, inverse, counts = np.unique(get_grid_keys(coords, low, extent), return_inverse=True, return_counts=True)
+    bins = np.empty((len(keys), coords.shape[1]), dtype=np.int64)
+    for i in range(coords.shape[1] - 1, -1, -1):
+        keys, bins[:, i] = np.divmod(keys, extent[i])
+    bins += low
+    return bins, counts, inverse.reshape(-1)
+
+
+def fits_int64(extent):
+    """
+    Whether a grid with the given number of bins along every dimension can be encoded with get_grid_keys
+    """
+    return np.sum(np.log2(extent.astype(np.float64))) < 62
+
+
+def get_grid_keys(bins, low, extent):
+    """
+    Encode grid coordinates as single integers (mixed radix), coordinates outside low:low+extent get key -1
+    """
+    shifted = bins - low
+    inside = np.all((shifted >= 0) & (shifted < extent), axis=1)
+    keys = np.zeros(len(bins), dtype=np.int64)
+    for i in range(bins.shape[1]):
+        keys = keys * extent[i] + shifted[:, i]
+    keys[~inside] = -1
+    return keys
+
+
+def cluster_cells(cell, tolerance=0.02, min_count=10, reference=None):
+    """
+    Density-based clustering of unit cells on a grid, e.g. to separate polymorphs or wrongly indexed lattices.
+    The normalized cells are binned (see get_cell_grid). Bins with at least min_count crystals are dense, and
+    dense bins that touch (including diagonally) form a cluster. Crystals in bins that are not dense are not
+    attributed to a cluster. The cost is dominated by sorting the (encoded) grid bins of the crystals once, so
+    millions of crystals can be clustered in seconds.
+
+    Parameters
+    ----------
+    cell (numpy array)
+        (n, 6) unit cell parameters
+    tolerance (float)
+        bin width relative to the reference cell, e.g. 0.02 for 2%
+    min_count (int)
+        minimum number of crystals in a bin to be part of a cluster
+    reference (list)
+        reference cell, the median cell by default
+
+    Returns
+    ----------
+    labels (numpy array)
+        cluster of every crystal, -1 if not attributed to a cluster. Clusters are numbered from large to small.
+    """
+    labels = np.full(len(cell), -1, dtype=np.int64)
+    bins, counts, inverse = get_cell_grid(cell, tolerance, reference)
+    dense = np.flatnonzero(counts >= min_count)
+    if len(dense) == 0:
+        return labels
+
+    dense_bins = bins[dense]
+    low = dense_bins.min(axis=0) - 1
+    extent = dense_bins.max(axis=0) - low + 2
+    if not fits_int64(extent):
+        print("The unit cells are spread too much to be clustered with tolerance %.3f, use a larger tolerance" %(tolerance))
+        return labels
+    keys = get_grid_keys(dense_bins, low, extent)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    #connect every dense bin to its dense neighbours
+    first = []
+    second = []
+    for offset in itertools.product((-1, 0, 1), repeat=dense_bins.shape[1]):
+        if not any(offset):
+            continue
+        neighbour_keys = get_grid_keys(dense_bins + np.array(offset), low, extent)
+        pos = np.clip(np.searchsorted(sorted_keys, neighbour_keys), 0, len(sorted_keys) - 1)
+        found = (sorted_keys[pos] == neighbour_keys) & (neighbour_keys >= 0)
+        first.append(np.flatnonzero(found))
+        second.append(order[pos[found]])
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+
+    #connected components by propagating the smallest label
+    component = np.arange(len(dense_bins))
+    while True:
+        previous = component.copy()
+        np.minimum.at(component, first, component[second])
+        component = component[component]
+        if np.array_equal(component, previous):
+            break
+
+    #number the clusters from large to small
+    _, component = np.unique(component, return_inverse=True)
+    component = component.reshape(-1)
+    sizes = np.bincount(component, weights=counts[dense])
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+
+    bin_labels = np.full(len(bins), -1, dtype=np.int64)
+    bin_labels[dense] = rank[component]
+    labels[:] = bin_labels[inverse]
+    return labels
+
+
+def get_cluster_stats(cell, labels):
+    """
+    Number of crystals, average and standard deviation of the unit cell parameters of every cluster.
+
+    Parameters
+    ----------
+    cell (numpy array)
+        (n, 6) unit cell parameters
+    labels (numpy array)
+        cluster of every crystal, see cluster_cells
+
+    Returns
+    ----------
+    stats (list)
+        a dictionary per cluster (in the order of the cluster numbers) with the cluster number, the number of
+        crystals, and the average and standard deviation of the 6 cell parameters
+    """
+    stats = []
+    n = labels.max() + 1 if len(labels) else 0
+    counts = np.bincount(labels[labels >= 0], minlength=n)
+    for i in range(n):
+        sele = cell[labels == i]
+        stats.append({'cluster': i,
+                      'crystals': int(counts[i]),
+                      'average': sele.mean(axis=0),
+                      'stdev': sele.std(axis=0)})
+    return stats
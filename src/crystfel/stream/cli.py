@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import re
+
+CACHE_HELP = ('Cache the counters and the crystal table of the parsed stream file(s) as a .npz file per stream file in '
+              '~/.cache/sx_toolbox/streams (or the directory in the SX_STREAM_CACHE environment variable, at most '
+              'SX_STREAM_CACHE_SIZE MB, default 2048), so that they are loaded instead of parsing the stream file '
+              'again on the next run.')
+
+
+def add_cache_argument(parser):
+    """
+    Add the --cache option (see Stream, use_cache) to the argument parser of a script
+    """
+    parser.add_argument('--cache', action='store_true', help=CACHE_HELP)
+
+
+def get_filename(fle, suffix):
+    """
+    Return the name of a file without directory and without the .<suffix> extension, e.g. the default output prefix
+    of the scripts
+    """
+    if "/" in fle:
+        name = re.search(r"\/(.+?)\.%s" %(suffix), fle).group(1).split("/")[-1]
+    else:
+        name = re.sub(r"\.%s"%(suffix),"",fle)
+
+    return name
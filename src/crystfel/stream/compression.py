@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import io
+import gzip
+import bz2
+import lzma
+import queue
+import threading
+
+#codec per file extension
+CODECS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+BLOCK_SIZE = 4 * 1024 * 1024
+QUEUE_SIZE = 4
+
+
+def get_compression(filename):
+    """
+    Return the compression extension of a file ('.gz', '.bz2' or '.xz'), or '' if the file is not compressed
+    """
+    for ext in CODECS:
+        if filename.endswith(ext):
+            return ext
+    return ''
+
+
+def open_stream(filename):
+    """
+    Open a stream file for reading in binary mode. Compressed stream files are decompressed in a background thread.
+    """
+    ext = get_compression(filename)
+    if ext:
+        return ThreadedReader(CODECS[ext].open(filename, 'rb'))
+    return open(filename, 'rb')
+
+
+def get_compressor(filename):
+    """
+    Return the function that compresses bytes into a complete compressed stream (e.g. gzip.compress) for the
+    compression extension of a file, None if the file is not compressed. Concatenated compressed streams form a
+    valid compressed file.
+    """
+    ext = get_compression(filename)
+    return CODECS[ext].compress if ext else None
+
+
+def open_output(filename, binary=False, buffer_size=-1):
+    """
+    Open a stream file for writing in text mode (or binary mode if binary is True), compressed if the file name ends
+    with a compression extension. buffer_size sets the size of the write buffer, the default size if -1.
+    """
+    ext = get_compression(filename)
+    if ext:
+        if binary:
+            return io.BufferedWriter(CODECS[ext].open(filename, 'wb'),
+                                     buffer_size if buffer_size > 0 else io.DEFAULT_BUFFER_SIZE)
+        return CODECS[ext].open(filename, 'wt')
+    return open(filename, 'wb' if binary else 'w', buffering=buffer_size)
+
+
+class ThreadedReader(io.RawIOBase):
+    """
+    Binary file object that reads (and decompresses) a file in a background thread. Blocks are passed to the
+    reading thread through a bounded queue, so that decompression overlaps with parsing while at most
+    QUEUE_SIZE blocks are kept in memory. Only sequential reading is supported.
+
+    Parameters
+    ----------
+    f (file object)
+        file opened in binary mode, e.g. gzip.open(filename, 'rb')
+    block_size (int)
+        number of bytes that is read at once by the background thread
+    """
+
+    def __init__(self, f, block_size=BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=QUEUE_SIZE)
+        self.buf = b''
+        self.pos = 0
+        self.eof = False
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._read_blocks, daemon=True)
+        self.thread.start()
+
+    def _read_blocks(self):
+        try:
+            while not self.stop.is_set():
+                block = self.f.read(self.block_size)
+                self._put(block)
+                if not block:
+                    break
+        except Exception as e:
+            #raised again in the reading thread
+            self._put(e)
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        #only the rewind at the start of iter_chunk_data is supported
+        if whence == io.SEEK_SET and offset == self.pos:
+            return self.pos
+        raise io.UnsupportedOperation("compressed stream files can only be read sequentially")
+
+    def read(self, size=-1):
+        chunks = [self.buf]
+        n = len(self.buf)
+        while (size is None or size < 0 or n < size) and not self.eof:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.eof = True
+                break
+            chunks.append(block)
+            n += len(block)
+        data = b''.join(chunks)
+        if size is not None and 0 <= size < len(data):
+            self.buf = data[size:]
+            data = data[:size]
+        else:
+            self.buf = b''
+        self.pos += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.stop.set()
+            self.thread.join()
+            self.f.close()
+        super().close()
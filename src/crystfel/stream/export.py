@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import struct
+import numpy as np
+from . import reflections
+from .table import CrystalTable, COLUMNS
+
+#header size of the .npy column files, large enough for any shape, so that it can be written at the end
+HEADER_SIZE = 128
+
+
+class ColumnWriter(object):
+    """
+    Write a one-dimensional .npy file of which the length is not known in advance, by appending arrays.
+    The header is written when the file is closed.
+
+    Parameters
+    ----------
+    filename (str)
+        .npy file
+    dtype (numpy dtype)
+        type of the values
+    """
+
+    def __init__(self, filename, dtype):
+        self.dtype = np.dtype(dtype)
+        self.n = 0
+        self.out = open(filename, 'wb')
+        self.out.write(self.get_header())
+
+    def get_header(self):
+        """
+        .npy (version 1.0) header for the current number of values, padded to HEADER_SIZE
+        """
+        header = "{'descr': %s, 'fortran_order': False, 'shape': (%d,), }" %(
+                 repr(np.lib.format.dtype_to_descr(self.dtype)), self.n)
+        length = HEADER_SIZE - 10
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', length) + header.ljust(length - 1).encode('latin1') + b'\n'
+
+    def write(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.out.write(values.tobytes())
+        self.n += len(values)
+
+    def close(self):
+        self.out.seek(0)
+        self.out.write(self.get_header())
+        self.out.close()
+
+
+def save_table(directory, table):
+    """
+    Save a CrystalTable as .npy files, table_<column>.npy and the lists of indexing methods, filenames and events
+    """
+    for name in COLUMNS:
+        np.save(os.path.join(directory, 'table_%s.npy' %(name)), getattr(table, name))
+    np.save(os.path.join(directory, 'table_methods.npy'), np.array(table.methods, dtype=str))
+    np.save(os.path.join(directory, 'table_filenames.npy'), np.array(table.filenames, dtype=str))
+    np.save(os.path.join(directory, 'table_events.npy'), np.array([str(e) for e in table.events], dtype=str))
+    np.save(os.path.join(directory, 'table_event_is_int.npy'), np.array([isinstance(e, int) for e in table.events], dtype=bool))
+
+
+def load_table(directory, mmap_mode='r'):
+    """
+    Load a CrystalTable saved with save_table, the columns are memory mapped
+    """
+    table = CrystalTable()
+    for name in COLUMNS:
+        setattr(table, name, np.load(os.path.join(directory, 'table_%s.npy' %(name)), mmap_mode=mmap_mode))
+    table.methods = [str(m) for m in np.load(os.path.join(directory, 'table_methods.npy'))]
+    table.filenames = [str(f) for f in np.load(os.path.join(directory, 'table_filenames.npy'))]
+    events = np.load(os.path.join(directory, 'table_events.npy'))
+    is_int = np.load(os.path.join(directory, 'table_event_is_int.npy'))
+    table.events = [int(e) if i else str(e) for e, i in zip(events, is_int)]
+    table._columns = None
+    table._codes = None
+    return table
+
+
+def export_reflections(streamfile, directory, table, mask=None, byte_range=None):
+    """
+    Export the reflections of all (or the selected) crystals of a stream file to a directory with a .npy file per
+    column (h, k, l, I, sigma, peak, background, fs, ss and panel, see reflections.REFLECTION_DTYPE), the crystal of
+    every reflection (crystal.npy, row in the exported crystal table), the reflection offsets of the crystals
+    (offsets.npy), the panel names (panels.npy) and the crystal table (table_*.npy). The stream file is read chunk by
+    chunk and the reflections are written in batches (see reflections.iter_reflection_batches), so that the memory
+    usage does not depend on the size of the stream file. Use open_export to memory map the columns.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files of which the chunks are numbered
+        continuously in the table (StreamSet)
+    directory (str)
+        output directory, created if it does not exist
+    table (CrystalTable)
+        crystal table of the stream file (Stream.crystal_table)
+    mask (numpy array)
+        boolean mask of the crystals to export, in the order of the table. All crystals if None.
+    byte_range (tuple)
+        only read the chunks within (start, end) bytes of the stream file, as the table was obtained
+
+    Returns
+    ----------
+    n (int)
+        number of exported reflections
+    """
+    os.makedirs(directory, exist_ok=True)
+    writers = dict((name, ColumnWriter(os.path.join(directory, '%s.npy' %(name)), reflections.REFLECTION_DTYPE[name]))
+                   for name in reflections.REFLECTION_DTYPE.names)
+    writers['crystal'] = ColumnWriter(os.path.join(directory, 'crystal.npy'), np.int32)
+    offsets = ColumnWriter(os.path.join(directory, 'offsets.npy'), np.int64)
+    offsets.write([0])
+    panels = reflections.PanelTable()
+    crystals = 0
+    total = 0
+    try:
+        for refls, counts in reflections.iter_reflection_batches(streamfile, table, mask=mask, byte_range=byte_range,
+                                                                  panels=panels):
+            for name in refls.dtype.names:
+                writers[name].write(refls[name])
+            writers['crystal'].write(np.repeat(np.arange(crystals, crystals + len(counts)), counts))
+            offsets.write(total + np.cumsum(counts))
+            crystals += len(counts)
+            total += len(refls)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        offsets.close()
+
+    mask = np.ones(len(table), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    save_table(directory, table.select(mask))
+    np.save(os.path.join(directory, 'panels.npy'), np.array(panels.panels, dtype=str))
+    return total
+
+
+def open_export(directory, mmap_mode='r'):
+    """
+    Open the reflections exported with export_reflections, the columns are memory mapped so that opening is
+    immediate and only the values that are used are read from disk.
+
+    Parameters
+    ----------
+    directory (str)
+        directory of the export
+    mmap_mode (str)
+        see numpy.load, None to read the columns into memory
+
+    Returns
+    ----------
+    columns (dict)
+        h, k, l, I, sigma, peak, background, fs, ss, panel and crystal arrays, one value per reflection
+    offsets (numpy array)
+        reflections of crystal i are columns[name][offsets[i]:offsets[i+1]]
+    table (CrystalTable)
+        metadata of the exported crystals, row i is crystal i
+    panels (list)
+        panel names, the panel column is the position in this list
+    """
+    names = list(reflections.REFLECTION_DTYPE.names) + ['crystal']
+    columns = dict((name, np.load(os.path.join(directory, '%s.npy' %(name)), mmap_mode=mmap_mode)) for name in names)
+    offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode=mmap_mode)
+    panels = [str(p) for p in np.load(os.path.join(directory, 'panels.npy'))]
+    return columns, offsets, load_table(directory, mmap_mode=mmap_mode), panels
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import mmap
+
+
+class ByteRangeWriter(object):
+    """
+    Write a new stream file by copying byte ranges straight from the source stream file, without
+    creating Python strings for the copied text. Adjacent ranges are merged and copied with
+    os.copy_file_range (in-kernel copy) if available, otherwise from a memory map of the source file.
+
+    Parameters
+    ----------
+    streamfile (str)
+        source CrystFEL stream file
+    f_out (str)
+        output stream file
+    """
+
+    def __init__(self, streamfile, f_out):
+        self.src = open(streamfile, 'rb')
+        self.out = open(f_out, 'wb', buffering=0)
+        self.mm = None
+        self.use_copy_file_range = hasattr(os, 'copy_file_range')
+        self.start = None
+        self.end = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_range(self, start, end):
+        """
+        Copy bytes start:end of the source file to the output file
+        """
+        if self.end == start:
+            self.end = end
+        else:
+            self.flush()
+            self.start = start
+            self.end = end
+
+    def write(self, data):
+        """
+        Write data (bytes) to the output file
+        """
+        self.flush()
+        self.out.write(data)
+
+    def flush(self):
+        if self.start is None:
+            return
+        start = self.start
+        count = self.end - self.start
+        self.start = None
+        self.end = None
+
+        if self.use_copy_file_range:
+            try:
+                while count > 0:
+                    copied = os.copy_file_range(self.src.fileno(), self.out.fileno(), count, offset_src=start)
+                    if copied == 0:
+                        break
+                    start += copied
+                    count -= copied
+            except OSError:
+                #e.g. not supported between these file systems
+                self.use_copy_file_range = False
+
+        if count > 0:
+            if self.mm is None:
+                self.mm = mmap.mmap(self.src.fileno(), 0, access=mmap.ACCESS_READ)
+            with memoryview(self.mm) as view:
+                self.out.write(view[start:start+count])
+
+    def close(self):
+        self.flush()
+        if self.mm is not None:
+            self.mm.close()
+        self.src.close()
+        self.out.close()
+
+
+def write_header(writer, index):
+    """
+    Write the stream header, followed by an empty line as done by Stream.save_random_* functions
+    """
+    writer.write_range(0, index.header_end)
+    writer.write(b'\n')
+
+
+def write_end_chunk(writer, index, chunk, end):
+    """
+    Write the "End chunk" line of the chunk. Copied from the source if it directly follows end, otherwise
+    the first "End chunk" line of the stream is written.
+    """
+    end_line = (index.end_chunk_line + '\n').encode()
+    if end == index.end_line_start[chunk] and index.chunk_end[chunk] - end == len(end_line):
+        writer.write_range(end, index.chunk_end[chunk])
+    else:
+        writer.write(end_line)
+
+
+def write_frames(index, f_out, chunks):
+    """
+    Write the header and the given indexed frames to a new stream file, with the same output as
+    Stream.save_random_indexed_images, by copying byte ranges from the source stream file.
+
+    Parameters
+    ----------
+    index (StreamIndex)
+        chunk index of the source stream file
+    f_out (str)
+        output stream file
+    chunks (list)
+        chunk numbers of the frames, in output order
+    """
+    with ByteRangeWriter(index.streamfile, f_out) as writer:
+        write_header(writer, index)
+        for chunk in chunks:
+            end = index.get_head_end(chunk)
+            writer.write_range(index.chunk_start[chunk], end)
+            for crystal in range(index.crystal_ptr[chunk], index.crystal_ptr[chunk+1]):
+                end = write_crystal(writer, index, chunk, crystal)
+            write_end_chunk(writer, index, chunk, end)
+
+
+def write_crystals(index, f_out, crystals):
+    """
+    Write the header and the given crystals, each as a chunk with the head of its frame, to a new stream file,
+    with the same output as Stream.save_random_indexed_crystals, by copying byte ranges from the source stream file.
+
+    Parameters
+    ----------
+    index (StreamIndex)
+        chunk index of the source stream file
+    f_out (str)
+        output stream file
+    crystals (iterable)
+        (chunk number, number of the crystal within the chunk) of the crystals, in output order
+    """
+    with ByteRangeWriter(index.streamfile, f_out) as writer:
+        write_header(writer, index)
+        for chunk, n in crystals:
+            writer.write_range(index.chunk_start[chunk], index.get_head_end(chunk))
+            end = write_crystal(writer, index, chunk, index.crystal_ptr[chunk] + n)
+            write_end_chunk(writer, index, chunk, end)
+
+
+def write_crystal(writer, index, chunk, crystal):
+    """
+    Write a crystal block. Blank lines in the block are removed as done by the parser, in which case the
+    block needs to be read.
+
+    Returns
+    ----------
+    end (int)
+        byte offset of the end of the crystal block, -1 if the block was not copied as is
+    """
+    start = index.crystal_start[crystal]
+    end = index.crystal_end[crystal]
+    if not index.blank_lines[chunk]:
+        writer.write_range(start, end)
+        return end
+
+    writer.src.seek(start)
+    lines = writer.src.read(end - start).splitlines(keepends=True)
+    writer.write(b''.join([line for line in lines if line != b'\n']))
+    return -1
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import re
+import time
+import numpy as np
+from .stream import Stream, StreamFrames, iter_chunk_data
+from .table import CrystalTable, CELL_PARAMETERS
+from .profiling import Profiler
+
+
+class RunningStats(object):
+    """
+    Online mean and standard deviation of a fixed number of quantities (Welford's algorithm), updated with
+    batches of values that are merged with the running values (Chan et al.), so that the values do not have to be kept.
+
+    Parameters
+    ----------
+    size (int)
+        number of quantities
+    """
+
+    def __init__(self, size):
+        self.n = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+
+    def update(self, values):
+        """
+        Add a batch of values.
+
+        Parameters
+        ----------
+        values (array-like)
+            (n, size) values
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.mean))
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean)**2).sum(axis=0)
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta**2 * self.n * n / total
+        self.n = total
+
+    def get_std(self):
+        """
+        Return the (population) standard deviation, as np.std
+        """
+        if self.n == 0:
+            return np.full(len(self.mean), np.nan)
+        return np.sqrt(self.m2 / self.n)
+
+    def get_mean(self):
+        if self.n == 0:
+            return np.full(len(self.mean), np.nan)
+        return self.mean
+
+
+class StreamFollower(Stream):
+    """
+    Stream file that is still being written (e.g. by indexamajig during a beamtime). Every call to update()
+    only parses the chunks that were completed since the previous update, starting from the end of the last
+    complete chunk. A partially written chunk at the end of the file is left for the next update.
+    The counters are updated incrementally, the cell parameters are accumulated with RunningStats and the rows
+    of the new crystals are appended to the crystal table, so that the table-based methods of Stream (cell
+    clustering, shell statistics, queries) use all crystals parsed so far. The frames and crystals are not kept.
+
+    Parameters
+    ----------
+    streamfile (str)
+        CrystFEL stream file
+    profiler (Profiler)
+        collects the timers and counters of all updates, see Stream. A profiler without progress report if None.
+
+    Attributes
+    ----------
+    offset (int)
+        byte offset up to which the stream file has been parsed (end of the last complete chunk)
+    cell (RunningStats)
+        running mean and standard deviation of a, b, c, alpha, beta and gamma
+    crystal_table (CrystalTable)
+        metadata of all crystals parsed so far
+    """
+
+    def __init__(self, streamfile, profiler=None):
+        self.streamfile = streamfile
+        self.keep_text = False
+        self.index = None
+        self.byte_range = None
+        self.cache = None
+        self.compression = ''
+        self.summary_only = False
+        self.profiler = Profiler() if profiler is None else profiler
+        self.frames = StreamFrames(self)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything that was parsed, the next update starts from the beginning of the stream file.
+        """
+        self.offset = 0
+        self.header = ''
+        self.end_chunk_line = []
+        self.images = 0
+        self.indexed_images = 0
+        self.indexing_methods = []
+        self.frames_per_method = {}
+        self.crystals_per_method = {}
+        self.cell = RunningStats(len(CELL_PARAMETERS))
+        #rows are appended to the open table by every update, self._crystal_table is a snapshot taken when it is read
+        self.table = CrystalTable()
+        self._crystal_table = None
+        self._event_lookup = None
+
+    def parse_stream(self):
+        """
+        Parse the stream file from the beginning up to the last complete chunk.
+        """
+        self.reset()
+        self.update()
+
+    def update(self):
+        """
+        Parse the chunks that were completed since the last update.
+
+        Returns
+        ----------
+        n (int)
+            number of new chunks
+        """
+        if not os.path.isfile(self.streamfile):
+            return 0
+        if os.path.getsize(self.streamfile) < self.offset:
+            print("%s became smaller, parsing it again from the start" %(self.streamfile))
+            self.reset()
+
+        n = 0
+        cells = []
+        table = self.table
+        profiler = self.profiler
+        with profiler.phase('parse'), open(self.streamfile, 'rb') as s:
+            data = iter_chunk_data(s, self.offset)
+            _, header = next(data)
+            for offset, chunk in data:
+                #the last line of a chunk that is still being written can be incomplete
+                if not chunk.endswith(b'\n'):
+                    break
+                if self.offset == 0:
+                    self.header = header.decode()
+                if not self.end_chunk_line:
+                    self.end_chunk_line = [re.sub("\n", "", chunk.decode().splitlines()[-1]),]
+                self.offset = offset + len(chunk)
+                n += 1
+                profiler.count('bytes', len(chunk))
+                profiler.count('chunks')
+
+                frame = self.parse_chunk_data(offset, chunk)
+                self.images += 1
+                if frame.indexed:
+                    table.append_frame(frame, self.indexed_images, self.images - 1)
+                    self.indexed_images += 1
+                    if frame.indexing not in self.indexing_methods:
+                        self.indexing_methods.append(frame.indexing)
+                        self.frames_per_method[frame.indexing] = 0
+                        self.crystals_per_method[frame.indexing] = 0
+                    self.frames_per_method[frame.indexing] += 1
+                    self.crystals_per_method[frame.indexing] += len(frame.crystals)
+                    profiler.count('indexed_frames')
+                    profiler.count('crystals', len(frame.crystals))
+                    cells += [(c.a, c.b, c.c, c.alpha, c.beta, c.gamma) for c in frame.crystals]
+                profiler.progress()
+        profiler.finish_progress()
+        self.cell.update(cells)
+        if n:
+            self._crystal_table = None
+            self._event_lookup = None
+        return n
+
+    @property
+    def crystal_table(self):
+        """
+        CrystalTable with the metadata of all crystals parsed so far. The rows that are appended by update() are
+        copied into a new finalized table when the table is read after an update.
+        """
+        if self._crystal_table is None:
+            self._crystal_table = self.table.snapshot()
+        return self._crystal_table
+
+    def get_cell_stats(self):
+        """
+        get statistics on cell_parameters, from the running accumulators
+
+        Returns
+        ----------
+        average and standard deviation of the a, b and c axes (in nm)
+        """
+        av = self.cell.get_mean()
+        stdev = self.cell.get_std()
+        return av[0], stdev[0], av[1], stdev[1], av[2], stdev[2]
+
+    def get_angle_stats(self):
+        """
+        get statistics on the cell angles, from the running accumulators
+
+        Returns
+        ----------
+        average and standard deviation of the alpha, beta and gamma angles (in degr.)
+        """
+        av = self.cell.get_mean()
+        stdev = self.cell.get_std()
+        return av[3], stdev[3], av[4], stdev[4], av[5], stdev[5]
+
+    def get_follow_summary(self):
+        """
+        Print the stream summary and the cell statistics
+        """
+        self.get_stream_summary()
+        a, sa, b, sb, c, sc = self.get_cell_stats()
+        al, sal, be, sbe, ga, sga = self.get_angle_stats()
+        print(("Unit cell: a = %.3f +/- %.3f nm, b = %.3f +/- %.3f nm, c = %.3f +/- %.3f nm" %(a, sa, b, sb, c, sc)))
+        print(("           al = %.2f +/- %.2f, be = %.2f +/- %.2f, ga = %.2f +/- %.2f deg" %(al, sal, be, sbe, ga, sga)))
+
+    def follow(self, interval=60, max_updates=None, report=False):
+        """
+        Update the statistics and print the summary every interval seconds, until interrupted (Ctrl-C)
+        or after max_updates updates.
+
+        Parameters
+        ----------
+        interval (float)
+            time between two updates (in s)
+        max_updates (int)
+            number of updates, None to follow the stream file until interrupted
+        report (bool)
+            also print the timers, counters and peak memory of self.profiler, summed over all updates
+        """
+        updates = 0
+        try:
+            while max_updates is None or updates < max_updates:
+                if updates > 0:
+                    time.sleep(interval)
+                n = self.update()
+                updates += 1
+                print(("----> %s, %s: %d new frames <---- " %(self.streamfile, time.strftime('%H:%M:%S'), n)))
+                self.get_follow_summary()
+                print("------------------")
+                if report:
+                    self.profiler.report()
+                    print("------------------")
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import numpy as np
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.idx.npz'
+
+
+class StreamIndex(object):
+    """
+    Byte-offset index of the chunks and crystals in a CrystFEL stream file. The index is built in a single pass
+    over the stream file and can be stored next to the stream file, so that it does not need to be rebuilt
+    as long as the size and modification time of the stream file do not change.
+
+    Parameters
+    ----------
+    streamfile (str)
+        CrystFEL stream file
+
+    Attributes
+    ----------
+    header_end (int)
+        byte offset of the first chunk, i.e. the size of the stream header
+    end_chunk_line (str)
+        first "End chunk" line, without newline
+    chunk_start, chunk_end (numpy arrays)
+        byte offsets of the beginning and end of every chunk
+    end_line_start (numpy array)
+        byte offset of the "End chunk" line of every chunk
+    blank_lines (numpy array)
+        whether the crystal blocks of the chunk contain blank lines (these are not kept by the parser)
+    indexed (numpy array)
+        whether the chunk was indexed
+    method (numpy array)
+        code of the indexing method in self.methods, -1 for unindexed chunks
+    filename (numpy array)
+        code of the image filename in self.filenames
+    events (numpy array)
+        event of every chunk as string
+    crystal_ptr (numpy array)
+        crystals of chunk i are crystal_ptr[i]:crystal_ptr[i+1]. Only crystals of indexed chunks are stored.
+    crystal_start, crystal_end (numpy arrays)
+        byte offsets of the beginning and end of every crystal block
+    """
+
+    def __init__(self, streamfile):
+        self.streamfile = streamfile
+        self.header_end = 0
+        self.end_chunk_line = ''
+        self.methods = []
+        self.filenames = []
+
+    @classmethod
+    def get_index_file(cls, streamfile):
+        return streamfile + INDEX_SUFFIX
+
+    @classmethod
+    def open(cls, streamfile, save=True):
+        """
+        Load the index of a stream file if a valid one exists, otherwise build it (and save it).
+
+        Parameters
+        ----------
+        streamfile (str)
+            CrystFEL stream file
+        save (bool)
+            write the newly built index next to the stream file
+
+        Returns
+        ----------
+        index (StreamIndex)
+        """
+        index = cls.load(streamfile)
+        if index is None:
+            index = cls.build(streamfile)
+            if save:
+                index.save()
+        return index
+
+    @classmethod
+    def build(cls, streamfile):
+        """
+        Build the index in a single pass over the stream file.
+        """
+        from .stream import parse_event
+
+        index = cls(streamfile)
+        stat = os.stat(streamfile)
+        index.size = stat.st_size
+        index.mtime = stat.st_mtime_ns
+
+        chunk_start = []
+        chunk_end = []
+        end_line_start = []
+        blank_lines = []
+        indexed = []
+        method = []
+        filename = []
+        events = []
+        crystal_ptr = [0]
+        crystal_start = []
+        crystal_end = []
+        method_codes = {}
+        filename_codes = {}
+
+        offset = 0
+        in_header = True
+        in_chunk = False
+        with open(streamfile, 'rb') as s:
+            for line in s:
+                if b'Begin chunk' in line:
+                    if in_header:
+                        index.header_end = offset
+                        in_header = False
+                    in_chunk = True
+                    start = offset
+                    fle = ''
+                    event = ''
+                    meth = -1
+                    crystals = []
+                    in_crystal = False
+                    blank = False
+
+                elif not in_chunk:
+                    pass
+
+                elif line == b'\n':
+                    blank = blank or in_crystal
+
+                elif b'Image filename' in line:
+                    fle = line.split()[2].decode()
+
+                elif b'Event:' in line:
+                    event = str(parse_event(line.decode()))
+
+                elif b'indexed_by' in line and b'none' not in line:
+                    name = line.split()[2].strip().decode()
+                    if name not in method_codes:
+                        method_codes[name] = len(method_codes)
+                    meth = method_codes[name]
+
+                elif b'Begin crystal' in line:
+                    begin_crystal = offset
+                    in_crystal = True
+
+                elif b'End crystal' in line:
+                    crystals.append((begin_crystal, offset + len(line)))
+                    in_crystal = False
+
+                elif b'End chunk' in line:
+                    if not index.end_chunk_line:
+                        index.end_chunk_line = line.decode().replace("\n", "")
+                    if fle not in filename_codes:
+                        filename_codes[fle] = len(filename_codes)
+                    chunk_start.append(start)
+                    chunk_end.append(offset + len(line))
+                    end_line_start.append(offset)
+                    blank_lines.append(blank)
+                    indexed.append(meth >= 0)
+                    method.append(meth)
+                    filename.append(filename_codes[fle])
+                    events.append(event)
+                    if meth >= 0:
+                        for begin_crystal, end_crystal in crystals:
+                            crystal_start.append(begin_crystal)
+                            crystal_end.append(end_crystal)
+                    crystal_ptr.append(len(crystal_start))
+                    in_chunk = False
+
+                offset += len(line)
+
+        if in_header:
+            index.header_end = offset
+
+        index.methods = list(method_codes)
+        index.filenames = list(filename_codes)
+        index.chunk_start = np.array(chunk_start, dtype=np.int64)
+        index.chunk_end = np.array(chunk_end, dtype=np.int64)
+        index.end_line_start = np.array(end_line_start, dtype=np.int64)
+        index.blank_lines = np.array(blank_lines, dtype=bool)
+        index.indexed = np.array(indexed, dtype=bool)
+        index.method = np.array(method, dtype=np.int16)
+        index.filename = np.array(filename, dtype=np.int32)
+        index.events = np.array(events, dtype=str)
+        index.crystal_ptr = np.array(crystal_ptr, dtype=np.int64)
+        index.crystal_start = np.array(crystal_start, dtype=np.int64)
+        index.crystal_end = np.array(crystal_end, dtype=np.int64)
+        return index
+
+    def save(self, index_file=None):
+        """
+        Save the index to the sidecar file (stream file name + '.idx.npz').
+        The index is not saved if the directory is not writable.
+        """
+        if index_file is None:
+            index_file = self.get_index_file(self.streamfile)
+        tmp_file = index_file + '.tmp'
+        try:
+            with open(tmp_file, 'wb') as out:
+                np.savez(out,
+                         version = np.array(INDEX_VERSION),
+                         size = np.array(self.size),
+                         mtime = np.array(self.mtime),
+                         header_end = np.array(self.header_end),
+                         end_chunk_line = np.array(self.end_chunk_line),
+                         methods = np.array(self.methods, dtype=str),
+                         filenames = np.array(self.filenames, dtype=str),
+                         chunk_start = self.chunk_start,
+                         chunk_end = self.chunk_end,
+                         end_line_start = self.end_line_start,
+                         blank_lines = self.blank_lines,
+                         indexed = self.indexed,
+                         method = self.method,
+                         filename = self.filename,
+                         events = self.events,
+                         crystal_ptr = self.crystal_ptr,
+                         crystal_start = self.crystal_start,
+                         crystal_end = self.crystal_end)
+            os.replace(tmp_file, index_file)
+        except OSError as e:
+            print("Could not save stream index to %s: %s" %(index_file, e))
+
+    @classmethod
+    def load(cls, streamfile, index_file=None):
+        """
+        Load the index from the sidecar file.
+
+        Returns
+        ----------
+        index (StreamIndex)
+            None if there is no index file or if the index is outdated (size or modification time of the stream
+            file changed)
+        """
+        if index_file is None:
+            index_file = cls.get_index_file(streamfile)
+        if not os.path.isfile(index_file):
+            return None
+
+        stat = os.stat(streamfile)
+        try:
+            with np.load(index_file) as data:
+                if (int(data['version']) != INDEX_VERSION or int(data['size']) != stat.st_size
+                        or int(data['mtime']) != stat.st_mtime_ns):
+                    return None
+                index = cls(streamfile)
+                index.size = stat.st_size
+                index.mtime = stat.st_mtime_ns
+                index.header_end = int(data['header_end'])
+                index.end_chunk_line = str(data['end_chunk_line'])
+                index.methods = [str(m) for m in data['methods']]
+                index.filenames = [str(f) for f in data['filenames']]
+                for key in ['chunk_start', 'chunk_end', 'end_line_start', 'blank_lines', 'indexed', 'method', 'filename', 'events',
+                            'crystal_ptr', 'crystal_start', 'crystal_end']:
+                    setattr(index, key, data[key])
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+    def __len__(self):
+        return len(self.chunk_start)
+
+    def get_event(self, chunk):
+        """
+        Return the event of a chunk with the same type as parsed from the stream (int if possible)
+        """
+        event = str(self.events[chunk])
+        try:
+            return int(event)
+        except ValueError:
+            return event
+
+    def get_filename(self, chunk):
+        return self.filenames[self.filename[chunk]]
+
+    def get_indexing(self, chunk):
+        if self.method[chunk] < 0:
+            return 'none'
+        return self.methods[self.method[chunk]]
+
+    def get_frame_chunks(self, methods=None):
+        """
+        Return the chunk numbers of the indexed frames, in file order.
+
+        Parameters
+        ----------
+        methods (list)
+            only return frames indexed with one of these indexing methods. All indexed frames if None.
+        """
+        if methods is None:
+            return np.flatnonzero(self.indexed)
+        codes = [self.methods.index(m) for m in methods if m in self.methods]
+        return np.flatnonzero(np.isin(self.method, codes))
+
+    def get_crystal_counts(self):
+        """
+        Return the number of crystals in every chunk
+        """
+        return np.diff(self.crystal_ptr)
+
+    def get_crystals(self, chunks):
+        """
+        Return (chunk, crystal number within the chunk) for all crystals of the given chunks, in the given order.
+        """
+        chunks = np.asarray(chunks, dtype=np.int64)
+        counts = self.get_crystal_counts()[chunks]
+        crystal_chunks = np.repeat(chunks, counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        crystal_numbers = np.arange(len(crystal_chunks)) - first
+        return crystal_chunks, crystal_numbers
+
+    def get_head_end(self, chunk):
+        """
+        Return the byte offset of the end of the frame head (see Frame.head), i.e. the first crystal
+        or the "End chunk" line if there are no crystals.
+        """
+        if self.crystal_ptr[chunk+1] > self.crystal_ptr[chunk]:
+            return self.crystal_start[self.crystal_ptr[chunk]]
+        return self.end_line_start[chunk]
+
+    def read_header(self, s):
+        """
+        Read the stream header from the open (binary) stream file s.
+        """
+        s.seek(0)
+        return s.read(self.header_end).decode()
+
+    def read_chunk(self, s, chunk):
+        """
+        Read a chunk from the open (binary) stream file s.
+
+        Returns
+        ----------
+        (offset, data) (tuple)
+            byte offset of the chunk and its content (bytes)
+        """
+        s.seek(self.chunk_start[chunk])
+        return self.chunk_start[chunk], s.read(self.chunk_end[chunk] - self.chunk_start[chunk])
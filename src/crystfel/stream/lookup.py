@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+
+
+def get_event_key(event):
+    """
+    Return the event as compared in the lookup: the event number or tag as string, without the leading "//" of
+    CrystFEL event lists, so that 3, "3" and "//3" are the same event.
+    """
+    event = str(event).strip().split('//')[-1]
+    try:
+        return str(int(event))
+    except ValueError:
+        return event
+
+
+def read_event_list(listfile):
+    """
+    Read a list of images and events, e.g. the output of a hit classification or a CrystFEL input list.
+    Every line contains an image filename, optionally followed by the event ("//3", "3" or a tag).
+    Empty lines and lines starting with # are skipped.
+
+    Returns
+    ----------
+    pairs (list)
+        (filename, event) tuples, the event is '' if not given
+    """
+    pairs = []
+    with open(listfile) as f:
+        for line in f:
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            pairs.append((words[0], words[1] if len(words) > 1 else ''))
+    return pairs
+
+
+class EventLookup(object):
+    """
+    Lookup of the chunks of a stream file by (image filename, event). The filenames and events are mapped to the
+    codes assigned while parsing (hash tables), and every chunk gets a single integer key that is kept in a sorted
+    array, which takes 16 bytes per chunk instead of a Python dictionary of (filename, event) tuples (well over
+    100 bytes per chunk). A single lookup is therefore not O(1): it is two hash lookups of the codes followed by an
+    O(log n) binary search of the sorted keys, which is still negligible next to reading a chunk. Lists of pairs are
+    joined with vectorized operations.
+
+    Parameters
+    ----------
+    filenames (list)
+        image filenames, the filename codes are positions in this list
+    filename_codes (numpy array)
+        filename code of every chunk
+    events (list)
+        events, the event codes are positions in this list
+    event_codes (numpy array)
+        event code of every chunk
+    chunks (numpy array)
+        chunk number (position in the stream file) of every chunk
+    """
+
+    def __init__(self, filenames, filename_codes, events, event_codes, chunks):
+        self.filename_codes = dict((f, i) for i, f in reversed(list(enumerate(filenames))))
+        self.event_codes = dict((get_event_key(e), i) for i, e in reversed(list(enumerate(events))))
+        #events that are the same after get_event_key get the same code
+        recode = np.array([self.event_codes[get_event_key(e)] for e in events], dtype=np.int64)
+        self.n_events = max(len(events), 1)
+        keys = np.asarray(filename_codes, dtype=np.int64) * self.n_events
+        keys += recode[event_codes] if len(recode) else np.asarray(event_codes, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.chunks = np.asarray(chunks, dtype=np.int64)[order]
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Lookup of the indexed frames of a CrystalTable
+        """
+        first = np.flatnonzero(np.r_[True, table.chunk[1:] != table.chunk[:-1]]) if len(table) else np.zeros(0, dtype=np.int64)
+        return cls(table.filenames, table.filename[first], table.events, table.event[first], table.chunk[first])
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        Lookup of all chunks, indexed or not, of a StreamIndex
+        """
+        events, event_codes = np.unique(index.events, return_inverse=True)
+        return cls(index.filenames, index.filename, list(events), event_codes, np.arange(len(index.filename)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_keys(self, pairs):
+        """
+        Return the key of every (filename, event) pair, -1 if the filename or the event does not occur in the stream
+        """
+        keys = np.empty(len(pairs), dtype=np.int64)
+        for i, (filename, event) in enumerate(pairs):
+            f = self.filename_codes.get(filename)
+            e = self.event_codes.get(get_event_key(event))
+            keys[i] = -1 if f is None or e is None else f * self.n_events + e
+        return keys
+
+    def get(self, filename, event):
+        """
+        Return the chunk number of an image and event (the first one if there are several), -1 if not found
+        """
+        key = self.get_keys([(filename, event)])[0]
+        i = np.searchsorted(self.keys, key)
+        if key < 0 or i == len(self.keys) or self.keys[i] != key:
+            return -1
+        return int(self.chunks[i])
+
+    def join(self, pairs):
+        """
+        Find the chunks of a list of (filename, event) pairs.
+
+        Returns
+        ----------
+        chunks (numpy array)
+            sorted chunk numbers of all chunks that match one of the pairs
+        found (numpy array)
+            for every pair, whether it matches at least one chunk
+        """
+        keys = self.get_keys(pairs)
+        matching = np.isin(self.keys, keys)
+        i = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        found = (keys >= 0) & (self.keys[i] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return np.sort(self.chunks[matching]), found
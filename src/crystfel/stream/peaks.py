@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from .reflections import PanelTable
+from .compression import open_stream
+
+#fs/px ss/px (1/d)/nm^-1 Intensity Panel
+PEAK_DTYPE = np.dtype([('fs', np.float32), ('ss', np.float32), ('one_over_d', np.float32),
+                       ('intensity', np.float32), ('panel', np.int16)])
+N_COLUMNS = 5
+BEGIN_PEAKS = b'Peaks from peak search'
+END_PEAKS = b'End of peak list'
+#number of chunks of which the peak rows are decoded at once
+BATCH_SIZE = 10000
+
+
+def decode_rows(rows, panels):
+    """
+    Decode peak rows (fs/px ss/px (1/d)/nm^-1 Intensity Panel) directly into a structured array with numpy's
+    text parser, the panel names are coded with panels (reflections.PanelTable). Rows that do not have the expected
+    number of columns are skipped.
+    """
+    if not rows:
+        return np.empty(0, dtype=PEAK_DTYPE)
+    try:
+        return np.loadtxt(rows, dtype=PEAK_DTYPE, usecols=range(N_COLUMNS), ndmin=1,
+                          converters={N_COLUMNS-1: panels.get_code})
+    except ValueError:
+        rows = [row for row in rows if len(row.split()) >= N_COLUMNS]
+        return decode_rows(rows, panels) if rows else np.empty(0, dtype=PEAK_DTYPE)
+
+
+def get_peak_rows(chunk):
+    """
+    Return the rows of the peak list of a chunk (bytes), without the column names, as a single bytes object
+    with one row per line, and the number of rows.
+    """
+    b = chunk.find(BEGIN_PEAKS)
+    if b < 0:
+        return b'', 0
+    e = chunk.find(END_PEAKS, b)
+    if e < 0:
+        return b'', 0
+    #skip the "Peaks from peak search" line and the column names
+    b = chunk.find(b'\n', chunk.find(b'\n', b, e) + 1, e) + 1
+    if b <= 0:
+        return b'', 0
+    rows = chunk[b:e]
+    if b'\n\n' in rows or rows.startswith(b'\n'):
+        rows = b''.join(line for line in rows.splitlines(keepends=True) if line.strip())
+    return rows, rows.count(b'\n')
+
+
+def decode_batch(rows, counts, panels):
+    """
+    Decode the peak rows (bytes) of a batch of chunks at once, see get_peak_rows. The panel names are coded with
+    panels (reflections.PanelTable).
+
+    Returns
+    ----------
+    peaks (numpy structured array)
+        peaks of all chunks of the batch
+    counts (list)
+        number of peaks of every chunk
+    """
+    peaks = decode_rows(b''.join(rows).decode().splitlines(), panels)
+    if len(peaks) != sum(counts):
+        #some rows were skipped, decode chunk by chunk to attribute the peaks correctly
+        arrays = [decode_rows(r.decode().splitlines(), panels) for r in rows]
+        counts = [len(a) for a in arrays]
+        peaks = np.concatenate(arrays) if arrays else peaks
+    return peaks, counts
+
+
+def decode_peaks(streamfile, byte_range=None):
+    """
+    Decode the peak lists of all chunks of a stream file, indexed or not, into a single structured array.
+    The rows of many chunks are decoded at once.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files of which the chunks are numbered
+        continuously (StreamSet)
+    byte_range (tuple)
+        only decode the chunks within (start, end) bytes of the stream file
+
+    Returns
+    ----------
+    peaks (numpy structured array)
+        peaks of all chunks, concatenated (see PEAK_DTYPE)
+    offsets (numpy array)
+        peaks of chunk i are peaks[offsets[i]:offsets[i+1]]
+    indexed (numpy array)
+        whether chunk i was indexed
+    panels (list)
+        panel names, the panel field of the peaks is the position in this list
+    """
+    from .stream import iter_chunk_data
+
+    start, end = byte_range if byte_range else (0, None)
+    arrays = []
+    counts = []
+    indexed = []
+    rows = []
+    batch = []
+    panels = PanelTable()
+    #the rows of a batch of chunks are decoded at once
+    for f in [streamfile] if isinstance(streamfile, str) else streamfile:
+        with open_stream(f) as s:
+            data = iter_chunk_data(s, start, end)
+            next(data)
+            for _, chunk in data:
+                chunk_rows, n = get_peak_rows(chunk)
+                rows.append(chunk_rows)
+                batch.append(n)
+                i = chunk.find(b'indexed_by')
+                indexed.append(i >= 0 and b'none' not in chunk[i:chunk.find(b'\n', i)])
+                if len(batch) == BATCH_SIZE:
+                    peak_array, batch = decode_batch(rows, batch, panels)
+                    arrays.append(peak_array)
+                    counts += batch
+                    rows = []
+                    batch = []
+    peak_array, batch = decode_batch(rows, batch, panels)
+    arrays.append(peak_array)
+    counts += batch
+
+    peaks = np.concatenate(arrays)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return peaks, offsets, np.array(indexed, dtype=bool), panels.panels
+
+
+def get_peaks_per_frame(offsets):
+    """
+    Return the number of peaks of every chunk
+    """
+    return np.diff(offsets)
+
+
+def get_peak_count_histograms(offsets, indexed, bins=None):
+    """
+    Histograms of the number of peaks per frame, for indexed and unindexed frames separately.
+
+    Parameters
+    ----------
+    offsets (numpy array)
+        see decode_peaks
+    indexed (numpy array)
+        see decode_peaks
+    bins (int or sequence)
+        bins as for numpy.histogram. By default one bin per number of peaks.
+
+    Returns
+    ----------
+    edges (numpy array)
+        bin edges
+    hist_indexed, hist_unindexed (numpy arrays)
+        number of indexed and unindexed frames per bin
+    """
+    counts = get_peaks_per_frame(offsets)
+    if bins is None:
+        bins = np.arange(counts.max() + 2 if len(counts) else 2)
+    hist_indexed, edges = np.histogram(counts[indexed], bins=bins)
+    hist_unindexed, _ = np.histogram(counts[~indexed], bins=edges)
+    return edges, hist_indexed, hist_unindexed
+
+
+def get_radial_histogram(peaks, bins=50, offsets=None, frames=None):
+    """
+    Histogram of the resolution (1/d in nm^-1) of the peaks.
+
+    Parameters
+    ----------
+    peaks (numpy structured array)
+        see decode_peaks
+    bins (int or sequence)
+        bins as for numpy.histogram
+    offsets (numpy array)
+        see decode_peaks, only required when frames is given
+    frames (numpy array)
+        boolean mask of the chunks of which the peaks are used, e.g. indexed. All peaks if None.
+
+    Returns
+    ----------
+    edges (numpy array)
+        bin edges (in nm^-1)
+    hist (numpy array)
+        number of peaks per bin
+    """
+    one_over_d = peaks['one_over_d']
+    if frames is not None:
+        one_over_d = one_over_d[np.repeat(frames, get_peaks_per_frame(offsets))]
+    hist, edges = np.histogram(one_over_d, bins=bins)
+    return edges, hist
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import queue
+import threading
+from .compression import get_compressor
+
+#number of frames or crystals that are formatted (and compressed) and written at once
+BATCH_SIZE = 256
+#maximum number of batches waiting in every queue
+QUEUE_SIZE = 8
+#end of the items of a stage
+DONE = object()
+
+
+def _put(q, item, stop):
+    """
+    Put an item in a bounded queue, give up if the pipeline is stopped. Returns whether the item was put.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """
+    Get an item from a queue, DONE if the pipeline is stopped
+    """
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return DONE
+
+
+def write_pipelined(items, format_item, out, workers=1, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE, compress=None):
+    """
+    Format items (e.g. frames or crystals) and write them to an output file with a reader thread, formatting
+    workers and a writer thread, connected by bounded queues. The reader thread loops over the items (reading and
+    parsing the stream file if the frames are not kept in memory), the workers turn batches of items into bytes
+    and the writer thread writes the batches in their original order. Reading, formatting and writing (and the
+    compression of the output) overlap, while at most about 2 * queue_size batches are kept in memory.
+
+    Parameters
+    ----------
+    items (iterable)
+        items to write, in output order
+    format_item (function)
+        returns the text (str) of an item, including the final newline
+    out (file object)
+        output file opened in binary mode (see compression.open_output)
+    workers (int)
+        number of formatting threads
+    batch_size (int)
+        number of items per batch
+    queue_size (int)
+        maximum number of batches in every queue
+    compress (function)
+        applied by the workers to the bytes of every batch, e.g. gzip.compress (see save_pipelined)
+
+    Returns
+    ----------
+    n (int)
+        number of items written
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    blocks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    written = [0]
+
+    def read():
+        try:
+            number = 0
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) == batch_size:
+                    if not _put(batches, (number, batch), stop):
+                        return
+                    number += 1
+                    batch = []
+            if batch:
+                _put(batches, (number, batch), stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(workers):
+                _put(batches, DONE, stop)
+
+    def format_batches():
+        try:
+            while True:
+                batch = _get(batches, stop)
+                if batch is DONE:
+                    break
+                number, batch = batch
+                data = ''.join([format_item(item) for item in batch]).encode()
+                if compress is not None:
+                    data = compress(data)
+                if not _put(blocks, (number, data, len(batch)), stop):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(blocks, DONE, stop)
+
+    def write():
+        try:
+            #batches formatted by several workers can arrive out of order
+            pending = {}
+            number = 0
+            finished = 0
+            while finished < workers:
+                block = _get(blocks, stop)
+                if block is DONE:
+                    if stop.is_set():
+                        return
+                    finished += 1
+                    continue
+                pending[block[0]] = block[1:]
+                while number in pending:
+                    data, n = pending.pop(number)
+                    out.write(data)
+                    written[0] += n
+                    number += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = ([threading.Thread(target=read, daemon=True)] +
+               [threading.Thread(target=format_batches, daemon=True) for _ in range(workers)] +
+               [threading.Thread(target=write, daemon=True)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return written[0]
+
+
+def use_pipeline(f_out):
+    """
+    Whether writing a stream file with save_pipelined is expected to be faster than writing it frame by frame:
+    if the output is compressed and several CPUs are available to compress the batches in parallel. Otherwise
+    formatting is cheap compared to the thread overhead.
+    """
+    return get_compressor(f_out) is not None and (os.cpu_count() or 1) > 1
+
+
+def save_pipelined(f_out, header, items, format_item, workers=None, batch_size=BATCH_SIZE):
+    """
+    Write a stream file with write_pipelined: the header, followed by an empty line, and the formatted items.
+    If the output file is compressed, every batch is compressed by the workers as a separate compressed stream,
+    in parallel as the compression libraries release the GIL, and the streams are concatenated. The content is
+    the same as when compressing the file as a whole.
+
+    Parameters
+    ----------
+    f_out (str)
+        output stream file, compressed if it ends with .gz, .bz2 or .xz
+    header (str)
+        stream header
+    items (iterable)
+        frames or crystals, in output order
+    format_item (function)
+        returns the text (str) of an item, including the final newline
+    workers (int)
+        number of formatting threads, the number of CPUs for compressed output files and 1 otherwise if None
+    batch_size (int)
+        number of items per batch
+
+    Returns
+    ----------
+    n (int)
+        number of items written
+    """
+    compress = get_compressor(f_out)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if compress is not None else 1
+    with open(f_out, 'wb') as out:
+        data = (header + '\n').encode()
+        out.write(compress(data) if compress is not None else data)
+        return write_pipelined(items, format_item, out, workers=workers, batch_size=batch_size, compress=compress)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import sys
+import time
+import contextlib
+
+#phases that are timed by Stream, in the order of the report
+PHASES = ('read', 'parse', 'select', 'write')
+#counters that are updated by Stream
+COUNTERS = ('bytes', 'lines', 'chunks', 'indexed_frames', 'crystals', 'written_chunks')
+
+
+def get_peak_memory():
+    """
+    Return the peak resident memory of the current process (in MB), None if it cannot be obtained on this platform
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #kilobytes on Linux, bytes on macOS
+    return peak / 1024.**2 if sys.platform == 'darwin' else peak / 1024.
+
+
+def print_progress(profiler, final=False):
+    """
+    Default progress callback: print the number of parsed chunks and indexed frames on a single line that is
+    overwritten, and clear the line at the end.
+    """
+    prog = '%7i frames parsed, %7i indexed frames found' % (profiler.counters.get('chunks', 0),
+                                                           profiler.counters.get('indexed_frames', 0))
+    if final:
+        print(' ' * len(prog), end='\r')
+    else:
+        print(prog, end='\r')
+
+
+class Profiler(object):
+    """
+    Collects the time spent per phase (read, parse, select, write), counters (bytes, lines, chunks, crystals, ...),
+    optionally the peak memory, and calls a progress callback at most once per interval.
+    Timers of nested phases are also included in the outer phase, e.g. frames that are parsed while writing.
+
+    Parameters
+    ----------
+    progress (function)
+        called as progress(profiler) at most every interval seconds while parsing, and as
+        progress(profiler, final=True) when parsing is finished. No progress is reported if None.
+    interval (float)
+        minimum time between two progress calls (in s)
+    memory (bool)
+        probe the peak memory of the process at the end of every phase
+    """
+
+    def __init__(self, progress=None, interval=0.5, memory=False):
+        self.progress_callback = progress
+        self.interval = interval
+        self.memory = memory
+        self.timers = {}
+        self.counters = {}
+        self.peak_memory = None
+        self._last_progress = time.monotonic()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager that adds the time spent in the block to the timer of a phase
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def add_time(self, name, seconds):
+        """
+        Add time (in s) to the timer of a phase, for loops in which a context manager is too costly
+        """
+        self.timers[name] = self.timers.get(name, 0.) + seconds
+        if self.memory:
+            self.probe_memory()
+
+    def count(self, name, n=1):
+        """
+        Increase a counter
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def probe_memory(self):
+        """
+        Update the peak memory of the process (in MB)
+        """
+        self.peak_memory = get_peak_memory()
+        return self.peak_memory
+
+    def progress(self):
+        """
+        Call the progress callback if the last call was at least interval seconds ago
+        """
+        if self.progress_callback is None:
+            return
+        now = time.monotonic()
+        if now - self._last_progress >= self.interval:
+            self._last_progress = now
+            self.progress_callback(self)
+
+    def finish_progress(self):
+        """
+        Final call of the progress callback, e.g. to clear the progress message
+        """
+        if self.progress_callback is not None:
+            self.progress_callback(self, final=True)
+
+    def reset(self):
+        """
+        Set all timers and counters to zero
+        """
+        self.timers = {}
+        self.counters = {}
+        self.peak_memory = None
+
+    def get_metrics(self):
+        """
+        Returns
+        ----------
+        metrics (dict)
+            timers (in s), counters and peak memory (in MB, None if not probed)
+        """
+        if self.memory:
+            self.probe_memory()
+        return {'timers': dict(self.timers), 'counters': dict(self.counters), 'peak_memory_mb': self.peak_memory}
+
+    def report(self):
+        """
+        Print the timers, the counters, the throughput and the peak memory
+        """
+        metrics = self.get_metrics()
+        timers = metrics['timers']
+        counters = metrics['counters']
+        names = [p for p in PHASES if p in timers] + [p for p in timers if p not in PHASES]
+        print("Time per phase:")
+        for name in names:
+            print(("   %s: %.3f s" %(name, timers[name])))
+        print("Counters:")
+        for name in [c for c in COUNTERS if c in counters] + [c for c in counters if c not in COUNTERS]:
+            print(("   %s: %d" %(name, counters[name])))
+        reading = timers.get('read', 0.) + timers.get('parse', 0.)
+        if reading > 0 and counters.get('bytes'):
+            print(("Read and parse throughput: %.1f MB/s, %.0f chunks/s" %(counters['bytes'] / 1024.**2 / reading,
+                   counters.get('chunks', 0) / reading)))
+        if metrics['peak_memory_mb'] is not None:
+            print(("Peak memory: %.0f MB" %(metrics['peak_memory_mb'])))
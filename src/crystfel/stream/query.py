@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from .table import CELL_PARAMETERS
+
+
+def get_event_numbers(table):
+    """
+    Return the event of every crystal as a number, NaN if the event is not a number (e.g. a tag)
+    """
+    events = np.array([e if isinstance(e, int) else np.nan for e in table.events], dtype=np.float64)
+    if len(events) == 0:
+        return np.full(len(table), np.nan)
+    return events[table.event]
+
+
+def crystal_mask(table, cell=None, tolerance=0.01, angle_tolerance=1., resolution=None, methods=None, events=None):
+    """
+    Evaluate selection criteria on all crystals of a CrystalTable at once. Criteria that are None are not applied.
+
+    Parameters
+    ----------
+    table (CrystalTable)
+        crystal metadata
+    cell (list)
+        target unit cell: a, b, c (in nm), alpha, beta, gamma (in degr.). Angles can be omitted.
+    tolerance (float)
+        maximum relative deviation of a, b and c from the target cell, e.g. 0.01 for 1%
+    angle_tolerance (float)
+        maximum deviation of the angles from the target cell (in degr.)
+    resolution (float)
+        only crystals with a resolution better than (or equal to) this resolution (in A)
+    methods (list)
+        indexing methods, as given in the stream file
+    events (tuple)
+        (first, last) event numbers, both included. Crystals with an event that is not a number are excluded.
+
+    Returns
+    ----------
+    mask (numpy array)
+        boolean mask of the selected crystals, in the order of the table
+    """
+    mask = np.ones(len(table), dtype=bool)
+    if cell is not None:
+        for name, target in zip(CELL_PARAMETERS[:3], cell[:3]):
+            mask &= np.abs(getattr(table, name) - target) <= tolerance * target
+        for name, target in zip(CELL_PARAMETERS[3:], cell[3:]):
+            mask &= np.abs(getattr(table, name) - target) <= angle_tolerance
+    if resolution is not None:
+        mask &= table.res <= resolution
+    if methods is not None:
+        mask &= table.get_method_mask(methods)
+    if events is not None:
+        first, last = events
+        numbers = get_event_numbers(table)
+        #comparisons with NaN are False
+        mask &= (numbers >= first) & (numbers <= last)
+    return mask
+
+
+def get_frame_selection(table, mask):
+    """
+    Return the numbers of the indexed frames with at least one selected crystal, and for all crystals of these
+    frames (in the order of the table) whether they are selected.
+    """
+    frames = np.unique(table.frame[mask])
+    crystals = mask[np.isin(table.frame, frames)]
+    return frames, crystals
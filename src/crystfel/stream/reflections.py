@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+
+REFLECTION_DTYPE = np.dtype([('h', np.int16), ('k', np.int16), ('l', np.int16),
+                             ('I', np.float32), ('sigma', np.float32),
+                             ('peak', np.float32), ('background', np.float32),
+                             ('fs', np.float32), ('ss', np.float32),
+                             ('panel', np.int16)])
+N_COLUMNS = 10
+#number of reflection rows that are decoded at once when reading a stream file
+BATCH_SIZE = 100000
+BEGIN_REFLECTIONS = b'Reflections measured after indexing'
+END_REFLECTIONS = b'End of reflections'
+
+
+class PanelTable(object):
+    """
+    Panel names of decoded reflections or peaks: the panel field of the arrays is the position of the panel name in
+    self.panels. A table is kept per decoding pass (i.e. per stream) and returned with the decoded arrays, like the
+    codes of the CrystalTable.
+    """
+    def __init__(self):
+        self.panels = []
+        self._codes = {}
+
+    def get_code(self, panel):
+        """
+        Return the code of a panel name, the panel is added to self.panels if it is not known yet.
+        """
+        try:
+            return self._codes[panel]
+        except KeyError:
+            self._codes[panel] = len(self.panels)
+            self.panels.append(panel)
+            return self._codes[panel]
+
+
+def find_reflection_lines(lines):
+    """
+    Find the reflection rows in the lines of a crystal block.
+
+    Parameters
+    ----------
+    lines (list)
+        lines of a crystal block (Crystal.reflections)
+
+    Returns
+    ----------
+    (first, last) (tuple)
+        lines[first:last] are the reflection rows, (0, 0) if the block has no reflection list
+    """
+    first = last = 0
+    #the reflection list is close to the end of the block, no need to loop over all rows
+    for i, line in enumerate(lines):
+        if 'Reflections measured after indexing' in line:
+            #the next line contains the column names
+            first = last = i + 2
+            break
+    for i in range(len(lines) - 1, first - 1, -1):
+        if 'End of reflections' in lines[i]:
+            last = i
+            break
+    return first, max(first, last)
+
+
+def decode_reflection_lines(lines, panels):
+    """
+    Decode the reflection rows of a single crystal block into a structured array.
+
+    Parameters
+    ----------
+    lines (list)
+        lines of a crystal block (Crystal.reflections)
+    panels (PanelTable)
+        codes of the panel names, new panels are added
+
+    Returns
+    ----------
+    reflections (numpy structured array)
+        with REFLECTION_DTYPE
+    """
+    first, last = find_reflection_lines(lines)
+    return decode_rows(lines[first:last], panels)
+
+
+def decode_rows(rows, panels):
+    """
+    Decode reflection rows (h k l I sigma(I) peak background fs/px ss/px panel) directly into a structured array
+    with numpy's text parser, the panel names are coded with panels (PanelTable). Rows that do not have the expected
+    number of columns are skipped.
+    """
+    if not rows:
+        return np.empty(0, dtype=REFLECTION_DTYPE)
+    try:
+        return np.loadtxt(rows, dtype=REFLECTION_DTYPE, usecols=range(N_COLUMNS), ndmin=1,
+                          converters={N_COLUMNS-1: panels.get_code})
+    except ValueError:
+        rows = [row for row in rows if len(row.split()) >= N_COLUMNS]
+        return decode_rows(rows, panels) if rows else np.empty(0, dtype=REFLECTION_DTYPE)
+
+
+def decode_reflections(crystals):
+    """
+    Bulk decoder: decode the reflections of many crystals in one vectorized pass.
+
+    Parameters
+    ----------
+    crystals (list)
+        Crystal objects of which the reflection lines are still available
+
+    Returns
+    ----------
+    reflections (numpy structured array)
+        reflections of all crystals, concatenated
+    offsets (numpy array)
+        reflections of crystal i are reflections[offsets[i]:offsets[i+1]]
+    panels (list)
+        panel names, the panel field of the reflections is the position in this list
+    """
+    panels = PanelTable()
+    rows = []
+    counts = []
+    for crystal in crystals:
+        first, last = find_reflection_lines(crystal.reflections)
+        rows += crystal.reflections[first:last]
+        counts.append(last - first)
+    reflections = decode_rows(rows, panels)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if offsets[-1] != len(reflections):
+        #some rows were skipped, decode crystal by crystal to attribute the reflections correctly
+        arrays = [decode_reflection_lines(crystal.reflections, panels) for crystal in crystals]
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        reflections = np.concatenate(arrays) if arrays else reflections
+    return reflections, offsets, panels.panels
+
+
+def get_reflection_rows(block):
+    """
+    Return the reflection rows of a crystal block (bytes, without blank lines) as bytes with one row per line,
+    and the number of rows.
+    """
+    b = block.find(BEGIN_REFLECTIONS)
+    if b < 0:
+        return b'', 0
+    #skip the column names
+    b = block.find(b'\n', block.find(b'\n', b) + 1) + 1
+    e = block.find(END_REFLECTIONS, b)
+    if b <= 0 or e < 0:
+        return b'', 0
+    rows = block[b:e]
+    return rows, rows.count(b'\n')
+
+
+def decode_batch(rows, counts, panels):
+    """
+    Decode the reflection rows (bytes) of a batch of crystals at once, see get_reflection_rows. The panel names are
+    coded with panels (PanelTable).
+
+    Returns
+    ----------
+    reflections (numpy structured array)
+        reflections of all crystals of the batch
+    counts (list)
+        number of reflections of every crystal
+    """
+    reflections = decode_rows(b''.join(rows).decode().splitlines(), panels)
+    if len(reflections) != sum(counts):
+        #some rows were skipped, decode crystal by crystal to attribute the reflections correctly
+        arrays = [decode_rows(r.decode().splitlines(), panels) for r in rows]
+        counts = [len(a) for a in arrays]
+        reflections = np.concatenate(arrays)
+    return reflections, counts
+
+
+def iter_reflection_batches(streamfile, table, mask=None, byte_range=None, batch_size=BATCH_SIZE, panels=None):
+    """
+    Read the reflections of all (or the selected) crystals from a stream file, chunk by chunk, and decode them in
+    batches of about batch_size rows, so that the memory usage does not depend on the size of the stream file.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files of which the chunks are numbered
+        continuously in the table (StreamSet)
+    table (CrystalTable)
+        crystal table of the stream file (Stream.crystal_table)
+    mask (numpy array)
+        boolean mask of the crystals to read, in the order of the table. All crystals if None.
+    byte_range (tuple)
+        only read the chunks within (start, end) bytes of the stream file, as the table was obtained
+    batch_size (int)
+        number of reflection rows that are decoded at once
+    panels (PanelTable)
+        codes of the panel names, filled while reading. Pass a table to know the panel names of the panel field,
+        a new table is used if None.
+
+    Returns
+    ----------
+    generator of (reflections, counts) tuples
+        reflections of a batch of consecutive selected crystals (numpy structured array with REFLECTION_DTYPE), and
+        the number of reflections of every crystal of the batch
+    """
+    from .stream import iter_chunk_data
+    from .split import get_chunk_crystals
+    from .compression import open_stream
+
+    panels = PanelTable() if panels is None else panels
+    mask = np.ones(len(table), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    #the crystals of chunk i are rows first[i]:first[i+1] of the table
+    last_chunk = table.chunk[-1] if len(table) else -1
+    first = np.searchsorted(table.chunk, np.arange(last_chunk + 2))
+    start, end = byte_range if byte_range else (0, None)
+    rows = []
+    counts = []
+    batch = 0
+    crystals = 0
+    chunk_number = -1
+    for f in [streamfile] if isinstance(streamfile, str) else streamfile:
+        with open_stream(f) as s:
+            data = iter_chunk_data(s, start, end)
+            next(data)
+            for _, chunk in data:
+                chunk_number += 1
+                if chunk_number > last_chunk:
+                    break
+                selected = np.flatnonzero(mask[first[chunk_number]:first[chunk_number+1]])
+                if len(selected) == 0:
+                    continue
+                _, blocks, _ = get_chunk_crystals(chunk)
+                for i in selected:
+                    chunk_rows, n = get_reflection_rows(blocks[i]) if i < len(blocks) else (b'', 0)
+                    rows.append(chunk_rows)
+                    counts.append(n)
+                    batch += n
+                if batch >= batch_size:
+                    crystals += len(counts)
+                    yield decode_batch(rows, counts, panels)
+                    rows = []
+                    counts = []
+                    batch = 0
+    if counts:
+        crystals += len(counts)
+        yield decode_batch(rows, counts, panels)
+    if crystals != np.count_nonzero(mask):
+        print("Found %d of the %d selected crystals, the stream file has changed since it was parsed" %(crystals,
+              np.count_nonzero(mask)))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import random
+import numpy as np
+
+
+def selection_sample(items, n, total, rng=random):
+    """
+    Select exactly n random items in a single pass over items, in the order of items, without keeping
+    any of them in memory (sequential selection sampling, Knuth's algorithm S).
+    Every subset of n items has the same probability to be selected.
+
+    Parameters
+    ----------
+    items (iterable)
+        items to select from, e.g. a frame iterator
+    n (int)
+        number of items to select. All items are selected if n >= total
+    total (int)
+        number of items in items
+    rng (random.Random)
+        random number generator, use random.Random(seed) for reproducible selections
+
+    Yields
+    ----------
+    the selected items
+    """
+    selected = 0
+    seen = 0
+    if n <= 0:
+        return
+    for item in items:
+        if (total - seen) * rng.random() < n - selected:
+            yield item
+            selected += 1
+            if selected == n:
+                return
+        seen += 1
+
+
+def get_partition_counts(total, k, rng=None):
+    """
+    Divide total items randomly over k disjoint subsets of (almost) equal size, e.g. half-datasets for k=2.
+
+    Parameters
+    ----------
+    total (int)
+        number of items
+    k (int)
+        number of subsets
+    rng (numpy.random.Generator)
+        random number generator, use numpy.random.default_rng(seed) for reproducible subsets
+
+    Returns
+    ----------
+    counts (numpy array)
+        (total, k) number of times (0 or 1) every item is in every subset
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    labels = rng.permutation(np.arange(total) % k)
+    counts = np.zeros((total, k), dtype=np.uint8)
+    counts[np.arange(total), labels] = 1
+    return counts
+
+
+def get_bootstrap_counts(total, k, rng=None):
+    """
+    Draw k bootstrap samples of total items, i.e. with replacement, from total items.
+
+    Parameters
+    ----------
+    total (int)
+        number of items
+    k (int)
+        number of bootstrap samples
+    rng (numpy.random.Generator)
+        random number generator, use numpy.random.default_rng(seed) for reproducible samples
+
+    Returns
+    ----------
+    counts (numpy array)
+        (total, k) number of times every item is in every sample
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    counts = np.zeros((total, k), dtype=np.uint8)
+    for i in range(k):
+        #an item is drawn a few times at most, far below the uint8 limit
+        counts[:, i] = np.bincount(rng.integers(0, total, total), minlength=total)
+    return counts
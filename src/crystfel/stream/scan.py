@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import mmap
+from .table import CrystalTable
+
+BEGIN_CHUNK = b'----- Begin chunk -----'
+END_CHUNK = b'----- End chunk -----'
+#the only lines that are needed for the counters and the crystal table, found at the start of a line
+FILENAME = b'\nImage filename'
+EVENT = b'\nEvent:'
+INDEXED_BY = b'\nindexed_by'
+BEGIN_CRYSTAL = b'\n--- Begin crystal'
+END_CRYSTAL = b'\n--- End crystal'
+CELL = b'\nCell parameters'
+RESOLUTION = b'\ndiffraction_resolution_limit'
+#cell parameters and resolution of a crystal block without these lines, as the Crystal defaults
+DEFAULT_CELL = [0., 0., 0., 90., 90., 90.]
+DEFAULT_RES = 5.
+
+
+def get_line(mm, marker, start, end):
+    """
+    Return the first line within start:end of mm that starts with marker (which includes the preceding newline),
+    decoded and without newline, None if there is no such line.
+    """
+    i = mm.find(marker, start, end)
+    if i < 0:
+        return None
+    line_end = mm.find(b'\n', i + 1, end)
+    return mm[i+1:line_end if line_end >= 0 else end].decode()
+
+
+def scan_stream(stream):
+    """
+    Obtain the header, the counters and the crystal table of a Stream without parsing the chunks. The stream file is
+    memory mapped and only the few lines that are needed are located with bytes searches, jumping over the peak and
+    reflection lists, so that no line list, Frame or Crystal is created. The result is the same as with
+    Stream.parse_stream for well-formed stream files. Only the chunks within stream.byte_range are scanned if it is set.
+
+    Parameters
+    ----------
+    stream (Stream)
+        the header and counters of this stream are set
+    """
+    from .stream import parse_event
+
+    images = 0
+    indexed_images = 0
+    indexing_methods = []
+    frames_per_method = {}
+    crystals_per_method = {}
+    table = CrystalTable()
+    end_chunk_line = ''
+    header = b''
+
+    size = os.path.getsize(stream.streamfile)
+    start, end = stream.byte_range if stream.byte_range else (0, size)
+    end = size if end is None else end
+    with open(stream.streamfile, 'rb') as s:
+        mm = mmap.mmap(s.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            if start == 0:
+                first = mm.find(BEGIN_CHUNK, 0, end)
+                header = mm[:first] if first >= 0 else mm[:end]
+            pos = start
+            while True:
+                b = mm.find(BEGIN_CHUNK, pos, end)
+                if b < 0:
+                    break
+                e = mm.find(END_CHUNK, b, end)
+                if e < 0:
+                    #incomplete chunk at the end, not returned by the parser
+                    break
+                #a chunk without "End chunk" line is followed by a new chunk, start at the last "Begin chunk"
+                b = mm.rfind(BEGIN_CHUNK, b, e)
+                line_end = mm.find(b'\n', e, end)
+                pos = end if line_end < 0 else line_end + 1
+                if not end_chunk_line:
+                    line_start = mm.rfind(b'\n', b, e) + 1
+                    end_chunk_line = mm[line_start:pos].decode().rstrip('\n')
+                images += 1
+
+                line = get_line(mm, INDEXED_BY, b, e)
+                if line is None or 'none' in line:
+                    continue
+                indexing = line.split()[2].strip()
+                line = get_line(mm, FILENAME, b, e)
+                filename = 'example.h5' if line is None else line.split()[2]
+                line = get_line(mm, EVENT, b, e)
+                event = '' if line is None else parse_event(line)
+
+                crystals = 0
+                p = b
+                while True:
+                    cb = mm.find(BEGIN_CRYSTAL, p, e)
+                    if cb < 0:
+                        break
+                    ce = mm.find(END_CRYSTAL, cb, e)
+                    if ce < 0:
+                        break
+                    p = ce + 1
+                    line = get_line(mm, CELL, cb, ce)
+                    if line is None:
+                        cell = DEFAULT_CELL
+                    else:
+                        line = line.split()
+                        cell = [float(x) for x in line[2:5] + line[6:9]]
+                    line = get_line(mm, RESOLUTION, cb, ce)
+                    res = DEFAULT_RES if line is None else float(line.split()[5])
+                    table.append_crystal(cell, res, indexing, filename, event, indexed_images, images - 1)
+                    crystals += 1
+
+                if indexing not in frames_per_method:
+                    indexing_methods.append(indexing)
+                    frames_per_method[indexing] = 0
+                    crystals_per_method[indexing] = 0
+                frames_per_method[indexing] += 1
+                crystals_per_method[indexing] += crystals
+                indexed_images += 1
+        finally:
+            if size:
+                mm.close()
+
+    stream.header = header.decode()
+    stream.end_chunk_line = [end_chunk_line,] if end_chunk_line else []
+    stream.images = images
+    stream.indexed_images = indexed_images
+    stream.indexing_methods = indexing_methods
+    stream.frames_per_method = frames_per_method
+    stream.crystals_per_method = crystals_per_method
+    stream._crystal_table = table.finalize()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+
+#offset and range of the Miller indices in the keys of the unique reflections (16 bits per index)
+INDEX_OFFSET = 1 << 15
+INDEX_RANGE = 1 << 16
+#number of keys that are collected before the unique reflections are updated
+UNIQUE_BATCH = 1000000
+
+
+def get_reciprocal_metric(cell):
+    """
+    Return the reciprocal metric tensor of every crystal, from which 1/d is obtained for any h, k, l.
+
+    Parameters
+    ----------
+    cell (numpy array)
+        (n, 6) unit cell parameters: a, b, c (in nm), alpha, beta, gamma (in degr.), see CrystalTable.get_cell
+
+    Returns
+    ----------
+    metric (numpy array)
+        (n, 6) components g11, g22, g33, g12, g13, g23 of the reciprocal metric tensor (in nm^-2)
+    """
+    cell = np.asarray(cell, dtype=np.float64).reshape(-1, 6)
+    a, b, c = cell[:, 0], cell[:, 1], cell[:, 2]
+    cos_al, cos_be, cos_ga = np.cos(np.radians(cell[:, 3:6])).T
+    g = np.empty((len(cell), 3, 3))
+    g[:, 0, 0] = a * a
+    g[:, 1, 1] = b * b
+    g[:, 2, 2] = c * c
+    g[:, 0, 1] = g[:, 1, 0] = a * b * cos_ga
+    g[:, 0, 2] = g[:, 2, 0] = a * c * cos_be
+    g[:, 1, 2] = g[:, 2, 1] = b * c * cos_al
+    g = np.linalg.inv(g) if len(g) else g
+    return np.column_stack([g[:, 0, 0], g[:, 1, 1], g[:, 2, 2], g[:, 0, 1], g[:, 0, 2], g[:, 1, 2]])
+
+
+def get_one_over_d(h, k, l, metric):
+    """
+    Return 1/d (in nm^-1) of reflections
+
+    Parameters
+    ----------
+    h, k, l (numpy arrays)
+        Miller indices
+    metric (numpy array)
+        (number of reflections, 6) reciprocal metric tensor of the crystal of every reflection, see
+        get_reciprocal_metric
+
+    Returns
+    ----------
+    one_over_d (numpy array)
+        1/d of every reflection (in nm^-1)
+    """
+    h = np.asarray(h, dtype=np.float64)
+    k = np.asarray(k, dtype=np.float64)
+    l = np.asarray(l, dtype=np.float64)
+    s2 = (metric[:, 0] * h * h + metric[:, 1] * k * k + metric[:, 2] * l * l
+          + 2 * (metric[:, 3] * h * k + metric[:, 4] * h * l + metric[:, 5] * k * l))
+    return np.sqrt(np.maximum(s2, 0))
+
+
+def get_shell_edges(d_min, d_max=None, n_shells=10):
+    """
+    Return the edges of resolution shells of equal reciprocal volume.
+
+    Parameters
+    ----------
+    d_min (float)
+        high resolution limit (in A)
+    d_max (float)
+        low resolution limit (in A). The first shell starts at 1/d = 0 if None.
+    n_shells (int)
+        number of shells
+
+    Returns
+    ----------
+    edges (numpy array)
+        n_shells + 1 edges in 1/d (in nm^-1), increasing
+    """
+    s_min = 0. if d_max is None else 10. / d_max
+    s_max = 10. / d_min
+    return np.cbrt(np.linspace(s_min**3, s_max**3, n_shells + 1))
+
+
+class ShellStats(object):
+    """
+    Statistics per resolution shell, accumulated batch by batch: number of reflections, number of unique Miller
+    indices, multiplicity, mean intensity and mean I/sigma(I). The unique reflections are counted without merging
+    symmetry equivalents (nor Friedel mates), so that they can be compared with the number of possible reflections
+    of the space group to estimate the completeness.
+
+    Parameters
+    ----------
+    edges (numpy array)
+        edges of the shells in 1/d (in nm^-1), see get_shell_edges
+
+    Attributes
+    ----------
+    reflections (numpy array)
+        number of reflections per shell
+    below, beyond (int)
+        number of reflections at a lower resolution than the first shell, and at a higher resolution than the last
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n = len(self.edges) - 1
+        self.reflections = np.zeros(n, dtype=np.int64)
+        self.sum_i = np.zeros(n)
+        self.sum_i_over_sigma = np.zeros(n)
+        self.with_sigma = np.zeros(n, dtype=np.int64)
+        self.below = 0
+        self.beyond = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._n_pending = 0
+
+    def update(self, reflections, one_over_d):
+        """
+        Add a batch of reflections
+
+        Parameters
+        ----------
+        reflections (numpy structured array)
+            see reflections.REFLECTION_DTYPE
+        one_over_d (numpy array)
+            1/d of every reflection (in nm^-1), see get_one_over_d
+        """
+        n = len(self.edges) - 1
+        shell = np.searchsorted(self.edges, one_over_d, side='right') - 1
+        #reflections exactly at the high resolution limit belong to the last shell
+        shell[one_over_d == self.edges[-1]] = n - 1
+        self.below += np.count_nonzero(shell < 0)
+        self.beyond += np.count_nonzero(shell >= n)
+        inside = (shell >= 0) & (shell < n)
+        shell = shell[inside]
+        refls = reflections[inside]
+        intensity = refls['I'].astype(np.float64)
+        sigma = refls['sigma'].astype(np.float64)
+        self.reflections += np.bincount(shell, minlength=n)
+        self.sum_i += np.bincount(shell, weights=intensity, minlength=n)
+        positive = sigma > 0
+        self.with_sigma += np.bincount(shell[positive], minlength=n)
+        self.sum_i_over_sigma += np.bincount(shell[positive], weights=intensity[positive] / sigma[positive], minlength=n)
+
+        h, k, l = [refls[name].astype(np.int64) + INDEX_OFFSET for name in ('h', 'k', 'l')]
+        keys = ((shell.astype(np.int64) * INDEX_RANGE + h) * INDEX_RANGE + k) * INDEX_RANGE + l
+        keys = np.unique(keys)
+        self._pending.append(keys)
+        self._n_pending += len(keys)
+        if self._n_pending >= max(UNIQUE_BATCH, len(self.keys)):
+            self._merge_keys()
+
+    def _merge_keys(self):
+        if self._pending:
+            self.keys = np.unique(np.concatenate([self.keys] + self._pending))
+            self._pending = []
+            self._n_pending = 0
+
+    def get_unique(self):
+        """
+        Return the number of unique Miller indices per shell
+        """
+        self._merge_keys()
+        shell = self.keys // INDEX_RANGE**3
+        return np.bincount(shell, minlength=len(self.edges) - 1)
+
+    def get_stats(self):
+        """
+        Returns
+        ----------
+        stats (list)
+            a dictionary per shell with d_max and d_min (in A, d_max is inf for the first shell if it starts at
+            1/d = 0), reflections, unique, multiplicity, mean_I and mean_I_over_sigma
+        """
+        unique = self.get_unique()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = 10. / self.edges
+            multiplicity = self.reflections / unique
+            mean_i = self.sum_i / self.reflections
+            mean_i_over_sigma = self.sum_i_over_sigma / self.with_sigma
+        return [{'d_max': d[i], 'd_min': d[i+1], 'reflections': int(self.reflections[i]), 'unique': int(unique[i]),
+                 'multiplicity': multiplicity[i], 'mean_I': mean_i[i], 'mean_I_over_sigma': mean_i_over_sigma[i]}
+                for i in range(len(self.edges) - 1)]
+
+
+def get_shell_stats(batches, cell, edges):
+    """
+    Accumulate the statistics per resolution shell over batches of reflections, e.g. from
+    reflections.iter_reflection_batches. 1/d is computed for every reflection from the unit cell of its crystal.
+
+    Parameters
+    ----------
+    batches (iterable)
+        (reflections, counts) tuples: reflections of consecutive crystals and the number of reflections per crystal
+    cell (numpy array)
+        (number of crystals, 6) unit cell parameters of the crystals in the order of the batches
+    edges (numpy array)
+        edges of the shells in 1/d (in nm^-1), see get_shell_edges
+
+    Returns
+    ----------
+    stats (ShellStats)
+        the accumulated statistics
+    """
+    metric = get_reciprocal_metric(cell)
+    stats = ShellStats(edges)
+    crystal = 0
+    for refls, counts in batches:
+        rows = np.repeat(np.arange(crystal, crystal + len(counts)), counts)
+        crystal += len(counts)
+        stats.update(refls, get_one_over_d(refls['h'], refls['k'], refls['l'], metric[rows]))
+    return stats
+
+
+def print_shell_stats(stats, below=0, beyond=0):
+    """
+    Print the statistics per resolution shell, see ShellStats.get_stats
+    """
+    print("%8s %8s %12s %10s %8s %12s %10s" %('d_max', 'd_min', 'reflections', 'unique', 'mult.', '<I>', '<I/sig>'))
+    for s in stats:
+        print("%8.2f %8.2f %12d %10d %8.1f %12.1f %10.2f" %(s['d_max'], s['d_min'], s['reflections'], s['unique'],
+              s['multiplicity'], s['mean_I'], s['mean_I_over_sigma']))
+    total = sum(s['reflections'] for s in stats)
+    print("%d reflections in the shells, %d at lower and %d at higher resolution" %(total, below, beyond))
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import re
+import numpy as np
+from .stream import iter_chunk_data, parse_event, parse_timeline
+from .compression import get_compression, open_stream, open_output
+from .table import CELL_PARAMETERS
+from .follow import RunningStats
+from .scan import FILENAME, EVENT, INDEXED_BY, CELL, BEGIN_CRYSTAL, END_CRYSTAL
+
+#write buffer of every output stream file
+BUFFER_SIZE = 1024 * 1024
+#number of crystals of a bin of which the cells are added to the statistics at once
+CELL_BATCH = 10000
+
+
+class StreamBin(object):
+    """
+    Output stream file of split_stream, with the criteria that select its chunks. Criteria that are None are not
+    applied, a chunk belongs to the bin if it fulfills all other criteria.
+
+    Parameters
+    ----------
+    output (str)
+        output stream file (compressed if it ends with .gz, .bz2 or .xz)
+    timeline (str)
+        time delay tag in the image filename (see Frame.timeline), e.g. "100ps"
+    events (tuple)
+        (first, last) event numbers, both included
+    pattern (str)
+        regular expression that should be found in the image filename, e.g. "run_00(1|2)"
+
+    Attributes
+    ----------
+    chunks (int)
+        number of chunks written
+    crystals (int)
+        number of crystals written
+    cell (RunningStats)
+        running mean and standard deviation of a, b, c, alpha, beta and gamma of the crystals written
+    """
+
+    def __init__(self, output, timeline=None, events=None, pattern=None):
+        self.output = output
+        self.timeline = timeline
+        self.events = events
+        self.pattern = None if pattern is None else re.compile(pattern)
+        self.chunks = 0
+        self.crystals = 0
+        self.cell = RunningStats(len(CELL_PARAMETERS))
+        self.cells = []
+        self.out = None
+
+    def matches(self, filename, event, timeline):
+        """
+        Whether a chunk with this image filename, event and time delay tag belongs to the bin
+        """
+        if self.timeline is not None and timeline != self.timeline:
+            return False
+        if self.events is not None:
+            if not isinstance(event, int) or not self.events[0] <= event <= self.events[1]:
+                return False
+        if self.pattern is not None and self.pattern.search(filename) is None:
+            return False
+        return True
+
+    def open(self, header, buffer_size=BUFFER_SIZE):
+        """
+        Open the output stream file and write the header, followed by an empty line as the save functions of Stream
+        """
+        self.out = open_output(self.output, binary=True, buffer_size=buffer_size)
+        self.out.write(header)
+        self.out.write(b'\n')
+
+    def write(self, chunk, cells):
+        """
+        Write a chunk (bytes) with the cells of its crystals
+        """
+        self.out.write(chunk)
+        self.chunks += 1
+        self.crystals += len(cells)
+        self.cells += cells
+        if len(self.cells) >= CELL_BATCH:
+            self.cell.update(self.cells)
+            self.cells = []
+
+    def close(self):
+        self.cell.update(self.cells)
+        self.cells = []
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+
+def get_timeline_bins(mapping):
+    """
+    Return a bin per time delay tag, from a dictionary {tag: output stream file}
+    """
+    return [StreamBin(output, timeline=tag) for tag, output in mapping.items()]
+
+
+def get_event_bins(mapping):
+    """
+    Return a bin per event range, from a dictionary {(first, last): output stream file}
+    """
+    return [StreamBin(output, events=events) for events, output in mapping.items()]
+
+
+def get_pattern_bins(mapping):
+    """
+    Return a bin per filename pattern, from a dictionary {regular expression: output stream file}
+    """
+    return [StreamBin(output, pattern=pattern) for pattern, output in mapping.items()]
+
+
+def get_chunk_line(chunk, marker):
+    """
+    Return the first line of a chunk (bytes) that starts with marker (which includes the preceding newline),
+    decoded and without newline, None if there is no such line.
+    """
+    i = chunk.find(marker)
+    if i < 0:
+        return None
+    end = chunk.find(b'\n', i + 1)
+    return chunk[i+1:end if end >= 0 else len(chunk)].decode()
+
+
+def get_chunk_cells(chunk):
+    """
+    Return the unit cell parameters of the crystals of a chunk (bytes), as (a, b, c, alpha, beta, gamma) tuples
+    """
+    cells = []
+    i = chunk.find(CELL)
+    while i >= 0:
+        end = chunk.find(b'\n', i + 1)
+        line = chunk[i+1:end].split()
+        cells.append(tuple(float(x) for x in line[2:5] + line[6:9]))
+        i = chunk.find(CELL, end)
+    return cells
+
+
+def get_chunk_crystals(chunk):
+    """
+    Split a chunk (bytes) as the parser does: the head (everything before the first crystal), the crystal blocks
+    (from "Begin crystal" up to and including the "End crystal" line, without blank lines) and the "End chunk" line.
+    """
+    first = chunk.find(BEGIN_CRYSTAL)
+    end_line = chunk[chunk.rfind(b'\n', 0, len(chunk) - 1) + 1:]
+    if first < 0:
+        return chunk[:len(chunk) - len(end_line)], [], end_line
+    blocks = []
+    b = first
+    while b >= 0:
+        e = chunk.find(END_CRYSTAL, b)
+        if e < 0:
+            break
+        e = chunk.find(b'\n', e + 1) + 1
+        block = chunk[b+1:e]
+        if b'\n\n' in block:
+            block = b''.join(line for line in block.splitlines(keepends=True) if line != b'\n')
+        blocks.append(block)
+        b = chunk.find(BEGIN_CRYSTAL, e - 1)
+    return chunk[:first+1], blocks, end_line
+
+
+def iter_stream_chunks(streamfile, byte_range=None):
+    """
+    Read one or several consecutive stream files chunk by chunk. Yields the header (bytes) of the first file,
+    followed by the chunks (bytes) of all files in order, the headers of the other files are skipped.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files (StreamSet)
+    byte_range (tuple)
+        only read the chunks within (start, end) bytes of every stream file
+    """
+    start, end = byte_range if byte_range else (0, None)
+    for n, f in enumerate([streamfile] if isinstance(streamfile, str) else streamfile):
+        with open_stream(f) as s:
+            data = iter_chunk_data(s, start, end)
+            _, header = next(data)
+            if n == 0:
+                yield header
+            for _, chunk in data:
+                yield chunk
+
+
+def partition_stream(streamfile, bins, counts, crystals=False, methods=None, buffer_size=BUFFER_SIZE, byte_range=None):
+    """
+    Write random subsets of the indexed frames or crystals of a stream file to several output stream files in a
+    single pass, e.g. disjoint half-datasets or bootstrap samples (see sampling.get_partition_counts and
+    sampling.get_bootstrap_counts). The chunks are copied as they are in the stream file. A crystal is written as a
+    chunk with the head of its frame, as with Stream.save_random_indexed_crystals.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files (StreamSet) of which the frames or
+        crystals are numbered continuously
+    bins (list)
+        a StreamBin per subset, the criteria of the bins are not used
+    counts (numpy array)
+        (number of frames or crystals, number of subsets) number of times every frame or crystal, in the order of
+        the stream file(s), is written to every subset
+    crystals (bool)
+        divide the crystals instead of the frames
+    methods (list)
+        only use frames indexed with one of these indexing methods. All indexed frames if None.
+    buffer_size (int)
+        size of the write buffer of every output file (in bytes)
+    byte_range (tuple)
+        only use the chunks within (start, end) bytes of the stream file
+
+    Returns
+    ----------
+    bins (list)
+        the bins with their counters and cell statistics
+    """
+    item = 0
+    data = iter_stream_chunks(streamfile, byte_range)
+    header = next(data)
+    try:
+        for b in bins:
+            b.open(header, buffer_size)
+        for chunk in data:
+            line = get_chunk_line(chunk, INDEXED_BY)
+            if line is None or 'none' in line:
+                continue
+            if methods is not None and line.split()[2].strip() not in methods:
+                continue
+            if crystals:
+                head, blocks, end_line = get_chunk_crystals(chunk)
+                for block in blocks:
+                    if item < len(counts):
+                        cells = get_chunk_cells(block)
+                        for i in np.flatnonzero(counts[item]):
+                            for _ in range(counts[item, i]):
+                                bins[i].write(head + block + end_line, cells)
+                    item += 1
+            else:
+                if item < len(counts):
+                    cells = get_chunk_cells(chunk)
+                    for i in np.flatnonzero(counts[item]):
+                        for _ in range(counts[item, i]):
+                            bins[i].write(chunk, cells)
+                item += 1
+    finally:
+        data.close()
+        for b in bins:
+            b.close()
+    if item != len(counts):
+        print("Found %d %s instead of %d, the stream file has changed since it was parsed" %(item,
+              'crystals' if crystals else 'indexed frames', len(counts)))
+    return bins
+
+
+def split_stream(streamfile, bins, timeline_root=None, indexed_only=True, buffer_size=BUFFER_SIZE, byte_range=None):
+    """
+    Split a stream file into several output stream files in a single pass, e.g. per time delay for time-resolved
+    experiments. Every chunk is written to the first bin it belongs to, chunks that do not belong to any bin are
+    skipped. All output files stay open (with a write buffer) during the pass. The chunks are copied as they are
+    in the stream file, without parsing, as the save functions of Stream do with the chunk index.
+
+    Parameters
+    ----------
+    streamfile (str or list)
+        CrystFEL stream file (can be compressed), or consecutive stream files (StreamSet) of which the chunks are
+        split together, the header of the first file is written to the outputs
+    bins (list)
+        StreamBin objects, see get_timeline_bins, get_event_bins and get_pattern_bins
+    timeline_root (str)
+        if not None, chunks that do not belong to any of the bins are written to a new bin per time delay tag,
+        <timeline_root>_<tag>.stream (with the compression extension of the input), created when a tag is
+        encountered for the first time. Chunks without tag are skipped.
+    indexed_only (bool)
+        only write the indexed chunks (default), as the other save functions. All chunks if False.
+    buffer_size (int)
+        size of the write buffer of every output file (in bytes)
+    byte_range (tuple)
+        only split the chunks within (start, end) bytes of the stream file
+
+    Returns
+    ----------
+    bins (list)
+        the bins with their counters and cell statistics, followed by the bins created per time delay tag
+    skipped (int)
+        number of chunks that were not written (not indexed or not in any bin)
+    """
+    bins = list(bins)
+    timeline_bins = {}
+    skipped = 0
+    compression = get_compression(streamfile if isinstance(streamfile, str) else streamfile[0])
+    data = iter_stream_chunks(streamfile, byte_range)
+    header = next(data)
+    try:
+        for b in bins:
+            b.open(header, buffer_size)
+        for chunk in data:
+            if indexed_only:
+                line = get_chunk_line(chunk, INDEXED_BY)
+                if line is None or 'none' in line:
+                    skipped += 1
+                    continue
+            line = get_chunk_line(chunk, FILENAME)
+            filename = '' if line is None else line.split()[2]
+            line = get_chunk_line(chunk, EVENT)
+            event = '' if line is None else parse_event(line)
+            timeline = parse_timeline(filename)
+            for b in bins:
+                if b.matches(filename, event, timeline):
+                    break
+            else:
+                b = None
+                if timeline_root is not None and timeline is not None:
+                    b = timeline_bins.get(timeline)
+                    if b is None:
+                        output = '%s_%s.stream%s' %(timeline_root, timeline, compression)
+                        b = StreamBin(output, timeline=timeline)
+                        b.open(header, buffer_size)
+                        timeline_bins[timeline] = b
+            if b is None:
+                skipped += 1
+                continue
+            b.write(chunk, get_chunk_cells(chunk))
+    finally:
+        data.close()
+        for b in bins + list(timeline_bins.values()):
+            b.close()
+    return bins + list(timeline_bins.values()), skipped
+
+
+def get_split_summary(bins, skipped=0):
+    """
+    Print the number of chunks and crystals, and the average and standard deviation of the unit cell of every bin
+    """
+    for b in bins:
+        av = b.cell.get_mean()
+        sd = b.cell.get_std()
+        print(("%s: %d frames, %d crystals" %(b.output, b.chunks, b.crystals)))
+        if b.crystals:
+            print(("   a b c: %.4f (%.4f) %.4f (%.4f) %.4f (%.4f) nm, al be ga: %.2f (%.2f) %.2f (%.2f) %.2f (%.2f) deg" %(
+                   av[0], sd[0], av[1], sd[1], av[2], sd[2], av[3], sd[3], av[4], sd[4], av[5], sd[5])))
+    print(("%d chunks not written" %(skipped)))
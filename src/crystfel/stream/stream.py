@@ -16,8 +16,30 @@ https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
 import os
 import sys
 import re
+import time
 import numpy as np
 import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from .index import StreamIndex
+from . import extract
+from .table import CrystalTable
+from . import reflections
+from .sampling import selection_sample, get_partition_counts, get_bootstrap_counts
+from .cache import ParseCache
+from .compression import get_compression, open_stream, open_output
+from .scan import scan_stream
+from . import query
+from . import peaks
+from . import cell
+from . import export
+from . import shells
+from .pipeline import save_pipelined, use_pipeline
+from .lookup import EventLookup
+from .profiling import Profiler, print_progress
+
+#number of frames read by seeking into the stream file that are kept in memory (see FrameCache)
+FRAME_CACHE_SIZE = 256
 
 class Stream(object):
     """
@@ -26,7 +48,45 @@ class Stream(object):
     Parameters
     ----------
     streamfile (str)
-        CrystFEL stream file
+        CrystFEL stream file, can be compressed (.gz, .bz2 or .xz). Compressed stream files are decompressed while
+        parsing, in a background thread. The chunk index and parallel parsing are not available for them.
+    in_memory (bool)
+        keep all indexed frames in memory (default). If False, the stream file is read chunk by chunk and
+        self.frames is an iterable that re-reads the file each time it is looped over, so that memory usage
+        stays constant independent of the size of the stream file.
+    use_index (bool)
+        use a byte-offset index of the chunks (see StreamIndex), stored next to the stream file, to access
+        frames and crystals by seeking into the stream file. In combination with in_memory=False, the stream
+        file is not parsed at all once the index exists.
+    workers (int)
+        number of processes used to parse the stream file. The file is split in byte ranges at chunk boundaries
+        that are parsed in parallel.
+    keep_text (bool)
+        keep the lines of the frame heads and crystal blocks in the Frame and Crystal objects (default). If False, 
+        only their byte offsets are kept and the text is read from the stream file when it is requested.
+    byte_range (tuple)
+        only parse the chunks within (start, end) bytes of the stream file. start should be 0 or the beginning
+        of a chunk. Used by the parallel parsing.
+    summary_only (bool)
+        if the frames are not kept in memory, obtain the counters and the crystal table with a fast scan of the
+        stream file (see scan_stream) instead of parsing every chunk. Frames are parsed when self.frames is looped over.
+    use_cache (bool)
+        store the counters and the crystal table of a parsed stream file in the parse cache (see ParseCache) and,
+        load them from the cache instead of parsing the stream file again. Requires in_memory=False, as the frames
+        are not cached. Off by default: every parse of a complete stream file then writes a .npz file to ~/.cache/sx_toolbox/streams
+        (or the directory in the SX_STREAM_CACHE environment variable). The least recently used files are removed
+        when the directory exceeds SX_STREAM_CACHE_SIZE MB (default 2048).
+    profiler (Profiler)
+        collects timers, counters and peak memory, and reports the parsing progress (see profiling.Profiler).
+        By default the progress is printed, and the timers and counters are available as self.profiler.
+    lazy (bool)
+        same as in_memory=False and use_index=True: self.frames is a sequence view on the indexed frames that is
+        backed by the chunk index. Indexing (self.frames[i]), slicing and iterating only parse the chunks that are
+        accessed, the chunk bodies are not parsed when the Stream is created. select_indexing_methods,
+        select_crystals and detach_crystals_from_frames return views on the index as well.
+    frame_cache_size (int)
+        number of recently accessed frames that are kept in memory when frames are read by seeking into the
+        stream file (see FrameCache), 0 to disable the cache.
         
     Output
     ----------
@@ -34,163 +94,487 @@ class Stream(object):
     
     
     """
+    
+    #subclasses that do not call Stream.__init__ have no frame cache
+    frame_cache = None
+    _event_lookup = None
 
-    def __init__(self, streamfile):
+    def __init__(self, streamfile, in_memory=True, use_index=False, workers=1, keep_text=True, byte_range=None,
+                 summary_only=False, use_cache=False, profiler=None, lazy=False, frame_cache_size=FRAME_CACHE_SIZE):
         self.streamfile = streamfile
-        self.frames = []
+        if lazy:
+            in_memory = False
+            use_index = True
+        if profiler is None:
+            profiler = Profiler(progress=print_progress if byte_range is None else None)
+        self.profiler = profiler
+        self.keep_text = keep_text
         self.header = ''
-        self.parse_stream()
+        self.end_chunk_line = []
+        self.index = None
+        self.byte_range = byte_range
+        self._crystal_table = None
+        self.selected_frames = None
+        self.crystal_selection = None
+        if use_cache and in_memory:
+            raise ValueError("use_cache requires in_memory=False: the parse cache only holds the counters and the "
+                             "crystal table, the frames are parsed from the stream file anyway")
+        self.cache = ParseCache() if use_cache and byte_range is None else None
+        self.frame_cache = FrameCache(frame_cache_size)
+        #output stream files are compressed in the same way as the input
+        self.compression = get_compression(streamfile)
+        if self.compression:
+            if lazy:
+                print("The chunk index is not available for compressed stream files, frames are read sequentially")
+            use_index = False
+            workers = 1
+            #a compressed stream file cannot be memory mapped
+            summary_only = False
+        self.summary_only = summary_only and not in_memory
+        if use_index:
+            self.index = StreamIndex.open(streamfile)
+        if in_memory:
+            self.frames = []
+        else:
+            self.frames = StreamFrames(self)
+            
+        if self.index is not None and not in_memory:
+            with self.profiler.phase('read'):
+                self.get_counters_from_index()
+        elif self.cache is not None and not in_memory and self.load_from_cache():
+            pass
+        elif workers > 1:
+            self.parse_stream_parallel(workers)
+        elif self.summary_only:
+            self.scan_stream()
+        else:
+            self.parse_stream()
+
+    def iter_chunks(self):
+        """
+        Generator that reads the stream file chunk by chunk. Only the lines of a single chunk are kept in memory.
+        The stream header and the end chunk line are stored as soon as they are encountered.
+        An incomplete chunk at the end of the file (no "End chunk" line) is not returned.
+        Only the chunks within self.byte_range are read if it is set.
+        
+        Yields
+        ----------
+        frame (Frame)
+            Frame object for every chunk in the stream, indexed or not (see frame.indexed).
+        """
+        start, end = self.byte_range if self.byte_range else (0, None)
+        profiler = self.profiler
+        with open_stream(self.streamfile) as s:
+            data = iter_chunk_data(s, start, end)
+            _, header = next(data)
+            self.header = header.decode()
+            while True:
+                t0 = time.perf_counter()
+                offset, chunk = next(data, (None, None))
+                t1 = time.perf_counter()
+                profiler.add_time('read', t1 - t0)
+                if chunk is None:
+                    break
+                frame = self.parse_chunk_data(offset, chunk)
+                if not self.end_chunk_line:
+                    self.end_chunk_line = [re.sub("\n", "", chunk.decode().splitlines()[-1]),]
+                profiler.add_time('parse', time.perf_counter() - t1)
+                profiler.count('bytes', len(chunk))
+                profiler.count('chunks')
+                yield frame
+                
+    def parse_chunk_data(self, offset, data):
+        """
+        Parse the text of a chunk.
+        
+        Parameters
+        ----------
+        offset (int)
+            byte offset of the chunk in the stream file
+        data (bytes)
+            chunk as read from the stream file
+            
+        Returns
+        ----------
+        frame (Frame)
+        """
+        text = data.decode()
+        #byte offsets can only be derived from the lines if every character is a single byte,
+        #and can only be used to read the text again if the file is not compressed
+        if len(text) != len(data) or self.compression:
+            offset = None
+        lines = text.splitlines(keepends=True)
+        self.profiler.count('lines', len(lines))
+        return parse_chunk(lines, offset, self.streamfile, self.keep_text)
+
+    def iter_frames(self):
+        """
+        Generator that reads the stream file chunk by chunk and only returns the indexed frames.
+        
+        Yields
+        ----------
+        frame (Frame)
+            indexed Frame with its crystals
+        """
+        for frame in self.iter_chunks():
+            if frame.indexed:
+                yield frame
 
     def parse_stream(self):
         """
-        Read stream file line by line and dedicate lines and info to indexed frames and crystals
+        Read stream file chunk by chunk and dedicate lines and info to indexed frames and crystals.
+        Indexed frames are only stored in self.frames if the stream is kept in memory.
         """
-        append_frame = 0
-        append_crystal = 0
-        indexed_crystal = 0
         count_shots = 0
         count_images = 0
-        frame_stream = []
-        crystal_stream = []
-        header = 0
         indexing_methods = []
-        end_chunk_line = []
-        
-        event = ''
-        
-        with open(self.streamfile,'r') as s:
-            stream = s.readlines()
+        frames_per_method = {}
+        crystals_per_method = {}
+        keep_frames = isinstance(self.frames, list)
+        table = CrystalTable()
+        profiler = self.profiler
 
-        for index, line in enumerate(stream):
-            # GEt header
-            while (header == 0):
-                self.header += line
-                break
-
-            # Get beginning of an image
-            if 'Begin chunk' in line:
-                count_shots += 1
-                append_frame = 1
-                header = 1
-                frame_stream = []
-                crystal_stream = []
-
-            ### If
-            elif 'Image filename' in line: filename = line.split()[2]
-            
-            elif 'Event:' in line:
-                try:
-                    #Event should be number that succeeds "//" 
-                    event = line.rstrip().lstrip().split("//")[-1]
-                    if event:
-                        try:
-                            event = int(event)
-                        except ValueError:
-                            event = str(event)
-                    else:
-                        #Event can also be a tag
-                        event = line.rstrip().lstrip().split("Event:")[-1]
-                        if event:
-                            try:
-                                event = int(event)
-                            except ValueError:
-                                event = str(event)
-                except AttributeError:
-                    event = ''
-
-            elif 'indexed_by' in line and 'none' not in line:
+        for frame in self.iter_chunks():
+            count_shots += 1
+            if frame.indexed:
+                table.append_frame(frame, count_images, count_shots - 1)
                 count_images += 1
-                indexed_crystal = 1
-                frame = Frame()
-                frame.indexing = line.split()[2].strip()
+                profiler.count('indexed_frames')
+                profiler.count('crystals', len(frame.crystals))
                 if frame.indexing not in indexing_methods:
                     indexing_methods.append(frame.indexing)
-                frame.filename = filename
-                frame.event    = event
-                try:
-                    f = os.path.split(filename)[1]
-                    tag = os.path.splitext(f)[0].split('tag_')[1]
-                    frame.timeline = tag
-                except:
-                    pass
-                
-            elif 'Begin crystal' in line:
-                append_frame = 0
-                append_crystal = 1
-                crystal = Crystal()
-                
-            elif 'diffraction_resolution_limit' in line:
-                res = float(line.split()[5])
-                crystal.res = res
-
-            elif 'Cell parameters' in line:
-                a0, b0, c0 = line.split()[2:5]
-                crystal.a = float(a0)
-                crystal.b = float(b0)
-                crystal.c = float(c0)
-                alpha0, beta0, gamma0 = line.split()[6:9]
-                crystal.alpha = float(alpha0)
-                crystal.beta = float(beta0)
-                crystal.gamma = float(gamma0)
-                
-            elif 'End crystal' in line:
-                if indexed_crystal == 1:
-                    #not clear if this will be usefull or not
-                    #attribution of the header cannot be done yet as frame.head is not attributed yet at this stage
-                    #frame.head could also be attributed here instead of at the end of the chunk.
-                    #Since head can be long, better not to attribute crystal.head yet until required
-                    #Then it can be done with the function copy_frame_head_to_crystal below
-                    crystal.filename = frame.filename
-                    crystal.event = frame.event
-                    crystal.timeline = frame.timeline
-                    crystal.indexing = frame.indexing
-
-                    #Attribute the lines of the crystal to the crystal
-                    crystal_stream.append(line)
-                    crystal_stream = [line for line in crystal_stream if line != "\n"]
-                    crystal.reflections = crystal_stream
-                    
-                    frame.crystals.append(crystal)
-                append_crystal = 0
-                crystal_stream = []
-
-            elif "End chunk" in line:
-                if indexed_crystal == 1:
-                    #attribute the lines of the chunk to the frame
-                    frame.head = frame_stream
+                    frames_per_method[frame.indexing] = 0
+                    crystals_per_method[frame.indexing] = 0
+                frames_per_method[frame.indexing] += 1
+                crystals_per_method[frame.indexing] += len(frame.crystals)
+                if keep_frames:
                     self.frames.append(frame)
-                frame_stream = []
-                indexed_crystal = 0
-                append_frame = 0
-                append_crystal = 0
-                if not end_chunk_line:
-                    if  "\n" in line:
-                        line = re.sub("\n", "", line)
-                    end_chunk_line = [line,]
-
-            if append_frame == 1:
-                frame_stream.append(line)
-            
-            if append_crystal == 1:
-                crystal_stream.append(line)
 
-            if count_shots % 1000 == 0:
-                prog = '%7i frames parsed, %7i indexed frames found' % (count_shots, count_images)
-                print(prog, end='\r')
-                #sys.stdout.flush()
+            profiler.progress()
 
-        self.end_chunk_line = end_chunk_line
         self.images = count_shots
         self.indexed_images = count_images
         self.indexing_methods = indexing_methods
-        #self.indexed_images   = len(self.frames)
-        #print 'indexing methods:',indexing_methods
+        self.frames_per_method = frames_per_method
+        self.crystals_per_method = crystals_per_method
+        self._crystal_table = table.finalize()
+            
+        profiler.finish_progress() #get rid of the remaining progress message
+        if self.cache is not None:
+            self.cache.save(self)
         
-        if 'Begin chunk' in self.header:
-            self.header = re.sub('----- Begin chunk -----\n','',self.header) #quick and dirty removing the 'begin chunk' line that is added to the header
+    def scan_stream(self):
+        """
+        Obtain the header, counters and crystal table with a fast scan over the memory mapped stream file that only
+        looks at the lines required for the summary and the cell statistics. Chunks are not parsed.
+        """
+        with self.profiler.phase('parse'):
+            scan_stream(self)
+        start, end = self.byte_range if self.byte_range else (0, None)
+        self.profiler.count('bytes', (os.path.getsize(self.streamfile) if end is None else end) - start)
+        self.profiler.count('chunks', self.images)
+        self.profiler.count('indexed_frames', self.indexed_images)
+        self.profiler.count('crystals', len(self._crystal_table))
+        if self.cache is not None:
+            self.cache.save(self)
+
+    def parse_stream_parallel(self, workers):
+        """
+        Parse the stream file with multiple processes. The stream file is split in byte ranges that start at a chunk,
+        which are parsed independently. Frames and counters are merged in the order of the stream file.
+        
+        Parameters
+        ----------
+        workers (int)
+            number of processes
+        """
+        keep_frames = isinstance(self.frames, list)
+        boundaries = find_chunk_boundaries(self.streamfile, workers)
+        ranges = list(zip(boundaries[:-1], boundaries[1:]))
+        
+        self.images = 0
+        self.indexed_images = 0
+        self.indexing_methods = []
+        self.frames_per_method = {}
+        self.crystals_per_method = {}
+        tables = []
+        frame_offsets = []
+        chunk_offsets = []
+        with self.profiler.phase('parse'), ProcessPoolExecutor(max_workers=workers) as executor:
+            n = len(ranges)
+            parts = executor.map(_parse_byte_range, [self.streamfile]*n, ranges, [keep_frames]*n, [self.keep_text]*n,
+                                 [self.summary_only]*n)
+            for i, part in enumerate(parts):
+                if i == 0:
+                    self.header = part.header
+                if not self.end_chunk_line:
+                    self.end_chunk_line = part.end_chunk_line
+                if keep_frames:
+                    self.frames.extend(part.frames)
+                tables.append(part.crystal_table)
+                for name, value in part.profiler.counters.items():
+                    self.profiler.count(name, value)
+                frame_offsets.append(self.indexed_images)
+                chunk_offsets.append(self.images)
+                self.images += part.images
+                self.indexed_images += part.indexed_images
+                for method in part.indexing_methods:
+                    if method not in self.indexing_methods:
+                        self.indexing_methods.append(method)
+                        self.frames_per_method[method] = 0
+                        self.crystals_per_method[method] = 0
+                    self.frames_per_method[method] += part.frames_per_method[method]
+                    self.crystals_per_method[method] += part.crystals_per_method[method]
+        self._crystal_table = CrystalTable.concatenate(tables, frame_offsets, chunk_offsets)
+        if self.cache is not None:
+            self.cache.save(self)
+        
+    @property
+    def crystal_table(self):
+        """
+        CrystalTable with the metadata (cell, resolution, indexing method, frame, filename, event) of all crystals.
+        Filled while parsing the stream. If the counters were taken from the chunk index, the table is loaded from the
+        parse cache, or the stream is parsed (without keeping the frames) the first time the table is requested.
+        """
+        if self._crystal_table is None and not (self.cache is not None and self.load_from_cache()):
+            if self.summary_only:
+                self.scan_stream()
+            else:
+                self.parse_stream()
+        return self._crystal_table
+
+    def load_from_cache(self):
+        """
+        Load the counters and the crystal table from the parse cache, returns whether they were found
+        """
+        with self.profiler.phase('read'):
+            return self.cache.load(self)
+
+    def get_counters_from_index(self):
+        """
+        Set the header and the counters that are normally obtained with parse_stream from the chunk index.
+        """
+        index = self.index
+        with open(self.streamfile, 'rb') as s:
+            self.header = index.read_header(s)
+        self.end_chunk_line = [index.end_chunk_line,] if index.end_chunk_line else []
+        self.images = len(index)
+        self.indexed_images = int(np.count_nonzero(index.indexed))
+        self.indexing_methods = list(index.methods)
+        frame_counts = np.bincount(index.method[index.indexed], minlength=len(index.methods))
+        crystal_counts = np.bincount(index.method[index.indexed], weights=index.get_crystal_counts()[index.indexed],
+                                     minlength=len(index.methods))
+        self.frames_per_method = dict((m, int(frame_counts[i])) for i, m in enumerate(index.methods))
+        self.crystals_per_method = dict((m, int(crystal_counts[i])) for i, m in enumerate(index.methods))
+
+    def read_frames(self, chunks):
+        """
+        Generator that reads and parses the requested chunks by seeking into the stream file. Requires the chunk index.
+        Recently read frames are taken from self.frame_cache.
+        
+        Parameters
+        ----------
+        chunks (list)
+            chunk numbers (position of the chunk in the stream file, starting from 0)
+        
+        Yields
+        ----------
+        frame (Frame)
+        """
+        cache = self.frame_cache
+        with open(self.streamfile, 'rb') as s:
+            for chunk in chunks:
+                frame = cache.get(chunk) if cache is not None else None
+                if frame is None:
+                    frame = self.parse_chunk_data(*self.index.read_chunk(s, chunk))
+                    if cache is not None:
+                        cache.put(chunk, frame)
+                yield frame
+                
+    def get_chunks(self, frames):
+        """
+        Return the chunk numbers of frames. Requires the chunk index.
+        
+        Parameters
+        ----------
+        frames (list or StreamFrames)
+            self.frames or self.indexing
+        """
+        if isinstance(frames, StreamFrames):
+            return frames.get_chunks()
+        if frames is self.frames:
+            return self.index.get_frame_chunks()
+        if getattr(self, 'selected_frames', None) is not None:
+            #self.indexing was selected with select_crystals
+            return self.index.get_frame_chunks()[self.selected_frames]
+        #self.indexing is ordered by indexing method
+        return np.concatenate([self.index.get_frame_chunks([m]) for m in self.selected_methods] + [np.zeros(0, dtype=np.int64)])
+    
+    def get_frame(self, chunk):
+        """
+        Return the Frame of a single chunk by seeking into the stream file. Requires the chunk index.
+        """
+        return next(self.read_frames([chunk]))
+    
+    def get_crystal(self, chunk, n):
+        """
+        Return crystal n of a chunk by seeking into the stream file, with the frame head copied to the crystal.
+        Requires the chunk index.
+        """
+        frame = self.get_frame(chunk)
+        crystal = frame.crystals[n]
+        crystal.head = frame.head
+        return crystal
+
+    
+    def decode_reflections(self, drop_text=True):
+        """
+        Decode the reflections of all crystals in self.frames in one vectorized pass. Every crystal.reflection_array
+        becomes a view into a single structured array. Only possible if the frames are kept in memory.
+        
+        Parameters
+        ----------
+        drop_text (bool)
+            remove the lines of the crystal blocks once decoded. They are read from the stream file again when
+            required (e.g. to save a stream file). Crystals of which the byte offsets are not known keep their text.
             
-        print(' ' * len(prog), end='\r') #get rid of the remaining prog message
+        Returns
+        ----------
+        reflections (numpy structured array)
+            reflections of all crystals (see reflections.REFLECTION_DTYPE), None if not kept in memory
+        offsets (numpy array)
+            reflections of crystal i (in the order of self.frames) are reflections[offsets[i]:offsets[i+1]]
+        panels (list)
+            panel names, the panel field of the reflections is the position in this list (also crystal.panels)
+        """
+        if not isinstance(self.frames, list):
+            print("Reflections can only be decoded in bulk if the stream is kept in memory (in_memory=True)")
+            return None, None, None
         
+        crystals = [crystal for frame in self.frames for crystal in frame.crystals]
+        refls, offsets, panels = reflections.decode_reflections(crystals)
+        for i, crystal in enumerate(crystals):
+            crystal.reflection_array = refls[offsets[i]:offsets[i+1]]
+            crystal.panels = panels
+            
+        if drop_text:
+            for crystal in crystals:
+                crystal.drop_text()
+                
+        return refls, offsets, panels
+    
+    def export_reflections(self, directory, mask=None):
+        """
+        Export the reflections of all (or the selected) crystals to memory-mappable .npy column files, for merging
+        or scaling outside this package. The stream file is read again chunk by chunk, the frames do not need to be
+        kept in memory. See export.export_reflections for the files and export.open_export to load them.
+        
+        Parameters
+        ----------
+        directory (str)
+            output directory
+        mask (numpy array)
+            boolean mask of the crystals to export, in the order of self.crystal_table (see get_crystal_mask).
+            All crystals if None.
+            
+        Returns
+        ----------
+        n (int)
+            number of exported reflections
+        """
+        table = self.crystal_table
+        with self.profiler.phase('write'):
+            n = export.export_reflections(getattr(self, 'streamfiles', self.streamfile), directory, table, mask=mask, byte_range=self.byte_range)
+        crystals = len(table) if mask is None else np.count_nonzero(mask)
+        print('Exported %d reflections of %d crystals to %s' %(n, crystals, directory))
+        return n
+    
+    def get_shell_stats(self, n_shells=10, d_min=None, d_max=None, mask=None):
+        """
+        Statistics of the reflections per resolution shell: number of reflections, unique Miller indices (symmetry
+        equivalents are not merged), multiplicity, mean intensity and mean I/sigma(I). The stream file is read
+        again chunk by chunk and 1/d is computed for every reflection from the unit cell of its crystal.
+        
+        Parameters
+        ----------
+        n_shells (int)
+            number of shells, of equal reciprocal volume
+        d_min (float)
+            high resolution limit (in A). The best resolution limit of the crystals if None.
+        d_max (float)
+            low resolution limit (in A). The first shell includes all low resolution reflections if None.
+        mask (numpy array)
+            boolean mask of the crystals to use, in the order of self.crystal_table. All crystals if None.
+            
+        Returns
+        ----------
+        stats (ShellStats)
+            see shells.ShellStats.get_stats for the statistics per shell
+        """
+        table = self.crystal_table
+        mask = np.ones(len(table), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        if d_min is None:
+            res = table.res[mask]
+            res = res[np.isfinite(res) & (res > 0)]
+            if len(res) == 0:
+                print("No resolution limit found for the crystals, please provide d_min")
+                return None
+            d_min = float(np.min(res))
+        edges = shells.get_shell_edges(d_min, d_max, n_shells)
+        with self.profiler.phase('parse'):
+            batches = reflections.iter_reflection_batches(getattr(self, 'streamfiles', self.streamfile), table,
+                                                          mask=mask, byte_range=self.byte_range)
+            return shells.get_shell_stats(batches, table.get_cell()[mask], edges)
+    
+    def get_shell_summary(self, n_shells=10, d_min=None, d_max=None, mask=None):
+        """
+        Print the statistics of the reflections per resolution shell, see get_shell_stats
+        
+        Returns
+        ----------
+        stats (list)
+            a dictionary per shell, see shells.ShellStats.get_stats
+        """
+        stats = self.get_shell_stats(n_shells=n_shells, d_min=d_min, d_max=d_max, mask=mask)
+        if stats is None:
+            return None
+        shell_stats = stats.get_stats()
+        shells.print_shell_stats(shell_stats, below=stats.below, beyond=stats.beyond)
+        return shell_stats
+    
+    def decode_peaks(self):
+        """
+        Decode the peak lists (peak search results) of all chunks in the stream file(s), indexed or not, in one pass.
+        See peaks.get_peaks_per_frame, peaks.get_peak_count_histograms and peaks.get_radial_histogram for statistics.
+        
+        Returns
+        ----------
+        peak_array (numpy structured array)
+            peaks of all chunks (fs, ss, one_over_d, intensity, panel), see peaks.PEAK_DTYPE
+        offsets (numpy array)
+            peaks of chunk i (in the order of the stream file) are peak_array[offsets[i]:offsets[i+1]]
+        indexed (numpy array)
+            whether chunk i was indexed
+        panels (list)
+            panel names, the panel field of the peaks is the position in this list
+        """
+        with self.profiler.phase('parse'):
+            return peaks.decode_peaks(getattr(self, 'streamfiles', self.streamfile), self.byte_range)
+    
+    def get_peak_summary(self):
+        """
+        Print statistics on the number of peaks per frame for indexed and unindexed frames
+        """
+        peak_array, offsets, indexed, _ = self.decode_peaks()
+        counts = peaks.get_peaks_per_frame(offsets)
+        print(("number of peaks: %d" %(len(peak_array))))
+        for name, frames in [('indexed', indexed), ('unindexed', ~indexed)]:
+            if np.any(frames):
+                print(("   peaks per %s image: mean %.1f, median %d, min %d, max %d" %(name, np.mean(counts[frames]),
+                       np.median(counts[frames]), np.min(counts[frames]), np.max(counts[frames]))))
+        if len(peak_array):
+            print(("Peak resolution (1/d): median %.2f nm^-1, 95%% of the peaks below %.2f nm^-1" %(
+                   np.median(peak_array['one_over_d']), np.percentile(peak_array['one_over_d'], 95))))
     
     def get_index_rate(self):
         """
@@ -212,11 +596,7 @@ class Stream(object):
         """
         d = {}
         for method in self.indexing_methods:
-            i = 0
-            for f in self.frames:
-                if f.indexing == method:
-                    i+=1
-            d[method]=i
+            d[method] = self.frames_per_method[method]
         return d
     
     def get_total_number_of_cystals(self):
@@ -224,7 +604,7 @@ class Stream(object):
         return the amount of crystals. This can be larger than the number of indexed images when
         multiple crystals were identified on a single image, but can never be smaller than the number of indexed images.
         """
-        return len([f.crystals for f in self.frames])
+        return sum(self.crystals_per_method.values())
     
     def get_stream_summary(self):
         """
@@ -242,30 +622,41 @@ class Stream(object):
     def get_cell_stats(self):
         """
         get statistics on cell_parameters
-        """
         
-        aas = []
-        bbs = []
-        ccs = []
-        for frame in self.frames:
-            for crystal in frame.crystals:
-                aas.append(crystal.a)
-                bbs.append(crystal.b)
-                ccs.append(crystal.c)
-                
-        aas = np.array(aas)
-        bbs = np.array(bbs)
-        ccs = np.array(ccs)
+        Returns
+        ----------
+        average and standard deviation of the a, b and c axes (in nm)
+        """
+        table = self.crystal_table
         
-        aas_av = np.average(aas)
-        aas_stdev = np.std(aas)
-        bbs_av = np.average(bbs)
-        bbs_stdev = np.std(bbs)
-        ccs_av = np.average(ccs)
-        ccs_stdev = np.std(ccs)
+        aas_av = np.average(table.a)
+        aas_stdev = np.std(table.a)
+        bbs_av = np.average(table.b)
+        bbs_stdev = np.std(table.b)
+        ccs_av = np.average(table.c)
+        ccs_stdev = np.std(table.c)
     
         return aas_av, aas_stdev, bbs_av, bbs_stdev, ccs_av, ccs_stdev
     
+    def get_angle_stats(self):
+        """
+        get statistics on the cell angles
+        
+        Returns
+        ----------
+        average and standard deviation of the alpha, beta and gamma angles (in degr.)
+        """
+        table = self.crystal_table
+        
+        alpha_av = np.average(table.alpha)
+        alpha_stdev = np.std(table.alpha)
+        beta_av = np.average(table.beta)
+        beta_stdev = np.std(table.beta)
+        gamma_av = np.average(table.gamma)
+        gamma_stdev = np.std(table.gamma)
+        
+        return alpha_av, alpha_stdev, beta_av, beta_stdev, gamma_av, gamma_stdev
+    
     def get_score(self):
         """
         calculate score = indexrate/product-of-stds-on-axes
@@ -281,26 +672,289 @@ class Stream(object):
         stdev_product = aas_stdev * bbs_stdev * ccs_stdev
         
         return rate / stdev_product
-    
-    
+
+    def get_cell_histograms(self, bins=50):
+        """
+        Histogram of every unit cell parameter of all crystals (see cell.get_cell_histograms)
+
+        Returns
+        ----------
+        histograms (dict)
+            (edges, hist) per cell parameter name (a, b, c in nm, alpha, beta, gamma in degr.)
+        """
+        return cell.get_cell_histograms(self.crystal_table.get_cell(), bins=bins)
+
+    def cluster_cells(self, tolerance=0.02, min_count=10):
+        """
+        Cluster the unit cells of all crystals, e.g. to separate polymorphs (see cell.cluster_cells).
+        Crystals of a cluster can be saved with save_selected_images or save_selected_crystals using labels == cluster
+        as mask.
+
+        Parameters
+        ----------
+        tolerance (float)
+            grid bin width relative to the median cell, e.g. 0.02 for 2%
+        min_count (int)
+            minimum number of crystals in a grid bin to be part of a cluster
+
+        Returns
+        ----------
+        labels (numpy array)
+            cluster of every crystal (in the order of self.crystal_table), -1 if not attributed to a cluster.
+            Clusters are numbered from large to small.
+
+        Example
+        ----------
+        labels = cluster_cells()
+        save_selected_crystals('polymorph_1', labels == 0)
+        """
+        return cell.cluster_cells(self.crystal_table.get_cell(), tolerance=tolerance, min_count=min_count)
+
+    def get_cluster_summary(self, tolerance=0.02, min_count=10):
+        """
+        Print the number of crystals, average and standard deviation of the unit cell of every cluster
+
+        Returns
+        ----------
+        labels (numpy array)
+            see cluster_cells
+        """
+        labels = self.cluster_cells(tolerance=tolerance, min_count=min_count)
+        stats = cell.get_cluster_stats(self.crystal_table.get_cell(), labels)
+        print(("number of unit cell clusters: %d (%d crystals not attributed to a cluster)" %(len(stats), np.count_nonzero(labels < 0))))
+        for s in stats:
+            av = s['average']
+            sd = s['stdev']
+            print(("   cluster %d: %d crystals, a b c: %.4f (%.4f) %.4f (%.4f) %.4f (%.4f) nm, al be ga: %.2f (%.2f) %.2f (%.2f) %.2f (%.2f) deg" %(
+                   s['cluster'], s['crystals'], av[0], sd[0], av[1], sd[1], av[2], sd[2], av[3], sd[3], av[4], sd[4], av[5], sd[5])))
+        return labels
+
+
+    def split_stream(self, bins, timeline_root=None, indexed_only=True):
+        """
+        Split the stream file(s) into several output stream files in a single pass, e.g. per time delay (see
+        split.split_stream). The number of frames and crystals, and the cell statistics of every output are printed.
+        
+        Parameters
+        ----------
+        bins (list)
+            split.StreamBin objects with the output stream file and the criteria (time delay tag, event range or
+            filename pattern) of the chunks that are written to it
+        timeline_root (str)
+            write the chunks that do not belong to any of the bins to <timeline_root>_<tag>.stream, per time delay tag
+        indexed_only (bool)
+            only write the indexed chunks
+            
+        Returns
+        ----------
+        bins (list)
+            the bins with their counters (chunks, crystals) and cell statistics (cell)
+            
+        Example
+        ----------
+        split_stream(split.get_timeline_bins({'0ps': 'dark.stream', '100ps': 'light_100ps.stream'}))
+        split_stream([], timeline_root='my_experiment')
+        """
+        from . import split
+        
+        with self.profiler.phase('write'):
+            bins, skipped = split.split_stream(getattr(self, 'streamfiles', self.streamfile), bins,
+                                               timeline_root=timeline_root, indexed_only=indexed_only,
+                                               byte_range=self.byte_range)
+        for b in bins:
+            self.profiler.count('written_chunks', b.chunks)
+        split.get_split_summary(bins, skipped)
+        return bins
+
     def select_indexing_methods(self, args):
         """
         Select images that were indexed with one of the given methods.
         Parameters
         ----------
         args (list)
-            List with indexing methods. Should be the exact indexing methods as given in the streamfile
+            List with indexing methods. Should be the exact indexing methods as given in the streamfile.
+            The selected frames (self.indexing) are grouped by indexing method, in the order of the list.
             
         Example
         ----------
         select_indexing_methods([xgandalf-nolatt-cell, xds-latt-cell])
             
         """
+        self.selected_methods = args
+        self.selected_frames = None
+        self.crystal_selection = None
+        if isinstance(self.frames, StreamFrames):
+            self.indexing = StreamFrames(self, methods=args)
+            return
         self.indexing = []
         for meth in args:
             self.indexing += [f for f in self.frames if f.indexing == meth]
             
-    def save_random_indexed_images(self, root, n, frames=False, indexing=False):
+    def get_crystal_mask(self, cell=None, tolerance=0.01, angle_tolerance=1., resolution=None, methods=None, events=None):
+        """
+        Evaluate selection criteria on the metadata of all crystals at once (see query.crystal_mask).
+        
+        Parameters
+        ----------
+        cell (list)
+            target unit cell: a, b, c (in nm), alpha, beta, gamma (in degr.). Angles can be omitted.
+        tolerance (float)
+            maximum relative deviation of a, b and c from the target cell, e.g. 0.01 for 1%
+        angle_tolerance (float)
+            maximum deviation of the angles from the target cell (in degr.)
+        resolution (float)
+            only crystals with a resolution better than (or equal to) this resolution (in A)
+        methods (list)
+            indexing methods, as given in the stream file
+        events (tuple)
+            (first, last) event numbers, both included
+            
+        Returns
+        ----------
+        mask (numpy array)
+            boolean mask of the selected crystals, in the order of self.crystal_table
+            
+        Example
+        ----------
+        get_crystal_mask(cell=[7.9, 7.9, 3.8, 90, 90, 90], resolution=2.5, methods=['xgandalf-nolatt-cell'], events=(1000, 50000))
+        """
+        table = self.crystal_table
+        with self.profiler.phase('select'):
+            return query.crystal_mask(table, cell=cell, tolerance=tolerance, angle_tolerance=angle_tolerance,
+                                      resolution=resolution, methods=methods, events=events)
+    
+    @property
+    def event_lookup(self):
+        """
+        EventLookup of the chunks by (image filename, event), built from the filename and event codes assigned
+        while parsing. It covers all chunks if the chunk index is used, otherwise the indexed frames.
+        """
+        if self._event_lookup is None:
+            if self.index is not None:
+                self._event_lookup = EventLookup.from_index(self.index)
+            else:
+                self._event_lookup = EventLookup.from_table(self.crystal_table)
+        return self._event_lookup
+    
+    def get_event_mask(self, pairs):
+        """
+        Select the crystals of the frames in a list of (image filename, event) pairs, e.g. from lookup.read_event_list.
+        The list is joined with self.event_lookup at once, without looping over the frames.
+        
+        Parameters
+        ----------
+        pairs (list)
+            (filename, event) tuples. The event can be given as number, "//number" or tag, '' if there is no event.
+            
+        Returns
+        ----------
+        mask (numpy array)
+            boolean mask of the crystals of the listed frames, in the order of self.crystal_table
+            (see get_crystal_mask)
+        """
+        lookup = self.event_lookup
+        table = self.crystal_table
+        with self.profiler.phase('select'):
+            chunks, found = lookup.join(pairs)
+            mask = np.isin(table.chunk, chunks)
+        print("%d out of %d listed images found in the stream file" %(np.count_nonzero(found), len(pairs)))
+        if self.index is not None:
+            print("%d of them indexed" %(np.count_nonzero(self.index.indexed[chunks])))
+        return mask
+    
+    def select_crystals(self, mask):
+        """
+        Select crystals, e.g. with a mask from get_crystal_mask. As with select_indexing_methods, the frames with at
+        least one selected crystal are stored in self.indexing, to be used with indexing=True. Only the selected
+        crystals are detached with detach_crystals_from_frames(indexing=True).
+        
+        Parameters
+        ----------
+        mask (numpy array)
+            boolean mask of the selected crystals, in the order of self.crystal_table
+        """
+        self.selected_methods = None
+        self.selected_frames, self.crystal_selection = query.get_frame_selection(self.crystal_table, np.asarray(mask, dtype=bool))
+        if isinstance(self.frames, StreamFrames):
+            self.indexing = StreamFrames(self, frames=self.selected_frames)
+        else:
+            self.indexing = [self.frames[i] for i in self.selected_frames]
+            
+    def save_selected_images(self, root, mask):
+        """
+        Save all frames with at least one selected crystal to a new stream file, in a single pass.
+        
+        Parameters
+        ----------
+        root (str)
+            prefix of output stream name
+        mask (numpy array)
+            boolean mask of the selected crystals, in the order of self.crystal_table (see get_crystal_mask)
+            
+        Returns
+        ----------
+        f_out (str)
+            name of the output stream file
+        """
+        table = self.crystal_table
+        with self.profiler.phase('select'):
+            mask = np.asarray(mask, dtype=bool)
+            frames = np.unique(table.frame[mask])
+        
+        f_out = '%s_%iselected_images.stream%s'%(root,len(frames),self.compression)
+        print('Saving %d selected frames to %s' %(len(frames), f_out))
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                extract.write_frames(self.index, f_out, self.index.get_frame_chunks()[frames])
+            else:
+                with open_output(f_out) as out:
+                    print(self.header,  file=out)
+                    for f in select_items(self.frames, frames):
+                        refs = [r for reflections in [c.reflections for c in f.crystals] for r in reflections]
+                        print(''.join(f.head+refs+self.end_chunk_line), file=out)
+        self.profiler.count('written_chunks', len(frames))
+        return f_out
+    
+    def save_selected_crystals(self, root, mask):
+        """
+        Save all selected crystals, each with the head of its frame, to a new stream file, in a single pass.
+        
+        Parameters
+        ----------
+        root (str)
+            prefix of output stream name
+        mask (numpy array)
+            boolean mask of the selected crystals, in the order of self.crystal_table (see get_crystal_mask)
+            
+        Returns
+        ----------
+        f_out (str)
+            name of the output stream file
+        """
+        table = self.crystal_table
+        with self.profiler.phase('select'):
+            mask = np.asarray(mask, dtype=bool)
+            frames, selection = query.get_frame_selection(table, mask)
+        
+        f_out = '%s_%iselected_crystals.stream%s'%(root,np.count_nonzero(mask),self.compression)
+        print('Saving %d selected crystals to %s' %(np.count_nonzero(mask), f_out))
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                rows = np.flatnonzero(mask)
+                chunks = self.index.get_frame_chunks()[table.frame[rows]]
+                extract.write_crystals(self.index, f_out, zip(chunks, table.get_crystal_numbers()[rows]))
+            else:
+                selection = iter(selection)
+                with open_output(f_out) as out:
+                    print(self.header,  file=out)
+                    for f in select_items(self.frames, frames):
+                        for c in f.crystals:
+                            if next(selection):
+                                print(''.join(f.head+c.reflections+self.end_chunk_line), file=out)
+        self.profiler.count('written_chunks', np.count_nonzero(mask))
+        return f_out
+            
+    def save_random_indexed_images(self, root, n, frames=False, indexing=False, pipeline=None):
         """
         Save random indexed images (frames), independent on the amount of crystals that are present in each frame, to
         a new stream file.
@@ -315,6 +969,11 @@ class Stream(object):
             use all indexed frames
         indexing (bool)
             use only selected frames with select_indexing_methods
+        pipeline (bool)
+            without chunk index, read (and parse) the frames, format (and compress) them and write them in
+            separate threads (see pipeline.save_pipelined). The frames are written one by one if False.
+            If None, the pipeline is used for compressed output files on machines with several CPUs
+            (see pipeline.use_pipeline).
             
         Returns
         ----------
@@ -337,35 +996,189 @@ class Stream(object):
             f_out = "no_file_written"
             return f_out
             
-        if n > len(frames):
-            print("Number of requested output frames larger than number of indexed images. All images will be writen")
-            n = len(frames)
-            f_out = '%s_%iindexed_images.stream'%(root,n)
-            out = open(f_out, 'w')
-            print(self.header,  file=out)
-            print('Saving %d indexed frames to %s' %(n, f_out))
-            for f in frames:
-                #first merge all crystal information in a single flat list
-                refs = [r for reflections in [c.reflections for c in f.crystals] for r in reflections]
-                print(''.join(f.head+refs+self.end_chunk_line), file=out)
-            out.close()
-        
-        else:
-            total = len(frames)
-            sele = random.sample(list(range(total)),n)
-            f_out = '%s_%iindexed_images.stream'%(root,n)
-            out = open(f_out, 'w')
-            print(self.header,  file=out)
-            print('Saving %d indexed frames to %s' %(n, f_out))
-            for i,f in enumerate(frames):
-                if i in sele:
+        with self.profiler.phase('select'):
+            if n > len(frames):
+                print("Number of requested output frames larger than number of indexed images. All images will be writen")
+                n = len(frames)
+                sele = range(n)
+            else:
+                total = len(frames)
+                sele = random.sample(list(range(total)),n)
+            
+        f_out = '%s_%iindexed_images.stream%s'%(root,n,self.compression)
+        print('Saving %d indexed frames to %s' %(n, f_out))
+        if pipeline is None:
+            pipeline = use_pipeline(f_out)
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                #copy the selected chunks straight from the stream file
+                chunks = self.get_chunks(frames)[sorted(sele)]
+                extract.write_frames(self.index, f_out, chunks)
+            elif pipeline:
+                end_chunk_line = ''.join(self.end_chunk_line)
+                def format_frame(f):
+                    refs = [r for reflections in [c.reflections for c in f.crystals] for r in reflections]
+                    return ''.join(f.head+refs) + end_chunk_line + '\n'
+                save_pipelined(f_out, self.header, select_items(frames, sele), format_frame)
+            else:
+                out = open_output(f_out)
+                print(self.header,  file=out)
+                for f in select_items(frames, sele):
                     #first merge all crystal information in a single flat list
                     refs = [r for reflections in [c.reflections for c in f.crystals] for r in reflections]
                     print(''.join(f.head+refs+self.end_chunk_line), file=out)
-            out.close()
+                out.close()
+        self.profiler.count('written_chunks', n)
+            
+        return f_out
+    
+    def sample_indexed_images(self, root, n, methods=None, seed=None):
+        """
+        Save random indexed images (frames) to a new stream file in a single pass over the stream, without building
+        a list of frames. Exactly n frames are selected with sequential selection sampling, which is possible since
+        the number of indexed frames per indexing method is known after parsing (or from the chunk index).
+        With the chunk index, no frame is parsed and the selected chunks are copied from the stream file.
+        
+        Parameters
+        ----------
+        root (str)
+            prefix of output stream name
+        n (int)
+            number of random frames that will be included in the output stream
+        methods (list)
+            only select frames indexed with one of these indexing methods. All indexed frames if None.
+        seed (int)
+            seed of the random number generator, for a reproducible selection
+            
+        Returns
+        ----------
+        f_out (str)
+            name of the output stream file
+        """
+        if methods is None:
+            methods = self.indexing_methods
+        total = sum(self.frames_per_method.get(m, 0) for m in methods)
+        if n > total:
+            print("Number of requested output frames larger than number of indexed images. All images will be writen")
+            n = total
+        rng = random.Random(seed)
+        
+        f_out = '%s_%iindexed_images.stream%s'%(root,n,self.compression)
+        print('Saving %d indexed frames to %s' %(n, f_out))
+        #the frames are selected while writing
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                chunks = selection_sample(self.index.get_frame_chunks(methods), n, total, rng)
+                extract.write_frames(self.index, f_out, chunks)
+            else:
+                frames = (f for f in self.iter_frames() if f.indexing in methods)
+                with open_output(f_out) as out:
+                    print(self.header,  file=out)
+                    for f in selection_sample(frames, n, total, rng):
+                        refs = [r for reflections in [c.reflections for c in f.crystals] for r in reflections]
+                        print(''.join(f.head+refs+self.end_chunk_line), file=out)
+        self.profiler.count('written_chunks', n)
+        return f_out
+    
+    def sample_indexed_crystals(self, root, n, methods=None, seed=None):
+        """
+        Save random indexed crystals, each with the head of its frame, to a new stream file in a single pass over
+        the stream, without detaching the crystals from the frames first. See sample_indexed_images.
+        
+        Parameters
+        ----------
+        root (str)
+            prefix of output stream name
+        n (int)
+            number of random crystals that will be included in the output stream
+        methods (list)
+            only select crystals indexed with one of these indexing methods. All crystals if None.
+        seed (int)
+            seed of the random number generator, for a reproducible selection
             
+        Returns
+        ----------
+        f_out (str)
+            name of the output stream file
+        """
+        if methods is None:
+            methods = self.indexing_methods
+        total = sum(self.crystals_per_method.get(m, 0) for m in methods)
+        if n > total:
+            print("Number of requested output frames larger than number of indexed images. All images will be writen")
+            n = total
+        rng = random.Random(seed)
+        
+        f_out = '%s_%iindexed_crystals.stream%s'%(root,n,self.compression)
+        print('Saving %d indexed frames to %s' %(n, f_out))
+        #the crystals are selected while writing
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                crystal_chunks, crystal_numbers = self.index.get_crystals(self.index.get_frame_chunks(methods))
+                crystals = selection_sample(zip(crystal_chunks, crystal_numbers), n, total, rng)
+                extract.write_crystals(self.index, f_out, crystals)
+            else:
+                crystals = ((f, c) for f in self.iter_frames() if f.indexing in methods for c in f.crystals)
+                with open_output(f_out) as out:
+                    print(self.header,  file=out)
+                    for f, c in selection_sample(crystals, n, total, rng):
+                        print(''.join(f.head+c.reflections+self.end_chunk_line), file=out)
+        self.profiler.count('written_chunks', n)
         return f_out
     
+    def save_random_partitions(self, root, k, crystals=False, bootstrap=False, methods=None, seed=None):
+        """
+        Divide the indexed frames (or crystals) randomly over k disjoint subsets of (almost) equal size, e.g. half-datasets
+        for k=2, or draw k bootstrap samples (with replacement, of the same size as the full dataset), and write all
+        of them in a single pass over the stream file(s) (see split.partition_stream).
+        
+        Parameters
+        ----------
+        root (str)
+            prefix of output stream names
+        k (int)
+            number of subsets or bootstrap samples
+        crystals (bool)
+            divide the crystals, every crystal is saved with the head of its frame as with save_random_indexed_crystals
+        bootstrap (bool)
+            draw bootstrap samples instead of disjoint subsets
+        methods (list)
+            only use frames (crystals) indexed with one of these indexing methods. All indexed frames if None.
+        seed (int)
+            seed of the random number generator, for reproducible subsets
+            
+        Returns
+        ----------
+        f_outs (list)
+            names of the output stream files
+        """
+        from . import split
+        
+        if methods is None:
+            methods = self.indexing_methods
+        counters = self.crystals_per_method if crystals else self.frames_per_method
+        total = sum(counters.get(m, 0) for m in methods)
+        rng = np.random.default_rng(seed)
+        with self.profiler.phase('select'):
+            if bootstrap:
+                counts = get_bootstrap_counts(total, k, rng)
+            else:
+                counts = get_partition_counts(total, k, rng)
+        
+        kind = 'crystals' if crystals else 'images'
+        name = 'bootstrap' if bootstrap else 'part'
+        sizes = counts.sum(axis=0)
+        f_outs = ['%s_%s%i_%iindexed_%s.stream%s'%(root,name,i+1,sizes[i],kind,self.compression) for i in range(k)]
+        print('Saving %d %s of %s indexed %s to %s' %(k, 'bootstrap samples' if bootstrap else 'subsets', total,
+                                                      kind.replace('images', 'frames'), ', '.join(f_outs)))
+        with self.profiler.phase('write'):
+            bins = split.partition_stream(getattr(self, 'streamfiles', self.streamfile),
+                                          [split.StreamBin(f) for f in f_outs], counts, crystals=crystals,
+                                          methods=methods, byte_range=self.byte_range)
+        for b in bins:
+            self.profiler.count('written_chunks', b.chunks)
+        return f_outs
+    
     def copy_frame_head_to_crystal(self, frames=False, indexing=False):
         """
         copy frame.head to crystal.head if the latter has not been defined yet.
@@ -381,6 +1194,17 @@ class Stream(object):
         No return unless the crystal.head has already been defined, or
             indexing=True is selected while select_indexing_methods is not run yet
         """
+        if isinstance(self.frames, StreamFrames):
+            #frames are re-read from the stream file, the head is copied while iterating over the crystals
+            if indexing and not hasattr(self, 'indexing'):
+                print('Please select the different indexing methods to be saved with "select_indexing_methods"')
+            elif frames or indexing:
+                self.head_copied = True
+            else:
+                print("Please specify if you want to carry out the operation on all indexed frames (frames=True, indexing=False)")
+                print("or all frames with selected indexing method (frames=False, indexing=True)")
+            return
+
         if self.frames[0].crystals[0].head:
             return
         
@@ -425,11 +1249,30 @@ class Stream(object):
         if hasattr(self, "crystals"):
             return
         
-        if not self.frames[0].crystals[0].head:
+        if isinstance(self.frames, StreamFrames):
+            if not getattr(self, 'head_copied', False):
+                print('Please copy frame head to crystal head first with "copy_frame_head_to_crystal"')
+            elif frames:
+                self.crystal_frames = self.frames
+                self.crystals = StreamCrystals(self.frames)
+            elif indexing and hasattr(self, 'indexing'):
+                self.crystal_frames = self.indexing
+                self.crystals = StreamCrystals(self.indexing, selection=getattr(self, 'crystal_selection', None))
+            elif indexing:
+                print('Please select the different indexing methods to be saved with "select_indexing_methods"')
+            else:
+                print("Please specify if you want to carry out the operation on all indexed frames (frames=True, indexing=False)")
+                print("or all frames with selected indexing method (frames=False, indexing=True)")
+            return
+
+        #check the frames that will be detached, the first indexed frame is not necessarily selected
+        detached = self.indexing if indexing and not frames and hasattr(self, 'indexing') else self.frames
+        if detached and not detached[0].crystals[0].head:
             print('Please copy frame head to crystal head first with "copy_frame_head_to_crystal"')
             return
         
         if frames:
+            self.crystal_frames = self.frames
             self.crystals = []
             self.crystals += [crystal for frame in self.frames for crystal in frame.crystals]
         
@@ -438,8 +1281,12 @@ class Stream(object):
                 print('Please select the different indexing methods to be saved with "select_indexing_methods"')
                 return
             else:
+                self.crystal_frames = self.indexing
                 self.crystals = []
                 self.crystals += [crystal for frame in self.indexing for crystal in frame.crystals]
+                if getattr(self, 'crystal_selection', None) is not None:
+                    #only the crystals selected with select_crystals
+                    self.crystals = [crystal for crystal, keep in zip(self.crystals, self.crystal_selection) if keep]
         else:
             print("Please specify if you want to carry out the operation on all indexed frames (frames=True, indexing=False)")
             print("or all frames with selected indexing method (frames=False, indexing=True)")
@@ -468,60 +1315,644 @@ class Stream(object):
             f_out = "no_file_written"
             return f_out
         
-        if n > len(self.crystals):
-            print("Number of requested output frames larger than number of indexed images. All images will be writen")
-            n = len(self.crystals)
-            f_out = '%s_%iindexed_crystals.stream'%(root,n)
-            out = open(f_out, 'w')
-            print(self.header,  file=out)
-            print('Saving %d indexed frames to %s' %(n, f_out))
-            for c in self.crystals:
-                print(''.join(c.head+c.reflections+self.end_chunk_line), file=out)
-            out.close()
-        
-        else:
-            total = len(self.crystals)
-            sele = random.sample(list(range(total)),n)
-            f_out = '%s_%iindexed_crystals.stream'%(root,n)
-            out = open(f_out, 'w')
-            print(self.header,  file=out)
-            print('Saving %d indexed frames to %s' %(n, f_out))
-            for i,c in enumerate(self.crystals):
-                if i in sele:
+        with self.profiler.phase('select'):
+            if n > len(self.crystals):
+                print("Number of requested output frames larger than number of indexed images. All images will be writen")
+                n = len(self.crystals)
+                sele = range(n)
+            else:
+                total = len(self.crystals)
+                sele = random.sample(list(range(total)),n)
+            
+        f_out = '%s_%iindexed_crystals.stream%s'%(root,n,self.compression)
+        print('Saving %d indexed frames to %s' %(n, f_out))
+        with self.profiler.phase('write'):
+            if self.index is not None:
+                #copy the frame heads and selected crystal blocks straight from the stream file
+                crystal_chunks, crystal_numbers = self.index.get_crystals(self.get_chunks(self.crystal_frames))
+                if self.crystal_frames is getattr(self, 'indexing', None) and getattr(self, 'crystal_selection', None) is not None:
+                    crystal_chunks = crystal_chunks[self.crystal_selection]
+                    crystal_numbers = crystal_numbers[self.crystal_selection]
+                sele = sorted(sele)
+                extract.write_crystals(self.index, f_out, zip(crystal_chunks[sele], crystal_numbers[sele]))
+            else:
+                out = open_output(f_out)
+                print(self.header,  file=out)
+                for c in select_items(self.crystals, sele):
                     print(''.join(c.head+c.reflections+self.end_chunk_line), file=out)
-            out.close()
+                out.close()
+        self.profiler.count('written_chunks', n)
             
         return f_out
 
 
 
-class Frame():
+class StreamFrames(object):
+    """
+    Sequence view on the indexed frames of a stream file that is not kept in memory.
+    Without the chunk index, the stream file is re-read chunk by chunk every time the object is looped over.
+    With the chunk index (Stream(lazy=True)), indexing, slicing and iterating only read and parse the chunks that
+    are accessed, by seeking into the stream file, and recently accessed frames are kept in Stream.frame_cache.
+    
+    Parameters
+    ----------
+    stream (Stream)
+        parsed Stream object (counters should be available)
+    methods (list)
+        only return frames indexed with one of these indexing methods, grouped by indexing method in the order of
+        the list (as Stream.indexing after select_indexing_methods with frames in memory). All indexed frames,
+        in file order, if None.
+    frames (numpy array)
+        only return these indexed frames (numbers of the indexed frames, as in Stream.crystal_table.frame).
+        All indexed frames if None.
+        
+    Example
+    ----------
+    S = Stream('my.stream', lazy=True)
+    frame = S.frames[1000]     #parses a single chunk
+    first = S.frames[:10]      #view, nothing is parsed until it is accessed
+    """
+    
+    def __init__(self, stream, methods=None, frames=None):
+        self.stream = stream
+        self.methods = methods
+        self.frames = frames
+        self._chunks = None
+        
+    def __iter__(self):
+        if self.stream.index is not None and (self.frames is not None or self.methods is not None):
+            #only read the chunks of the view
+            for frame in self.stream.read_frames(self.get_chunks()):
+                yield frame
+            return
+        if self.frames is not None:
+            for frame in select_items(self.stream.iter_frames(), self.frames):
+                yield frame
+            return
+        if self.methods is None:
+            for frame in self.stream.iter_frames():
+                yield frame
+            return
+        #one pass over the stream file per indexing method
+        for method in self.methods:
+            for frame in self.stream.iter_frames():
+                if frame.indexing == method:
+                    yield frame
+                
+    def __len__(self):
+        if self.frames is not None:
+            return len(self.frames)
+        return sum(self.stream.frames_per_method.get(m, 0) for m in self.get_methods())
+    
+    def __getitem__(self, item):
+        """
+        Return a single frame, or a view on a slice of the frames (StreamFrames)
+        """
+        if isinstance(item, slice):
+            return StreamFrames(self.stream, frames=self.get_positions()[item])
+        n = len(self)
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError('frame index out of range')
+        if self.stream.index is not None:
+            return self.stream.get_frame(self.get_chunks()[item])
+        return next(select_items(iter(self), [item]))
+    
+    def get_methods(self):
+        if self.methods is None:
+            return self.stream.indexing_methods
+        return self.methods
+    
+    def get_positions(self):
+        """
+        numbers of the indexed frames of the view (as in Stream.crystal_table.frame)
+        """
+        if self.frames is not None:
+            return np.asarray(self.frames, dtype=np.int64)
+        if self.methods is None:
+            return np.arange(len(self))
+        index = self.stream.index
+        if index is not None:
+            method = index.method[index.indexed]
+            positions = [np.flatnonzero(method == index.methods.index(m)) for m in self.methods if m in index.methods]
+        else:
+            table = self.stream.crystal_table
+            positions = [np.unique(table.frame[table.get_method_mask([m])]) for m in self.methods]
+        return np.concatenate(positions + [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+    
+    def get_chunks(self):
+        """
+        chunk numbers of the frames, requires the chunk index
+        """
+        if self._chunks is None:
+            if self.frames is not None:
+                self._chunks = self.stream.index.get_frame_chunks()[self.frames]
+            elif self.methods is None:
+                self._chunks = self.stream.index.get_frame_chunks()
+            else:
+                index = self.stream.index
+                self._chunks = np.concatenate([index.get_frame_chunks([m]) for m in self.methods]
+                                              + [np.zeros(0, dtype=np.int64)])
+        return self._chunks
+    
+    def select(self, selection):
+        """
+        Yield the frames at the positions in selection, in the order of the view. Only the selected chunks are
+        read if the chunk index is available.
+        """
+        if self.stream.index is None:
+            for f in select_items(iter(self), selection):
+                yield f
+        else:
+            chunks = self.get_chunks()[sorted(selection)]
+            for f in self.stream.read_frames(chunks):
+                yield f
+
+
+class FrameCache(object):
+    """
+    Least recently used cache of the frames that are read by seeking into the stream file, by chunk number.
+    The frames are shared: changes to a cached frame are visible the next time it is accessed.
+    
+    Parameters
+    ----------
+    size (int)
+        maximum number of frames, 0 to disable the cache
+        
+    Attributes
+    ----------
+    hits, misses (int)
+        number of frames found and not found in the cache
+    """
+    
+    def __init__(self, size=FRAME_CACHE_SIZE):
+        self.size = size
+        self.frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+    def __len__(self):
+        return len(self.frames)
+    
+    def get(self, chunk):
+        """
+        Return the frame of a chunk, None if it is not in the cache
+        """
+        frame = self.frames.get(chunk)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.frames.move_to_end(chunk)
+        self.hits += 1
+        return frame
+    
+    def put(self, chunk, frame):
+        """
+        Add the frame of a chunk, the least recently used frame is removed if the cache is full
+        """
+        if self.size <= 0:
+            return
+        self.frames[chunk] = frame
+        self.frames.move_to_end(chunk)
+        while len(self.frames) > self.size:
+            self.frames.popitem(last=False)
+            
+    def clear(self):
+        self.frames.clear()
+
+        
+class StreamCrystals(object):
+    """
+    Iterable over the crystals of a StreamFrames object, with frame.head copied to crystal.head.
+    
+    Parameters
+    ----------
+    frames (StreamFrames)
+        frames from which the crystals are detached
+    selection (numpy array)
+        for every crystal of the frames, whether it is detached. All crystals if None.
+    """
+    
+    def __init__(self, frames, selection=None):
+        self.frames = frames
+        self.selection = selection
+        
+    def __iter__(self):
+        i = 0
+        for frame in self.frames:
+            for crystal in frame.crystals:
+                if self.selection is None or self.selection[i]:
+                    crystal.head = frame.head
+                    yield crystal
+                i += 1
+                
+    def __len__(self):
+        if self.selection is not None:
+            return int(np.count_nonzero(self.selection))
+        crystals_per_method = self.frames.stream.crystals_per_method
+        return sum(crystals_per_method.get(m, 0) for m in self.frames.get_methods())
+    
+    def select(self, selection):
+        """
+        Yield the crystals at the positions in selection, in file order. Only the chunks containing
+        selected crystals are read if the chunk index is available.
+        """
+        stream = self.frames.stream
+        if stream.index is None:
+            for c in select_items(iter(self), selection):
+                yield c
+            return
+        
+        sele = sorted(selection)
+        crystal_chunks, crystal_numbers = stream.index.get_crystals(self.frames.get_chunks())
+        if self.selection is not None:
+            crystal_chunks = crystal_chunks[self.selection]
+            crystal_numbers = crystal_numbers[self.selection]
+        crystal_chunks = crystal_chunks[sele]
+        crystal_numbers = crystal_numbers[sele]
+        
+        frame_chunk = -1
+        with open(stream.streamfile, 'rb') as s:
+            for crystal_chunk, n in zip(crystal_chunks, crystal_numbers):
+                if crystal_chunk != frame_chunk:
+                    #crystals of the same frame are consecutive, read every frame only once
+                    frame = stream.parse_chunk_data(*stream.index.read_chunk(s, crystal_chunk))
+                    frame_chunk = crystal_chunk
+                crystal = frame.crystals[n]
+                crystal.head = frame.head
+                yield crystal
+
+
+BEGIN_CHUNK = b'----- Begin chunk -----'
+END_CHUNK = b'----- End chunk -----'
+BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def iter_chunk_data(s, start=0, end=None, block_size=BLOCK_SIZE):
+    """
+    Generator that reads an open (binary) stream file in large blocks and splits it at the chunk delimiters,
+    without looping over the individual lines.
+    
+    Parameters
+    ----------
+    s (file object)
+        stream file opened in binary mode
+    start (int)
+        byte offset to start reading. Should be 0 or the beginning of a chunk
+    end (int)
+        byte offset to stop reading, None to read until the end of the file
+    block_size (int)
+        number of bytes that is read at once
+    
+    Yields
+    ----------
+    (offset, data) (tuple)
+        First the stream header (everything before the first chunk, empty if start is not 0),
+        followed by every complete chunk, from "Begin chunk" up to and including the "End chunk" line.
+        An incomplete chunk at the end is not returned.
+    """
+    s.seek(start)
+    buf = b''
+    buf_offset = start
+    pos = 0
+    to_read = None if end is None else end - start
+    header = True
+    eof = False
+    while True:
+        b = buf.find(BEGIN_CHUNK, pos)
+        if header and (b >= 0 or eof):
+            yield buf_offset, buf[:b] if b >= 0 else buf
+            header = False
+        e = buf.find(END_CHUNK, b) if b >= 0 else -1
+        nl = buf.find(b'\n', e) if e >= 0 else -1
+        if e >= 0 and (nl >= 0 or eof):
+            #a chunk without "End chunk" is followed by a new chunk, start at the last "Begin chunk"
+            b = buf.rfind(BEGIN_CHUNK, b, e)
+            pos = len(buf) if nl < 0 else nl + 1
+            yield buf_offset + b, buf[b:pos]
+            continue
+        if eof:
+            break
+        size = block_size if to_read is None else min(block_size, to_read)
+        block = s.read(size)
+        if to_read is not None:
+            to_read -= len(block)
+        if not block:
+            eof = True
+        else:
+            #only keep the chunk that is being read
+            if header:
+                keep = 0
+            elif b >= 0:
+                keep = b
+            else:
+                keep = pos
+            buf = buf[keep:] + block
+            buf_offset += keep
+            pos -= keep
+            
+            
+def find_chunk_boundaries(streamfile, n):
+    """
+    Split the stream file in (at most) n byte ranges that start at the beginning of a chunk.
+    The first range starts at 0 and contains the stream header.
+    
+    Parameters
+    ----------
+    streamfile (str)
+        CrystFEL stream file
+    n (int)
+        number of requested ranges
+        
+    Returns
+    ----------
+    boundaries (list)
+        sorted byte offsets, from 0 up to the file size. Range i is boundaries[i]:boundaries[i+1]
+    """
+    size = os.path.getsize(streamfile)
+    boundaries = [0]
+    with open(streamfile, 'rb') as s:
+        for i in range(1, n):
+            offset = max(size * i // n, boundaries[-1])
+            s.seek(offset)
+            if offset > 0:
+                #skip the rest of the (partial) line
+                offset += len(s.readline())
+            for line in s:
+                if b'Begin chunk' in line:
+                    break
+                offset += len(line)
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return boundaries
+
+
+def _parse_byte_range(streamfile, byte_range, in_memory, keep_text, summary_only=False):
+    """
+    Parse a byte range of a stream file, to be run in a separate process.
+    """
+    return Stream(streamfile, in_memory=in_memory, keep_text=keep_text, byte_range=byte_range, summary_only=summary_only)
+
+
+def select_items(items, selection):
+    """
+    Yield the items at the positions in selection, in the order of items.
+    
+    Parameters
+    ----------
+    items (list, StreamFrames, StreamCrystals or any iterable)
+        frames or crystals
+    selection (list)
+        positions of the items to select
+    """
+    if hasattr(items, 'select'):
+        return items.select(selection)
+    if isinstance(items, list):
+        return (items[i] for i in sorted(selection))
+    selection = set(selection)
+    return (item for i, item in enumerate(items) if i in selection)
+
+
+def parse_timeline(filename):
+    """
+    Extract the time delay tag from an image filename, e.g. "100ps" for run_0001_tag_100ps.h5.
+    
+    Returns
+    ----------
+    tag (str)
+        the part of the file name (without extension) after "tag_", None if there is no tag
+    """
+    f = os.path.split(filename)[1]
+    parts = os.path.splitext(f)[0].split('tag_')
+    if len(parts) < 2:
+        return None
+    return parts[1]
+
+
+def parse_event(line):
+    """
+    Extract the event from the "Event:" line of a chunk.
+    
+    Returns
+    ----------
+    event (int or str)
+        event number that succeeds "//", or the event tag. Empty string if no event could be extracted
+    """
+    try:
+        #Event should be number that succeeds "//" 
+        event = line.rstrip().lstrip().split("//")[-1]
+        if event:
+            try:
+                event = int(event)
+            except ValueError:
+                event = str(event)
+        else:
+            #Event can also be a tag
+            event = line.rstrip().lstrip().split("Event:")[-1]
+            if event:
+                try:
+                    event = int(event)
+                except ValueError:
+                    event = str(event)
+    except AttributeError:
+        event = ''
+    return event
+
+
+def parse_chunk(lines, offset=None, source=None, keep_text=True):
+    """
+    Dedicate the lines of a single chunk to a frame and its crystals.
+    
+    Parameters
+    ----------
+    lines (list)
+        lines of the chunk, from the "Begin chunk" up to and including the "End chunk" line
+    offset (int)
+        byte offset of the chunk in the stream file. Byte offsets of the frame head and crystal blocks are only
+        recorded if given, which requires that every character of the chunk is a single byte (ASCII).
+    source (str)
+        stream file from which the text can be read again using the byte offsets
+    keep_text (bool)
+        keep the lines of the frame head and crystal blocks. If False (and offset and source are given),
+        only the byte offsets are kept and the text is read from the stream file on demand.
+        
+    Returns
+    ----------
+    frame (Frame)
+        frame.indexed is False if the image was not indexed. Crystals are only attributed to indexed frames.
+    """
+    frame = Frame()
+    frame_stream = []
+    crystal_stream = []
+    append_frame = 1
+    append_crystal = 0
+    crystal = None
+    track = offset is not None
+    keep_text = keep_text or not (track and source)
+    pos = offset
+    head_end = None
+    
+    for line in lines:
+        if track:
+            line_start = pos
+            pos += len(line)
+            
+        if 'Image filename' in line:
+            #interned, since many frames share the same (multi-event) file and tag
+            frame.filename = sys.intern(line.split()[2])
+            tag = parse_timeline(frame.filename)
+            if tag is not None:
+                frame.timeline = sys.intern(tag)
+            
+        elif 'Event:' in line:
+            frame.event = parse_event(line)
+
+        elif 'indexed_by' in line:
+            frame.indexing = sys.intern(line.split()[2].strip())
+            frame.indexed = 'none' not in line
+            
+        elif 'Begin crystal' in line:
+            if append_frame == 1 and track:
+                head_end = line_start
+            append_frame = 0
+            append_crystal = 1
+            crystal = Crystal()
+            if track:
+                crystal.start = line_start
+            
+        elif 'diffraction_resolution_limit' in line and crystal is not None:
+            crystal.res = float(line.split()[5])
+
+        elif 'Cell parameters' in line and crystal is not None:
+            a0, b0, c0 = line.split()[2:5]
+            crystal.a = float(a0)
+            crystal.b = float(b0)
+            crystal.c = float(c0)
+            alpha0, beta0, gamma0 = line.split()[6:9]
+            crystal.alpha = float(alpha0)
+            crystal.beta = float(beta0)
+            crystal.gamma = float(gamma0)
+            
+        elif 'End crystal' in line:
+            if frame.indexed:
+                #attribution of the header cannot be done yet as frame.head is not attributed yet at this stage
+                #Since head can be long, better not to attribute crystal.head yet until required
+                #Then it can be done with the function copy_frame_head_to_crystal below
+                crystal.filename = frame.filename
+                crystal.event = frame.event
+                crystal.timeline = frame.timeline
+                crystal.indexing = frame.indexing
+                crystal.indexed = True
+                if track:
+                    crystal.end = pos
+                    crystal.source = source
+
+                #Attribute the lines of the crystal to the crystal
+                if keep_text:
+                    crystal_stream.append(line)
+                    crystal.reflections = [line for line in crystal_stream if line != "\n"]
+                
+                frame.crystals.append(crystal)
+            append_crystal = 0
+            crystal_stream = []
+
+        elif "End chunk" in line:
+            if append_frame == 1 and track:
+                head_end = line_start
+            break
+
+        if keep_text:
+            if append_frame == 1:
+                frame_stream.append(line)
+            
+            if append_crystal == 1:
+                crystal_stream.append(line)
+
+    if track:
+        frame.source = source
+        frame.start = offset
+        frame.head_end = head_end
+        frame.end = pos
+        
+    #attribute the lines of the chunk to the frame
+    if keep_text:
+        frame.head = frame_stream
+    return frame
+
+
+def read_lines(source, start, end):
+    """
+    Read the lines within a byte range of a stream file.
+    """
+    with open(source, 'rb') as s:
+        s.seek(start)
+        return s.read(end - start).decode().splitlines(keepends=True)
+
+
+class Frame(object):
     """
     Frame object initiate an indexed image from a CrystFEL stream file.
     Attributes:
-        #index = Not used
-                filename = name of the image file (e.g. .h5 file). can be single-event or nulti-event file 
+        filename = name of the image file (e.g. .h5 file). can be single-event or nulti-event file 
         event = event number. Will be left blanc for signle-event images
         timeline = tag. can be used in time-resolved experiments. Key-word will be replaced by tag.
         indexing = method that was used to index the frame
-        head = all info that is listed before the crystal information (including peaks)
+        indexed = whether the image was indexed or not
+        head = all info that is listed before the crystal information (including peaks).
+               Read from the stream file on first access if only the byte offsets were kept.
         crystals = list with crystal info.
+        source = stream file the frame was read from
+        start, head_end, end = byte offsets of the chunk, the end of the head and the end of the chunk in the source,
+               None if unknown
     """
+    __slots__ = ('filename', 'event', 'timeline', 'indexing', 'indexed', 'crystals', '_head',
+                 'source', 'start', 'head_end', 'end')
     
     def __init__(self):
 
-        ##self.index = 'none' #Not used
         self.filename = 'example.h5'
         self.event = ''
         self.timeline = 0
         self.indexing = ''
-        self.head = []
+        self.indexed = False
+        self._head = None
         self.crystals = []
+        self.source = None
+        self.start = None
+        self.head_end = None
+        self.end = None
         
-class Crystal(Frame):
+    @property
+    def head(self):
+        if self._head is None:
+            if self.head_end is None:
+                return []
+            return read_lines(self.source, self.start, self.head_end)
+        return self._head
+    
+    @head.setter
+    def head(self, value):
+        self._head = value
+        
+    def drop_text(self):
+        """
+        Remove the lines of the head and the crystals, they will be read from the stream file on demand.
+        Only possible if the byte offsets are known.
+        """
+        if self.head_end is not None:
+            self._head = None
+            for crystal in self.crystals:
+                crystal.drop_text()
+        
+        
+class Crystal(object):
     """
-    Subclass of frame is a crystal since a frame may contain multiple crystals.
+    A crystal found on a frame, a frame may contain multiple crystals.
     Attributes:
+        filename, event, timeline, indexing, indexed = copied from the frame
+        head = head of the frame, empty until copied with Stream.copy_frame_head_to_crystal
         a = unit cell a axis (in nm)
         b = unit cell b axis (in nm)
         c = unit cell c axis (in nm)
@@ -529,12 +1960,25 @@ class Crystal(Frame):
         beta = unit cell beta angle (in degr.)
         gamma = unit cell gamma angle (in degr.)
         res = resolution (in A)
-        reflections: h,k,l,I, sigma(I), peak, background, fs/px ss/px panel information
+        reflections: all lines of the crystal block, including h,k,l,I, sigma(I), peak, background, fs/px ss/px panel
+                     information. Read from the stream file on first access if only the byte offsets were kept.
+        reflection_array: reflections decoded in a numpy structured array, decoded from the reflections on first access
+        panels: panel names, the panel field of the reflection_array is the position in this list
+        source = stream file the crystal was read from
+        start, end = byte offsets of the crystal block in the source, None if unknown
         
     """
+    __slots__ = ('filename', 'event', 'timeline', 'indexing', 'indexed', 'head',
+                 'a', 'b', 'c', 'alpha', 'beta', 'gamma', 'res',
+                 '_reflections', '_reflection_array', 'panels', 'source', 'start', 'end')
+    
     def __init__(self):
-        #Not clear if heritage will be usefull or not
-        super().__init__()
+        self.filename = 'example.h5'
+        self.event = ''
+        self.timeline = 0
+        self.indexing = ''
+        self.indexed = False
+        self.head = []
         
         self.a = 0
         self.b = 0
@@ -543,9 +1987,41 @@ class Crystal(Frame):
         self.beta = 90.
         self.gamma = 90.
         self.res = 5.
-        self.reflections = ''
-
+        self._reflections = None
+        self._reflection_array = None
+        self.panels = None
+        self.source = None
+        self.start = None
+        self.end = None
         
-
-
-
+    @property
+    def reflections(self):
+        if self._reflections is None:
+            if self.end is None:
+                return []
+            return [line for line in read_lines(self.source, self.start, self.end) if line != "\n"]
+        return self._reflections
+    
+    @reflections.setter
+    def reflections(self, value):
+        self._reflections = value
+        
+    @property
+    def reflection_array(self):
+        if self._reflection_array is None:
+            panels = reflections.PanelTable()
+            self._reflection_array = reflections.decode_reflection_lines(self.reflections, panels)
+            self.panels = panels.panels
+        return self._reflection_array
+    
+    @reflection_array.setter
+    def reflection_array(self, value):
+        self._reflection_array = value
+        
+    def drop_text(self):
+        """
+        Remove the lines of the crystal block, they will be read from the stream file on demand.
+        Only possible if the byte offsets are known.
+        """
+        if self.end is not None:
+            self._reflections = None
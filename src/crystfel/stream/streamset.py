@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import glob
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .stream import Stream, StreamFrames
+from .table import CrystalTable
+from .profiling import Profiler
+
+
+class StreamSet(Stream):
+    """
+    Set of CrystFEL stream files (e.g. the partial streams of a cluster run) that is treated as a single stream,
+    without concatenating the files first. The files are parsed independently, in parallel if workers > 1,
+    after which the frames and counters are merged in the order of the files. The summary, cell statistics,
+    selection and save functions of Stream can be used as is. The header of the first file is used for
+    the output streams.
+
+    Parameters
+    ----------
+    streamfiles (list or str)
+        CrystFEL stream files and/or glob patterns (e.g. "run_*.stream")
+    in_memory (bool)
+        keep all indexed frames in memory (default). See Stream.
+    use_index (bool)
+        use the byte-offset index of every stream file to obtain the counters. See Stream.
+    workers (int)
+        number of processes, every process parses complete stream files
+    keep_text (bool)
+        keep the lines of the frame heads and crystal blocks in memory. See Stream.
+    summary_only (bool)
+        obtain the counters and crystal tables with a fast scan if the frames are not kept in memory. See Stream.
+    use_cache (bool)
+        use the parse cache for every stream file (requires in_memory=False), off by default as it writes a .npz
+        file per parsed stream file to ~/.cache/sx_toolbox/streams. See Stream.
+    profiler (Profiler)
+        collects the timers and counters of all files, see Stream.
+
+    Attributes
+    ----------
+    streams (list)
+        Stream object of every file, with the counters of that file
+    chunk_offsets, frame_offsets (numpy arrays)
+        number of chunks and indexed frames before every file, with the total as last element
+    """
+
+    def __init__(self, streamfiles, in_memory=True, use_index=False, workers=1, keep_text=True, summary_only=False,
+                 use_cache=False, profiler=None):
+        self.streamfiles = expand_streamfiles(streamfiles)
+        self.profiler = Profiler() if profiler is None else profiler
+        self.streamfile = self.streamfiles[0] if self.streamfiles else None
+        self.keep_text = keep_text
+        self.header = ''
+        self.end_chunk_line = []
+        #byte ranges cannot be copied from a single file, the save functions write the parsed text
+        self.index = None
+        self.byte_range = None
+        self._crystal_table = None
+        self.cache = None
+        self.compression = ''
+        self.summary_only = summary_only and not in_memory
+        if in_memory:
+            self.frames = []
+        else:
+            self.frames = StreamFrames(self)
+        self.parse_streams(in_memory, use_index, workers, use_cache)
+
+    def parse_streams(self, in_memory, use_index, workers, use_cache=False):
+        """
+        Parse all stream files and merge the frames and counters.
+        """
+        n = len(self.streamfiles)
+        args = ([in_memory]*n, [use_index]*n, [self.keep_text]*n, [self.summary_only]*n, [use_cache]*n)
+        if workers > 1 and n > 1:
+            with self.profiler.phase('parse'), ProcessPoolExecutor(max_workers=min(workers, n)) as executor:
+                self.streams = []
+                for stream in executor.map(_parse_stream_file, self.streamfiles, *args):
+                    self.streams.append(stream)
+                    print('%4i/%i stream files parsed' % (len(self.streams), n), end='\r')
+                print(' ' * 30, end='\r')
+        else:
+            self.streams = [_parse_stream_file(*a) for a in zip(self.streamfiles, *args)]
+
+        self.images = 0
+        self.indexed_images = 0
+        self.indexing_methods = []
+        self.frames_per_method = {}
+        self.crystals_per_method = {}
+        chunk_offsets = [0]
+        frame_offsets = [0]
+        for stream in self.streams:
+            #the timers of files parsed in other processes overlap, only the total parse time is kept for them
+            if workers == 1 or n == 1:
+                for name, value in stream.profiler.timers.items():
+                    self.profiler.add_time(name, value)
+            for name, value in stream.profiler.counters.items():
+                self.profiler.count(name, value)
+            #frames that are read later are counted by the set
+            stream.profiler = self.profiler
+            if not self.header:
+                self.header = stream.header
+            if not self.end_chunk_line:
+                self.end_chunk_line = stream.end_chunk_line
+            if in_memory:
+                self.frames.extend(stream.frames)
+                #the frames are kept by the set, the file streams only keep their counters
+                stream.frames = []
+            self.images += stream.images
+            self.indexed_images += stream.indexed_images
+            for method in stream.indexing_methods:
+                if method not in self.indexing_methods:
+                    self.indexing_methods.append(method)
+                    self.frames_per_method[method] = 0
+                    self.crystals_per_method[method] = 0
+                self.frames_per_method[method] += stream.frames_per_method[method]
+                self.crystals_per_method[method] += stream.crystals_per_method[method]
+            chunk_offsets.append(self.images)
+            frame_offsets.append(self.indexed_images)
+        self.chunk_offsets = np.array(chunk_offsets, dtype=np.int64)
+        self.frame_offsets = np.array(frame_offsets, dtype=np.int64)
+
+    def iter_chunks(self):
+        """
+        Generator that reads the stream files one after the other, chunk by chunk. See Stream.iter_chunks.
+        """
+        for stream in self.streams:
+            for frame in stream.iter_chunks():
+                yield frame
+
+    @property
+    def crystal_table(self):
+        """
+        CrystalTable of all crystals, in the order of the files. The chunk and frame numbers are counted over
+        all files (see chunk_offsets and frame_offsets).
+        """
+        if self._crystal_table is None:
+            tables = [stream.crystal_table for stream in self.streams]
+            self._crystal_table = CrystalTable.concatenate(tables, self.frame_offsets[:-1], self.chunk_offsets[:-1])
+        return self._crystal_table
+
+    def get_file_stats(self):
+        """
+        Return the indexing statistics of every stream file, e.g. to spot a cluster node that failed.
+
+        Returns
+        ----------
+        stats (list)
+            a dictionary per file with the stream file, the number of processed and indexed images,
+            the indexing rate and the number of crystals
+        """
+        stats = []
+        for stream in self.streams:
+            stats.append({'streamfile': stream.streamfile,
+                          'images': stream.images,
+                          'indexed_images': stream.indexed_images,
+                          'index_rate': stream.get_index_rate(),
+                          'crystals': stream.get_total_number_of_cystals()})
+        return stats
+
+    def get_file_summary(self):
+        """
+        Print the indexing statistics of every stream file
+        """
+        print("%10s %10s %8s %10s  %s" %('images', 'indexed', 'rate', 'crystals', 'stream file'))
+        for s in self.get_file_stats():
+            print("%10d %10d %8.4f %10d  %s" %(s['images'], s['indexed_images'], s['index_rate'], s['crystals'], s['streamfile']))
+
+
+def expand_streamfiles(streamfiles):
+    """
+    Expand the glob patterns in a list of stream files. Files are kept in the given order, matches of a
+    pattern are sorted.
+    """
+    if isinstance(streamfiles, str):
+        streamfiles = [streamfiles]
+    files = []
+    for pattern in streamfiles:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            print("File not found: {:s}".format(pattern))
+        files += [f for f in matches if f not in files]
+    return files
+
+
+def _parse_stream_file(streamfile, in_memory, use_index, keep_text, summary_only, use_cache=False):
+    """
+    Parse a single stream file of a StreamSet, to be run in a separate process.
+    """
+    return Stream(streamfile, in_memory=in_memory, use_index=use_index, keep_text=keep_text, summary_only=summary_only,
+                  use_cache=use_cache)
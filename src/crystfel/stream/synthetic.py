@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import random
+
+METHODS = ('xgandalf-nolatt-cell', 'mosflm-latt-nocell', 'xds-nolatt-nocell')
+#a, b, c (in nm), alpha, beta, gamma (in degr.)
+CELL = (7.91, 7.91, 3.80, 90., 90., 90.)
+
+HEADER = """CrystFEL stream format 2.3
+Generated by CrystFEL 0.10.2
+Command line: indexamajig -i files.lst -o synthetic.stream -g detector.geom -p cell.cell --indexing={methods} --peaks=peakfinder8 -j 32
+----- Begin geometry file -----
+; synthetic single panel detector
+photon_energy = 9500
+clen = 0.100
+res = 5000
+adu_per_photon = 1
+p0/min_fs = 0
+p0/max_fs = 1023
+p0/min_ss = 0
+p0/max_ss = 1023
+p0/corner_x = -512.00
+p0/corner_y = -512.00
+p0/fs = x
+p0/ss = y
+----- End geometry file -----
+----- Begin unit cell -----
+CrystFEL unit cell file version 1.0
+
+lattice_type = tetragonal
+centering = P
+unique_axis = c
+a = {a:.2f} A
+b = {b:.2f} A
+c = {c:.2f} A
+al = {al:.2f} deg
+be = {be:.2f} deg
+ga = {ga:.2f} deg
+----- End unit cell -----
+"""
+
+PEAK_COLUMNS = '  fs/px   ss/px (1/d)/nm^-1   Intensity  Panel\n'
+REFLECTION_COLUMNS = '   h    k    l          I   sigma(I)       peak background  fs/px  ss/px panel\n'
+
+
+def get_chunk(r, number, filename, event, indexing, crystals, reflections, peaks, cell):
+    """
+    Return the text of a single chunk, with random peaks, cells and reflections drawn from the random generator r
+    """
+    lines = ['----- Begin chunk -----\n',
+             'Image filename: %s\n' %(filename),
+             'Event: //%d\n' %(event),
+             'Image serial number: %d\n' %(number + 1),
+             'hit = 1\n',
+             'indexed_by = %s\n' %(indexing),
+             'n_indexing_tries = %d\n' %(1 if indexing == 'none' else r.randint(1, 3)),
+             'photon_energy_eV = 9500.000000\n',
+             'beam_divergence = 0.00e+00 rad\n',
+             'beam_bandwidth = 1.00e-08 (fraction)\n',
+             'average_camera_length = 0.100000 m\n',
+             'num_peaks = %d\n' %(peaks),
+             'peak_resolution = 4.301 nm^-1 or 2.325 A\n',
+             'Peaks from peak search\n',
+             PEAK_COLUMNS]
+    rnd = r.random
+    for _ in range(peaks):
+        lines.append('%7.2f %7.2f %10.2f %11.2f   p0\n' %(1023 * rnd(), 1023 * rnd(), 0.5 + 4 * rnd(), 10 + 1e4 * rnd()))
+    lines.append('End of peak list\n')
+
+    for _ in range(crystals):
+        a, b, c = [x * (1 + r.gauss(0, 0.005)) for x in cell[:3]]
+        al, be, ga = [x + r.gauss(0, 0.1) for x in cell[3:]]
+        res = r.uniform(1.5, 4.)
+        lines += ['--- Begin crystal\n',
+                  'Cell parameters %.5f %.5f %.5f nm, %.5f %.5f %.5f deg\n' %(a, b, c, al, be, ga),
+                  'astar = %+.7f %+.7f %+.7f nm^-1\n' %(1 / a, r.gauss(0, 0.001), r.gauss(0, 0.001)),
+                  'bstar = %+.7f %+.7f %+.7f nm^-1\n' %(r.gauss(0, 0.001), 1 / b, r.gauss(0, 0.001)),
+                  'cstar = %+.7f %+.7f %+.7f nm^-1\n' %(r.gauss(0, 0.001), r.gauss(0, 0.001), 1 / c),
+                  'lattice_type = tetragonal\n',
+                  'centering = P\n',
+                  'unique_axis = c\n',
+                  'profile_radius = 0.00250 nm^-1\n',
+                  'predict_refine/final_residual = %.6f\n' %(rnd()),
+                  'predict_refine/det_shift x = %.3f y = %.3f mm\n' %(r.gauss(0, 0.01), r.gauss(0, 0.01)),
+                  'diffraction_resolution_limit = %.2f nm^-1 or %.2f A\n' %(10 / res, res),
+                  'num_reflections = %d\n' %(reflections),
+                  'num_saturated_reflections = 0\n',
+                  'num_implausible_reflections = 0\n',
+                  'Reflections measured after indexing\n',
+                  REFLECTION_COLUMNS]
+        randint = r.randint
+        for _ in range(reflections):
+            lines.append('%4d %4d %4d %10.2f %10.2f %10.2f %10.2f %6.1f %6.1f p0\n' %(
+                         randint(-30, 30), randint(-30, 30), randint(-15, 15), 1000 * rnd() - 100, 5 + 20 * rnd(),
+                         500 * rnd(), 20 * rnd(), 1023 * rnd(), 1023 * rnd()))
+        lines += ['End of reflections\n',
+                  '--- End crystal\n']
+    lines.append('----- End chunk -----\n')
+    return ''.join(lines)
+
+
+def write_synthetic_stream(streamfile, chunks=1000, indexed_fraction=0.5, crystals_per_frame=2,
+                           reflections_per_crystal=100, peaks_per_frame=50, methods=METHODS[:2],
+                           timelines=('0ps', '100ps', '1ns'), events_per_file=100, cell=CELL, seed=0):
+    """
+    Write a synthetic, but realistic, CrystFEL stream file. The content only depends on the parameters,
+    so that the same file is obtained on every run (e.g. for benchmarks).
+
+    Parameters
+    ----------
+    streamfile (str)
+        output stream file
+    chunks (int)
+        number of chunks (images)
+    indexed_fraction (float)
+        fraction of the chunks that is indexed
+    crystals_per_frame (int)
+        maximum number of crystals per indexed frame, every indexed frame has between 1 and this number of crystals
+    reflections_per_crystal (int)
+        number of reflections of every crystal
+    peaks_per_frame (int)
+        average number of peaks in the peak list of every chunk
+    methods (list)
+        indexing methods, every indexed frame is attributed to one of them
+    timelines (list)
+        time delays, written as tag in the image filenames (e.g. run_0001_tag_100ps.h5), the frames are divided over them
+    events_per_file (int)
+        number of events (images) per image file
+    cell (tuple)
+        average unit cell: a, b, c (in nm), alpha, beta, gamma (in degr.)
+    seed (int)
+        seed of the random generator
+
+    Returns
+    ----------
+    stats (dict)
+        number of chunks, indexed frames and crystals written
+    """
+    r = random.Random(seed)
+    indexed = 0
+    crystals = 0
+    a, b, c, al, be, ga = cell
+    with open(streamfile, 'w') as s:
+        s.write(HEADER.format(methods=','.join(methods), a=a * 10, b=b * 10, c=c * 10, al=al, be=be, ga=ga))
+        for i in range(chunks):
+            tag = timelines[i % len(timelines)] if timelines else None
+            run = i // (events_per_file * max(len(timelines), 1))
+            if tag is None:
+                filename = '/data/synthetic/run_%04d.h5' %(run)
+            else:
+                filename = '/data/synthetic/run_%04d_tag_%s.h5' %(run, tag)
+            event = i // max(len(timelines), 1) % events_per_file
+            if r.random() < indexed_fraction:
+                indexing = methods[r.randrange(len(methods))]
+                n = r.randint(1, crystals_per_frame)
+                indexed += 1
+                crystals += n
+            else:
+                indexing = 'none'
+                n = 0
+            peaks = max(0, int(r.gauss(peaks_per_frame, peaks_per_frame ** 0.5)))
+            s.write(get_chunk(r, i, filename, event, indexing, n, reflections_per_crystal, peaks, cell))
+    return {'chunks': chunks, 'indexed': indexed, 'crystals': crystals}
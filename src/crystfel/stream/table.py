@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+from array import array
+import numpy as np
+
+CELL_PARAMETERS = ['a', 'b', 'c', 'alpha', 'beta', 'gamma']
+#columns of the table with their array typecode
+COLUMNS = {'a': 'd', 'b': 'd', 'c': 'd', 'alpha': 'd', 'beta': 'd', 'gamma': 'd', 'res': 'f', 'method': 'h',
+           'frame': 'i', 'chunk': 'q', 'filename': 'i', 'event': 'i'}
+
+
+class CrystalTable(object):
+    """
+    Columnar store of the crystal metadata of a stream, one row per crystal in the order of the stream.
+    Rows are appended during parsing in compact growable arrays, finalize() turns the columns into numpy arrays.
+
+    Attributes (after finalize)
+    ----------
+    a, b, c (numpy arrays, float64)
+        unit cell axes (in nm)
+    alpha, beta, gamma (numpy arrays, float64)
+        unit cell angles (in degr.)
+    res (numpy array, float32)
+        resolution (in A)
+    method (numpy array, int16)
+        code of the indexing method in self.methods
+    frame (numpy array, int32)
+        number of the indexed frame the crystal belongs to (position in Stream.frames)
+    chunk (numpy array, int64)
+        number of the chunk the crystal belongs to (position in the stream file)
+    filename, event (numpy arrays, int32)
+        code of the image filename in self.filenames and of the event in self.events
+    """
+
+    def __init__(self):
+        self.methods = []
+        self.filenames = []
+        self.events = []
+        self._codes = {'methods': {}, 'filenames': {}, 'events': {}}
+        self._columns = dict((name, array(typecode)) for name, typecode in COLUMNS.items())
+
+    def get_code(self, kind, value):
+        """
+        Return the code of value in the list self.<kind>, add value to the list if required.
+        """
+        codes = self._codes[kind]
+        try:
+            return codes[value]
+        except KeyError:
+            codes[value] = len(codes)
+            getattr(self, kind).append(value)
+            return codes[value]
+
+    def append_frame(self, frame, frame_number, chunk):
+        """
+        Append a row for every crystal of an indexed frame.
+
+        Parameters
+        ----------
+        frame (Frame)
+            indexed frame
+        frame_number (int)
+            number of the indexed frame
+        chunk (int)
+            number of the chunk in the stream file
+        """
+        columns = self._columns
+        method = self.get_code('methods', frame.indexing)
+        filename = self.get_code('filenames', frame.filename)
+        event = self.get_code('events', frame.event)
+        for crystal in frame.crystals:
+            columns['a'].append(crystal.a)
+            columns['b'].append(crystal.b)
+            columns['c'].append(crystal.c)
+            columns['alpha'].append(crystal.alpha)
+            columns['beta'].append(crystal.beta)
+            columns['gamma'].append(crystal.gamma)
+            columns['res'].append(crystal.res)
+            columns['method'].append(method)
+            columns['frame'].append(frame_number)
+            columns['chunk'].append(chunk)
+            columns['filename'].append(filename)
+            columns['event'].append(event)
+
+    def append_crystal(self, cell, res, indexing, filename, event, frame_number, chunk):
+        """
+        Append a row for a single crystal.
+
+        Parameters
+        ----------
+        cell (list)
+            a, b, c, alpha, beta, gamma
+        res (float)
+            resolution
+        indexing, filename, event
+            indexing method, image filename and event of the frame
+        frame_number (int)
+            number of the indexed frame
+        chunk (int)
+            number of the chunk in the stream file
+        """
+        columns = self._columns
+        for name, value in zip(CELL_PARAMETERS, cell):
+            columns[name].append(value)
+        columns['res'].append(res)
+        columns['method'].append(self.get_code('methods', indexing))
+        columns['frame'].append(frame_number)
+        columns['chunk'].append(chunk)
+        columns['filename'].append(self.get_code('filenames', filename))
+        columns['event'].append(self.get_code('events', event))
+
+    def finalize(self):
+        """
+        Convert the columns to numpy arrays. No rows can be appended afterwards.
+        """
+        for name, column in self._columns.items():
+            setattr(self, name, np.frombuffer(column, dtype=column.typecode) if len(column)
+                    else np.zeros(0, dtype=column.typecode))
+        self._columns = None
+        self._codes = None
+        return self
+
+    def snapshot(self):
+        """
+        Return a finalized copy of the rows appended so far. Unlike finalize(), rows can still be appended to this
+        table afterwards, e.g. while following a stream file that is being written.
+        """
+        table = CrystalTable()
+        for name, column in self._columns.items():
+            setattr(table, name, np.frombuffer(column, dtype=column.typecode).copy() if len(column)
+                    else np.zeros(0, dtype=column.typecode))
+        table.methods = list(self.methods)
+        table.filenames = list(self.filenames)
+        table.events = list(self.events)
+        table._columns = None
+        table._codes = None
+        return table
+
+    @classmethod
+    def concatenate(cls, tables, frame_offsets, chunk_offsets):
+        """
+        Concatenate finalized tables of consecutive parts of a stream.
+
+        Parameters
+        ----------
+        tables (list)
+            finalized CrystalTable objects
+        frame_offsets (list)
+            number of indexed frames before every part
+        chunk_offsets (list)
+            number of chunks before every part
+
+        Returns
+        ----------
+        table (CrystalTable)
+            finalized table with the codes of all tables merged
+        """
+        table = cls()
+        columns = dict((name, []) for name in table._columns)
+        for t, frame_offset, chunk_offset in zip(tables, frame_offsets, chunk_offsets):
+            for name in CELL_PARAMETERS + ['res']:
+                columns[name].append(getattr(t, name))
+            columns['frame'].append(t.frame + np.int32(frame_offset))
+            columns['chunk'].append(t.chunk + np.int64(chunk_offset))
+            for name, kind in [('method', 'methods'), ('filename', 'filenames'), ('event', 'events')]:
+                recode = np.array([table.get_code(kind, value) for value in getattr(t, kind)], dtype=table._columns[name].typecode)
+                columns[name].append(recode[getattr(t, name)] if len(recode) else getattr(t, name))
+        for name, column in table._columns.items():
+            setattr(table, name, np.concatenate(columns[name]) if columns[name] else np.zeros(0, dtype=column.typecode))
+        table._columns = None
+        table._codes = None
+        return table
+
+    def select(self, mask):
+        """
+        Return a new finalized table with the rows of a boolean mask (or an array of row numbers). The frame and
+        chunk numbers still refer to the original stream, the codes lists are copied as they are.
+        """
+        table = CrystalTable()
+        for name in table._columns:
+            setattr(table, name, getattr(self, name)[mask])
+        table.methods = list(self.methods)
+        table.filenames = list(self.filenames)
+        table.events = list(self.events)
+        table._columns = None
+        table._codes = None
+        return table
+
+    def __len__(self):
+        return len(self.a)
+
+    def get_cell(self):
+        """
+        Return the unit cell parameters as an (n, 6) array: a, b, c, alpha, beta, gamma
+        """
+        return np.column_stack([getattr(self, name) for name in CELL_PARAMETERS])
+
+    def get_crystal_numbers(self):
+        """
+        Return the number of every crystal within its frame (0 for the first crystal of a frame)
+        """
+        return np.arange(len(self.frame)) - np.searchsorted(self.frame, self.frame)
+
+    def get_method_mask(self, methods):
+        """
+        Return a boolean mask of the crystals indexed with one of the given indexing methods
+        """
+        codes = [self.methods.index(m) for m in methods if m in self.methods]
+        return np.isin(self.method, codes)
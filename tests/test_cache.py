@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import numpy as np
+import pytest
+from stream import cache, synthetic
+from stream.stream import Stream
+from stream.table import COLUMNS
+
+
+@pytest.fixture
+def streamfile(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    streamfile = str(tmp_path / 'cached.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=80, reflections_per_crystal=5, peaks_per_frame=5, seed=5)
+    return streamfile
+
+
+def forbid_parsing(monkeypatch):
+    def fail(self):
+        raise AssertionError('the stream file was parsed')
+    monkeypatch.setattr(Stream, 'parse_stream', fail)
+    monkeypatch.setattr(Stream, 'scan_stream', fail)
+
+
+def test_cache_is_opt_in(streamfile, tmp_path):
+    Stream(streamfile, in_memory=False)
+    assert not os.path.exists(str(tmp_path / 'cache'))
+
+
+def test_cache_requires_frames_on_disk(streamfile):
+    with pytest.raises(ValueError):
+        Stream(streamfile, use_cache=True)
+
+
+@pytest.mark.parametrize('summary_only', [False, True])
+def test_cache_is_loaded(streamfile, monkeypatch, summary_only):
+    first = Stream(streamfile, in_memory=False, summary_only=summary_only, use_cache=True)
+    assert len(os.listdir(cache.CACHE_DIR)) == 1
+    forbid_parsing(monkeypatch)
+    second = Stream(streamfile, in_memory=False, summary_only=summary_only, use_cache=True)
+    assert second.header == first.header
+    assert second.frames_per_method == first.frames_per_method
+    assert second.crystals_per_method == first.crystals_per_method
+    for name in COLUMNS:
+        np.testing.assert_array_equal(getattr(second.crystal_table, name), getattr(first.crystal_table, name))
+
+
+def test_cache_invalidated_by_mtime(streamfile, monkeypatch):
+    Stream(streamfile, in_memory=False, use_cache=True)
+    stat = os.stat(streamfile)
+    os.utime(streamfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    parsed = []
+    parse_stream = Stream.parse_stream
+    monkeypatch.setattr(Stream, 'parse_stream', lambda self: parsed.append(1) or parse_stream(self))
+    Stream(streamfile, in_memory=False, use_cache=True)
+    assert parsed
+
+
+def test_cache_invalidated_by_size(streamfile, tmp_path):
+    first = Stream(streamfile, in_memory=False, use_cache=True)
+    other = str(tmp_path / 'other.stream')
+    synthetic.write_synthetic_stream(other, chunks=20, reflections_per_crystal=5, peaks_per_frame=5, seed=6)
+    with open(other) as f:
+        chunks = f.read()
+    with open(streamfile, 'a') as f:
+        f.write(chunks[chunks.find('----- Begin chunk -----'):])
+    second = Stream(streamfile, in_memory=False, use_cache=True)
+    assert second.images == first.images + 20
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import cell
+
+
+def get_two_cells(n=50):
+    rng = np.random.RandomState(0)
+    first = np.array([50., 60., 70., 90., 90., 90.]) * (1 + 0.001 * rng.randn(n, 6))
+    second = np.array([55., 60., 70., 90., 90., 90.]) * (1 + 0.001 * rng.randn(2 * n, 6))
+    return np.vstack([first, second])
+
+
+def test_cluster_cells_large_to_small():
+    labels = cell.cluster_cells(get_two_cells(), tolerance=0.03, min_count=10)
+    assert np.all(labels[:50] == 1)
+    assert np.all(labels[50:] == 0)
+
+
+def test_cluster_cells_zero_median():
+    cells = get_two_cells()
+    cells[:, 4] = 0
+    normalized = cell.normalize_cells(cells)
+    assert np.all(np.isfinite(normalized))
+    assert np.all(normalized[:, 4] == 0)
+    labels = cell.cluster_cells(cells, tolerance=0.03, min_count=10)
+    assert np.all(labels[:50] == 1)
+    assert np.all(labels[50:] == 0)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import io
+import random
+import pytest
+from stream import synthetic
+from stream.compression import CODECS, ThreadedReader, open_stream
+from stream.stream import Stream
+from test_index import COUNTERS
+from test_table import assert_same_table
+
+
+@pytest.fixture
+def streamfile(tmp_path):
+    streamfile = str(tmp_path / 'plain.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=120, crystals_per_frame=3, reflections_per_crystal=4,
+                                     peaks_per_frame=3)
+    return streamfile
+
+
+def compress(streamfile, ext):
+    with open(streamfile, 'rb') as f:
+        data = f.read()
+    with CODECS[ext].open(streamfile + ext, 'wb') as f:
+        f.write(data)
+    return streamfile + ext
+
+
+def read(path):
+    with open_stream(path) as f:
+        return f.read()
+
+
+def save(streamfile, root, pipeline=None):
+    S = Stream(streamfile)
+    random.seed(5)
+    images = S.save_random_indexed_images(root + '_img', 30, frames=True, pipeline=pipeline)
+    S.copy_frame_head_to_crystal(frames=True)
+    S.detach_crystals_from_frames(frames=True)
+    random.seed(5)
+    crystals = S.save_random_indexed_crystals(root + '_cry', 30)
+    mask = S.crystal_table.res < 2.5
+    selected = S.save_selected_images(root + '_sel', mask)
+    return [images, crystals, selected]
+
+
+@pytest.mark.parametrize('ext', list(CODECS))
+def test_threaded_reader(streamfile, ext):
+    compressed = compress(streamfile, ext)
+    with open(streamfile, 'rb') as f:
+        data = f.read()
+    reader = ThreadedReader(CODECS[ext].open(compressed, 'rb'), block_size=1000)
+    with io.BufferedReader(reader) as f:
+        assert f.read(123) == data[:123]
+        assert f.readline() == data[123:data.index(b'\n', 123) + 1]
+        assert f.read() == data[data.index(b'\n', 123) + 1:]
+    assert read(compressed) == data
+
+
+@pytest.mark.parametrize('ext', list(CODECS))
+def test_compressed_parse(streamfile, ext):
+    expected = Stream(streamfile)
+    for settings in [{}, {'in_memory': False}, {'in_memory': False, 'summary_only': True, 'use_index': True}]:
+        S = Stream(compress(streamfile, ext), **settings)
+        for name in COUNTERS:
+            assert getattr(S, name) == getattr(expected, name)
+        assert S.header == expected.header
+        assert_same_table(S.crystal_table, expected.crystal_table)
+
+
+@pytest.mark.parametrize('ext', list(CODECS))
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_compressed_round_trip(streamfile, tmp_path, ext, pipeline):
+    expected = save(streamfile, str(tmp_path / 'plain'))
+    outputs = save(compress(streamfile, ext), str(tmp_path / 'compressed'), pipeline=pipeline)
+    for output, plain in zip(outputs, expected):
+        assert output.endswith('.stream' + ext)
+        assert read(output) == read(plain)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+import pytest
+from stream import synthetic, reflections
+from stream.export import open_export
+from stream.stream import Stream
+from stream.streamset import StreamSet
+from test_table import assert_same_table
+
+
+def write_stream(path, seed=0):
+    streamfile = str(path)
+    synthetic.write_synthetic_stream(streamfile, chunks=100, crystals_per_frame=3, reflections_per_crystal=6,
+                                     peaks_per_frame=2, seed=seed)
+    #reflections on a second panel
+    with open(streamfile) as f:
+        lines = f.readlines()
+    with open(streamfile, 'w') as f:
+        f.write(''.join(line.replace(' p0\n', ' p1\n') if i % 7 == 0 else line for i, line in enumerate(lines)))
+    return streamfile
+
+
+def get_expected(streamfiles, mask=None):
+    """
+    Reflections, offsets and panel names of the (selected) crystals decoded from the in-memory frames
+    """
+    crystals = [c for streamfile in streamfiles for frame in Stream(streamfile).frames for c in frame.crystals]
+    if mask is not None:
+        crystals = [c for c, selected in zip(crystals, mask) if selected]
+    refls, offsets, panels = reflections.decode_reflections(crystals)
+    return refls, offsets, panels
+
+
+def assert_same_export(directory, expected, table):
+    refls, offsets, panels = expected
+    columns, exported_offsets, exported_table, exported_panels = open_export(directory)
+    assert isinstance(columns['h'], np.memmap)
+    np.testing.assert_array_equal(exported_offsets, offsets)
+    for name in reflections.REFLECTION_DTYPE.names:
+        if name != 'panel':
+            np.testing.assert_array_equal(columns[name], refls[name])
+    assert [exported_panels[p] for p in columns['panel']] == [panels[p] for p in refls['panel']]
+    np.testing.assert_array_equal(columns['crystal'], np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)))
+    assert_same_table(exported_table, table)
+
+
+@pytest.mark.parametrize('selection', [False, True])
+def test_export_round_trip(tmp_path, selection):
+    streamfile = write_stream(tmp_path / 'export.stream')
+    S = Stream(streamfile, in_memory=False)
+    mask = S.crystal_table.res < 2.5 if selection else None
+    n = S.export_reflections(str(tmp_path / 'export'), mask=mask)
+    expected = get_expected([streamfile], mask)
+    assert n == len(expected[0])
+    assert sorted(expected[2]) == ['p0', 'p1']
+    assert_same_export(str(tmp_path / 'export'), expected,
+                       S.crystal_table if mask is None else S.crystal_table.select(mask))
+
+
+def test_export_stream_set(tmp_path):
+    streamfiles = [write_stream(tmp_path / 'first.stream', seed=1), write_stream(tmp_path / 'second.stream', seed=2)]
+    S = StreamSet(streamfiles, in_memory=False)
+    mask = S.crystal_table.res > 2.
+    S.export_reflections(str(tmp_path / 'export'), mask=mask)
+    assert_same_export(str(tmp_path / 'export'), get_expected(streamfiles, mask), S.crystal_table.select(mask))
+
+
+def test_reflection_batches(tmp_path):
+    streamfile = write_stream(tmp_path / 'export.stream')
+    S = Stream(streamfile, in_memory=False)
+    panels = reflections.PanelTable()
+    batches = list(reflections.iter_reflection_batches(streamfile, S.crystal_table, batch_size=50, panels=panels))
+    assert len(batches) > 1
+    refls, offsets, expected_panels = get_expected([streamfile])
+    np.testing.assert_array_equal(np.concatenate([b[0]['I'] for b in batches]), refls['I'])
+    assert sum([list(b[1]) for b in batches], []) == list(np.diff(offsets))
+    assert ([panels.panels[p] for b in batches for p in b[0]['panel']]
+            == [expected_panels[p] for p in refls['panel']])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import random
+import pytest
+from stream import synthetic
+from stream.stream import Stream
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def write_stream(tmp_path, blank_lines=False):
+    streamfile = str(tmp_path / 'extract.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=120, crystals_per_frame=3, reflections_per_crystal=4,
+                                     peaks_per_frame=3)
+    if blank_lines:
+        #blank lines in some crystal blocks, these are not kept by the parser
+        data = read(streamfile).split(b'End of reflections\n')
+        data = b''.join(part + (b'\nEnd of reflections\n' if i % 3 == 0 else b'End of reflections\n')
+                        for i, part in enumerate(data[:-1])) + data[-1]
+        with open(streamfile, 'wb') as f:
+            f.write(data)
+    return streamfile
+
+
+def save_random(streamfile, root, **settings):
+    S = Stream(streamfile, **settings)
+    random.seed(3)
+    images = S.save_random_indexed_images(root + '_img', 25, frames=True)
+    S.copy_frame_head_to_crystal(frames=True)
+    S.detach_crystals_from_frames(frames=True)
+    random.seed(3)
+    crystals = S.save_random_indexed_crystals(root + '_cry', 30)
+    return read(images), read(crystals)
+
+
+def save_selected(streamfile, root, **settings):
+    S = Stream(streamfile, **settings)
+    mask = S.crystal_table.res < 2.5
+    return read(S.save_selected_images(root + '_img', mask)), read(S.save_selected_crystals(root + '_cry', mask))
+
+
+@pytest.mark.parametrize('blank_lines', [False, True])
+@pytest.mark.parametrize('save', [save_random, save_selected])
+def test_byte_ranges_match_parsed_text(tmp_path, blank_lines, save):
+    streamfile = write_stream(tmp_path, blank_lines)
+    expected = save(streamfile, str(tmp_path / 'memory'))
+    assert save(streamfile, str(tmp_path / 'index'), in_memory=False, use_index=True) == expected
+    assert all(len(output) > len(Stream(streamfile).header) for output in expected)
+
+
+def test_byte_ranges_without_copy_file_range(tmp_path, monkeypatch):
+    streamfile = write_stream(tmp_path)
+    expected = save_random(streamfile, str(tmp_path / 'memory'))
+    monkeypatch.delattr(os, 'copy_file_range', raising=False)
+    assert save_random(streamfile, str(tmp_path / 'index'), in_memory=False, use_index=True) == expected
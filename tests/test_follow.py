@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import synthetic
+from stream.stream import Stream
+from stream.follow import StreamFollower
+from stream.table import CrystalTable, COLUMNS
+
+
+def test_follower_crystal_table(tmp_path):
+    complete = str(tmp_path / 'complete.stream')
+    growing = str(tmp_path / 'growing.stream')
+    synthetic.write_synthetic_stream(complete, chunks=80, reflections_per_crystal=5, peaks_per_frame=5)
+    with open(complete, 'rb') as f:
+        data = f.read()
+
+    follower = StreamFollower(growing)
+    #write the stream file in three parts, the first part ends in the middle of a chunk
+    for end in [len(data) // 3, 2 * len(data) // 3, len(data)]:
+        with open(growing, 'wb') as f:
+            f.write(data[:end])
+        follower.update()
+
+    expected = Stream(complete, use_cache=False).crystal_table
+    table = follower.crystal_table
+    assert len(table) == len(expected)
+    for name in COLUMNS:
+        if name not in ('method', 'filename', 'event'):
+            np.testing.assert_array_equal(getattr(table, name), getattr(expected, name))
+    assert [table.filenames[i] for i in table.filename] == [expected.filenames[i] for i in expected.filename]
+    assert [table.events[i] for i in table.event] == [expected.events[i] for i in expected.event]
+
+    labels = follower.cluster_cells()
+    assert len(labels) == len(table)
+    shells = follower.get_shell_stats(n_shells=3)
+    assert shells is not None
+
+
+def test_follower_does_not_recode_rows(tmp_path, monkeypatch):
+    complete = str(tmp_path / 'complete.stream')
+    growing = str(tmp_path / 'growing.stream')
+    synthetic.write_synthetic_stream(complete, chunks=60, reflections_per_crystal=5, peaks_per_frame=5)
+    with open(complete, 'rb') as f:
+        data = f.read()
+    half = data.find(b'----- Begin chunk -----', len(data) // 2)
+
+    calls = []
+    get_code = CrystalTable.get_code
+    monkeypatch.setattr(CrystalTable, 'get_code', lambda self, kind, value: calls.append(kind) or get_code(self, kind, value))
+    monkeypatch.setattr(CrystalTable, 'concatenate', None)
+
+    follower = StreamFollower(growing)
+    with open(growing, 'wb') as f:
+        f.write(data[:half])
+    follower.update()
+    first = follower.indexed_images
+    n_first = len(follower.crystal_table)
+
+    del calls[:]
+    with open(growing, 'wb') as f:
+        f.write(data)
+    follower.update()
+    #only the codes of the new frames are looked up, three per indexed frame (method, filename, event)
+    assert len(calls) == 3 * (follower.indexed_images - first)
+    table = follower.crystal_table
+    assert len(table) > n_first
+    assert len(table) == len(Stream(complete).crystal_table)
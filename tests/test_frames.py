@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import random
+import pytest
+from stream import synthetic
+from stream.stream import Stream
+
+MODES = {'memory': {}, 'lazy': {'lazy': True}, 'streaming': {'in_memory': False},
+         'memory_index': {'use_index': True}}
+
+
+@pytest.fixture
+def streamfile(tmp_path):
+    streamfile = str(tmp_path / 'frames.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=120, reflections_per_crystal=5, peaks_per_frame=5, seed=3)
+    return streamfile
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def save_selection(streamfile, out, mode, methods):
+    S = Stream(streamfile, **MODES[mode])
+    S.select_indexing_methods(methods)
+    random.seed(7)
+    images = S.save_random_indexed_images(out + '_img', 15, indexing=True)
+    S.copy_frame_head_to_crystal(indexing=True)
+    S.detach_crystals_from_frames(indexing=True)
+    random.seed(7)
+    crystals = S.save_random_indexed_crystals(out + '_cry', 20)
+    return read(images), read(crystals)
+
+
+def test_lazy_frames_match_memory(streamfile):
+    memory = Stream(streamfile)
+    lazy = Stream(streamfile, lazy=True)
+    assert len(lazy.frames) == len(memory.frames)
+    for i in [0, 5, -1]:
+        assert lazy.frames[i].head == memory.frames[i].head
+    assert [f.head for f in lazy.frames[3:9]] == [f.head for f in memory.frames[3:9]]
+
+
+@pytest.mark.parametrize('mode', ['lazy', 'streaming', 'memory_index'])
+def test_method_selection_order(streamfile, tmp_path, mode):
+    #the methods are given in the opposite order of their first appearance in the stream file
+    methods = list(reversed(Stream(streamfile).indexing_methods))
+    expected = Stream(streamfile)
+    expected.select_indexing_methods(methods)
+    S = Stream(streamfile, **MODES[mode])
+    S.select_indexing_methods(methods)
+    assert [f.head for f in S.indexing] == [f.head for f in expected.indexing]
+    assert ([f.indexing for f in S.indexing]
+            == [m for m in methods for _ in range(S.frames_per_method[m])])
+
+    assert (save_selection(streamfile, str(tmp_path / mode), mode, methods)
+            == save_selection(streamfile, str(tmp_path / 'memory'), 'memory', methods))
+
+
+def test_lazy_frames_all_positions(streamfile):
+    memory = Stream(streamfile)
+    lazy = Stream(streamfile, lazy=True)
+    heads = [f.head for f in memory.frames]
+    assert [lazy.frames[i].head for i in range(len(heads))] == heads
+    assert [f.head for f in lazy.frames] == heads
+    assert [f.head for f in lazy.frames[::-3]] == heads[::-3]
+    assert [f.head for f in lazy.frames[10:40][5:-5:2]] == heads[10:40][5:-5:2]
+    assert lazy.frames[-len(heads)].head == heads[0]
+    with pytest.raises(IndexError):
+        lazy.frames[len(heads)]
+    assert ([[c.reflections for c in f.crystals] for f in lazy.frames]
+            == [[c.reflections for c in f.crystals] for f in memory.frames])
+
+
+def test_lazy_frames_parse_on_demand(streamfile, monkeypatch):
+    Stream(streamfile, lazy=True)
+    parsed = []
+    parse_chunk_data = Stream.parse_chunk_data
+    monkeypatch.setattr(Stream, 'parse_chunk_data', lambda self, offset, data: parsed.append(offset) or
+                        parse_chunk_data(self, offset, data))
+    #the counters are taken from the saved index, no chunk is parsed
+    S = Stream(streamfile, lazy=True)
+    assert parsed == []
+    view = S.frames[20:30]
+    assert len(view) == 10 and parsed == []
+    frame = view[3]
+    assert len(parsed) == 1
+    assert S.frames[23] is frame
+    assert len(parsed) == 1
+    assert S.frame_cache.hits == 1
+
+
+def test_frame_cache_size(streamfile):
+    S = Stream(streamfile, lazy=True, frame_cache_size=4)
+    frames = [S.frames[i] for i in range(6)]
+    assert len(S.frame_cache) == 4
+    assert S.frames[5] is frames[5]
+    assert S.frames[0] is not frames[0]
+    assert S.frames[0].head == frames[0].head
+    S = Stream(streamfile, lazy=True, frame_cache_size=0)
+    assert S.frames[0] is not S.frames[0]
+    assert len(S.frame_cache) == 0
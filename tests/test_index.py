@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import os
+import numpy as np
+from stream import synthetic
+from stream.index import StreamIndex
+from stream.stream import Stream
+from test_table import assert_same_table, get_indexed_chunks
+
+COUNTERS = ('images', 'indexed_images', 'indexing_methods', 'frames_per_method', 'crystals_per_method')
+
+
+def write_stream(tmp_path, chunks=150, name='index.stream'):
+    streamfile = str(tmp_path / name)
+    synthetic.write_synthetic_stream(streamfile, chunks=chunks, crystals_per_frame=3, reflections_per_crystal=2,
+                                     peaks_per_frame=2)
+    return streamfile
+
+
+def assert_same_counters(S, expected):
+    for name in COUNTERS:
+        assert getattr(S, name) == getattr(expected, name)
+
+
+def test_index_counts_match_parse(tmp_path):
+    streamfile = write_stream(tmp_path)
+    expected = Stream(streamfile)
+    S = Stream(streamfile, in_memory=False, use_index=True)
+    assert os.path.isfile(StreamIndex.get_index_file(streamfile))
+    assert_same_counters(S, expected)
+    assert S.header == expected.header
+    assert S.end_chunk_line == expected.end_chunk_line
+
+    index = S.index
+    assert len(index) == expected.images
+    assert list(index.get_frame_chunks()) == get_indexed_chunks(streamfile)
+    indexed = index.get_frame_chunks()
+    assert list(index.get_crystal_counts()[indexed]) == [len(frame.crystals) for frame in expected.frames]
+    assert [index.get_filename(c) for c in indexed] == [frame.filename for frame in expected.frames]
+    assert [index.get_event(c) for c in indexed] == [frame.event for frame in expected.frames]
+    assert [index.get_indexing(c) for c in indexed] == [frame.indexing for frame in expected.frames]
+    assert_same_table(S.crystal_table, expected.crystal_table)
+
+
+def test_index_is_loaded(tmp_path, monkeypatch):
+    streamfile = write_stream(tmp_path)
+    expected = Stream(streamfile, in_memory=False, use_index=True)
+    monkeypatch.setattr(StreamIndex, 'build', None)
+    S = Stream(streamfile, in_memory=False, use_index=True)
+    assert_same_counters(S, expected)
+
+
+def test_index_invalidated_by_mtime(tmp_path):
+    streamfile = write_stream(tmp_path)
+    index = StreamIndex.open(streamfile)
+    assert StreamIndex.load(streamfile) is not None
+    stat = os.stat(streamfile)
+    os.utime(streamfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert StreamIndex.load(streamfile) is None
+    assert len(StreamIndex.open(streamfile)) == len(index)
+    assert StreamIndex.load(streamfile) is not None
+
+
+def test_index_invalidated_by_size(tmp_path):
+    streamfile = write_stream(tmp_path, chunks=100)
+    Stream(streamfile, in_memory=False, use_index=True)
+    stat = os.stat(streamfile)
+    #write a longer stream file with the same modification time
+    other = write_stream(tmp_path, chunks=130, name='other.stream')
+    os.replace(other, streamfile)
+    os.utime(streamfile, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert StreamIndex.load(streamfile) is None
+    S = Stream(streamfile, in_memory=False, use_index=True)
+    assert_same_counters(S, Stream(streamfile))
+    assert S.images == 130
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import synthetic
+from stream.lookup import EventLookup
+from stream.stream import Stream
+
+
+def get_stream(tmp_path, use_index):
+    streamfile = str(tmp_path / 'synthetic.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=300, reflections_per_crystal=2, peaks_per_frame=2,
+                                     events_per_file=20)
+    return Stream(streamfile, in_memory=False, use_index=use_index, summary_only=True)
+
+
+def test_lookup_every_event_of_the_table(tmp_path):
+    s = get_stream(tmp_path, use_index=False)
+    table = s.crystal_table
+    lookup = EventLookup.from_table(table)
+    for i in range(len(table)):
+        filename = table.filenames[table.filename[i]]
+        event = table.events[table.event[i]]
+        assert lookup.get(filename, event) == table.chunk[i]
+        #the event can also be given as in CrystFEL event lists
+        assert lookup.get(filename, '//%s' %(event)) == table.chunk[i]
+    assert lookup.get('missing.h5', '//0') == -1
+    assert lookup.get(table.filenames[0], '//100000') == -1
+
+
+def test_lookup_join(tmp_path):
+    s = get_stream(tmp_path, use_index=True)
+    table = s.crystal_table
+    pairs = [(table.filenames[table.filename[i]], table.events[table.event[i]]) for i in range(0, len(table), 3)]
+    pairs.append(('missing.h5', '//0'))
+    chunks, found = s.event_lookup.join(pairs)
+    assert list(found) == [True] * (len(pairs) - 1) + [False]
+    assert list(chunks) == sorted(set(int(c) for c in table.chunk[::3]))
+    mask = s.get_event_mask(pairs)
+    assert np.array_equal(mask, np.isin(table.chunk, table.chunk[::3]))
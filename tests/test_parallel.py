@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import pytest
+from stream import synthetic
+from stream.stream import Stream, find_chunk_boundaries
+from stream.streamset import StreamSet
+from test_index import COUNTERS
+from test_table import assert_same_table
+
+
+@pytest.fixture
+def streamfile(tmp_path):
+    streamfile = str(tmp_path / 'parallel.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=200, crystals_per_frame=3, reflections_per_crystal=3,
+                                     peaks_per_frame=3)
+    return streamfile
+
+
+def test_chunk_boundaries(streamfile):
+    boundaries = find_chunk_boundaries(streamfile, 4)
+    assert len(boundaries) == 5
+    with open(streamfile, 'rb') as f:
+        data = f.read()
+    assert boundaries[0] == 0 and boundaries[-1] == len(data)
+    for offset in boundaries[1:-1]:
+        assert data[offset:].startswith(b'----- Begin chunk -----')
+
+
+@pytest.mark.parametrize('settings', [{}, {'in_memory': False}, {'in_memory': False, 'summary_only': True}])
+def test_parallel_parse_matches_serial(streamfile, settings):
+    expected = Stream(streamfile, **settings)
+    S = Stream(streamfile, workers=3, **settings)
+    for name in COUNTERS:
+        assert getattr(S, name) == getattr(expected, name)
+    assert S.header == expected.header
+    assert S.end_chunk_line == expected.end_chunk_line
+    assert_same_table(S.crystal_table, expected.crystal_table)
+    if isinstance(expected.frames, list):
+        assert [f.head for f in S.frames] == [f.head for f in expected.frames]
+        assert ([c.reflections for f in S.frames for c in f.crystals]
+                == [c.reflections for f in expected.frames for c in f.crystals])
+
+
+def test_parallel_stream_set(streamfile, tmp_path):
+    second = str(tmp_path / 'second.stream')
+    synthetic.write_synthetic_stream(second, chunks=80, reflections_per_crystal=3, peaks_per_frame=3, seed=1)
+    expected = StreamSet([streamfile, second], in_memory=False)
+    S = StreamSet([streamfile, second], in_memory=False, workers=2)
+    for name in COUNTERS:
+        assert getattr(S, name) == getattr(expected, name)
+    assert_same_table(S.crystal_table, expected.crystal_table)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import peaks
+from stream.stream import Stream
+from stream.streamset import StreamSet
+
+HEADER = """CrystFEL stream format 2.3
+Generated by CrystFEL 0.10.2
+Command line: indexamajig -i files.lst -o test.stream -g detector.geom --indexing=xgandalf
+----- Begin geometry file -----
+p0/min_fs = 0
+p0/max_fs = 1023
+----- End geometry file -----
+"""
+
+#chunks as written by indexamajig
+UNINDEXED_CHUNK = """----- Begin chunk -----
+Image filename: /data/run_0001.h5
+Event: //0
+Image serial number: 1
+hit = 1
+indexed_by = none
+n_indexing_tries = 0
+photon_energy_eV = 9500.000000
+num_peaks = 2
+peak_resolution = 2.853659 nm^-1 or 3.504323 A
+Peaks from peak search
+  fs/px   ss/px (1/d)/nm^-1   Intensity  Panel
+ 100.50  200.25       1.25      350.00   p0
+ 300.00  400.75       2.85     1200.50   p0
+End of peak list
+----- End chunk -----
+"""
+
+INDEXED_CHUNK = """----- Begin chunk -----
+Image filename: /data/run_0001.h5
+Event: //1
+Image serial number: 2
+hit = 1
+indexed_by = xgandalf-nolatt-cell
+n_indexing_tries = 1
+photon_energy_eV = 9500.000000
+num_peaks = 3
+peak_resolution = 3.100000 nm^-1 or 3.225806 A
+Peaks from peak search
+  fs/px   ss/px (1/d)/nm^-1   Intensity  Panel
+  10.00   20.00       0.50      100.00   p0
+  30.00   40.00       1.50      200.00   p0
+  50.00   60.00       3.10      300.00   p0
+End of peak list
+--- Begin crystal
+Cell parameters 7.91000 7.91000 3.80000 nm, 90.00000 90.00000 90.00000 deg
+astar = +0.1264223 +0.0000000 +0.0000000 nm^-1
+bstar = +0.0000000 +0.1264223 +0.0000000 nm^-1
+cstar = +0.0000000 +0.0000000 +0.2631579 nm^-1
+lattice_type = tetragonal
+centering = P
+unique_axis = c
+profile_radius = 0.00250 nm^-1
+diffraction_resolution_limit = 5.00 nm^-1 or 2.00 A
+num_reflections = 1
+num_saturated_reflections = 0
+num_implausible_reflections = 0
+Reflections measured after indexing
+   h    k    l          I   sigma(I)       peak background  fs/px  ss/px panel
+   1    0    0     100.00      10.00     150.00      20.00  600.0  512.0 p0
+End of reflections
+--- End crystal
+----- End chunk -----
+"""
+
+
+def write_stream(path, chunks):
+    with open(path, 'w') as f:
+        f.write(HEADER + ''.join(chunks))
+    return str(path)
+
+
+def test_peak_rows_real_format():
+    rows, n = peaks.get_peak_rows(INDEXED_CHUNK.encode())
+    assert n == 3
+    assert rows.splitlines()[0].split()[0] == b'10.00'
+
+
+def test_decode_peaks_real_format(tmp_path):
+    streamfile = write_stream(tmp_path / 'real.stream', [UNINDEXED_CHUNK, INDEXED_CHUNK])
+    peak_array, offsets, indexed, panels = peaks.decode_peaks(streamfile)
+    assert list(offsets) == [0, 2, 5]
+    assert list(indexed) == [False, True]
+    np.testing.assert_allclose(peak_array['one_over_d'], [1.25, 2.85, 0.5, 1.5, 3.1], rtol=1e-6)
+    np.testing.assert_allclose(peak_array['intensity'][:2], [350., 1200.5], rtol=1e-6)
+
+
+def test_stream_peaks_real_format(tmp_path):
+    streamfile = write_stream(tmp_path / 'real.stream', [UNINDEXED_CHUNK, INDEXED_CHUNK])
+    s = Stream(streamfile, use_cache=False)
+    peak_array, offsets, indexed, panels = s.decode_peaks()
+    assert len(peak_array) == 5
+    assert list(peaks.get_peaks_per_frame(offsets)) == [2, 3]
+
+
+def test_decode_peaks_skipped_rows(tmp_path):
+    #a truncated row is skipped without attributing the peaks of the next chunk to the wrong chunk
+    broken = UNINDEXED_CHUNK.replace(' 300.00  400.75       2.85     1200.50   p0', ' 300.00  400.75')
+    streamfile = write_stream(tmp_path / 'broken.stream', [broken, INDEXED_CHUNK])
+    peak_array, offsets, indexed, panels = peaks.decode_peaks(streamfile)
+    assert list(offsets) == [0, 1, 4]
+    np.testing.assert_allclose(peak_array['one_over_d'], [1.25, 0.5, 1.5, 3.1], rtol=1e-6)
+
+
+def test_stream_set_peaks(tmp_path):
+    first = write_stream(tmp_path / 'first.stream', [UNINDEXED_CHUNK, INDEXED_CHUNK])
+    second = write_stream(tmp_path / 'second.stream', [INDEXED_CHUNK])
+    peak_array, offsets, indexed, panels = StreamSet([first, second]).decode_peaks()
+    assert list(peaks.get_peaks_per_frame(offsets)) == [2, 3, 3]
+    assert list(indexed) == [False, True, True]
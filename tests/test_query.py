@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import glob
+import numpy as np
+import pytest
+from stream import synthetic, query
+from stream.stream import Stream
+import filter_stream
+
+CRITERIA = [{'cell': [7.91, 7.91, 3.80]},
+            {'cell': [7.91, 7.91, 3.80, 90., 90., 90.], 'tolerance': 0.005, 'angle_tolerance': 0.1},
+            {'resolution': 2.5},
+            {'methods': ['mosflm-latt-nocell']},
+            {'events': (10, 60)},
+            {'cell': [7.91, 7.91, 3.80], 'tolerance': 0.008, 'resolution': 3., 'methods': ['xgandalf-nolatt-cell'],
+             'events': (0, 80)}]
+
+
+@pytest.fixture
+def streamfile(tmp_path):
+    streamfile = str(tmp_path / 'query.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=300, crystals_per_frame=3, reflections_per_crystal=2,
+                                     peaks_per_frame=2)
+    return streamfile
+
+
+def is_selected(frame, crystal, cell=None, tolerance=0.01, angle_tolerance=1., resolution=None, methods=None,
+                events=None):
+    """
+    The selection criteria of query.crystal_mask, one crystal at a time
+    """
+    if cell is not None:
+        values = [crystal.a, crystal.b, crystal.c, crystal.alpha, crystal.beta, crystal.gamma]
+        for i, target in enumerate(cell):
+            limit = tolerance * target if i < 3 else angle_tolerance
+            if abs(values[i] - target) > limit:
+                return False
+    if resolution is not None and crystal.res > resolution:
+        return False
+    if methods is not None and frame.indexing not in methods:
+        return False
+    if events is not None and not (isinstance(frame.event, int) and events[0] <= frame.event <= events[1]):
+        return False
+    return True
+
+
+def get_selection(S, criteria):
+    return [is_selected(frame, crystal, **criteria) for frame in S.frames for crystal in frame.crystals]
+
+
+@pytest.mark.parametrize('criteria', CRITERIA)
+def test_crystal_mask_matches_brute_force(streamfile, criteria):
+    S = Stream(streamfile)
+    expected = get_selection(S, criteria)
+    mask = query.crystal_mask(S.crystal_table, **criteria)
+    assert 0 < np.count_nonzero(mask) < len(mask)
+    assert list(mask) == expected
+
+    frames, selection = query.get_frame_selection(S.crystal_table, mask)
+    selected_frames = [i for i, frame in enumerate(S.frames)
+                       if any(is_selected(frame, crystal, **criteria) for crystal in frame.crystals)]
+    assert list(frames) == selected_frames
+    assert list(selection) == [is_selected(S.frames[i], crystal, **criteria) for i in selected_frames
+                               for crystal in S.frames[i].crystals]
+
+
+@pytest.mark.parametrize('crystals', [False, True])
+def test_filter_stream(streamfile, tmp_path, crystals):
+    criteria = CRITERIA[-1]
+    filter_stream.filter_stream(streamfile, str(tmp_path / 'filtered'), cell=criteria['cell'],
+                                tolerance=criteria['tolerance'], resolution=criteria['resolution'],
+                                indexing_methods=criteria['methods'], events=criteria['events'], crystals=crystals)
+    output, = glob.glob(str(tmp_path / 'filtered_*.stream'))
+    S = Stream(streamfile)
+    if crystals:
+        expected = [(frame.filename, frame.event, crystal.a) for frame in S.frames for crystal in frame.crystals
+                    if is_selected(frame, crystal, **criteria)]
+    else:
+        expected = [(frame.filename, frame.event, crystal.a) for frame in S.frames for crystal in frame.crystals
+                    if any(is_selected(frame, c, **criteria) for c in frame.crystals)]
+    assert [(frame.filename, frame.event, crystal.a) for frame in Stream(output).frames
+            for crystal in frame.crystals] == expected
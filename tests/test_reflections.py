@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import synthetic
+from stream import reflections
+from stream.stream import Stream
+from test_peaks import HEADER, INDEXED_CHUNK, write_stream
+
+
+def get_rows(crystal):
+    first, last = reflections.find_reflection_lines(crystal.reflections)
+    return [line.split() for line in crystal.reflections[first:last]]
+
+
+def test_decode_reflections_matches_rows(tmp_path):
+    streamfile = str(tmp_path / 'synthetic.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=40, reflections_per_crystal=7, peaks_per_frame=3)
+    s = Stream(streamfile, in_memory=True, use_index=False)
+    crystals = [crystal for frame in s.frames for crystal in frame.crystals]
+    rows = [get_rows(crystal) for crystal in crystals]
+    refls, offsets, panels = s.decode_reflections(drop_text=False)
+    assert panels == ['p0']
+    assert list(np.diff(offsets)) == [len(r) for r in rows]
+    flat = [row for r in rows for row in r]
+    for name in ('h', 'k', 'l'):
+        column = reflections.REFLECTION_DTYPE.names.index(name)
+        assert list(refls[name]) == [int(row[column]) for row in flat]
+    np.testing.assert_allclose(refls['I'], [float(row[3]) for row in flat], rtol=1e-6)
+    np.testing.assert_allclose(refls['ss'], [float(row[8]) for row in flat], rtol=1e-6)
+    for i, crystal in enumerate(crystals):
+        assert np.array_equal(crystal.reflection_array, refls[offsets[i]:offsets[i+1]])
+        assert crystal.panels is panels
+
+
+def test_panels_per_stream(tmp_path):
+    #the panel codes of a stream do not depend on the streams decoded before
+    other = write_stream(tmp_path / 'other.stream', [INDEXED_CHUNK.replace(' p0\n', ' q1\n')])
+    streamfile = write_stream(tmp_path / 'real.stream', [INDEXED_CHUNK])
+    refls, offsets, panels = Stream(other, in_memory=True, use_index=False).decode_reflections()
+    assert panels == ['q1']
+    refls, offsets, panels = Stream(streamfile, in_memory=True, use_index=False).decode_reflections()
+    assert panels == ['p0']
+    assert list(refls['panel']) == [0]
+    crystal = Stream(streamfile, in_memory=True, use_index=False).frames[0].crystals[0]
+    assert list(crystal.reflection_array['panel']) == [0]
+    assert crystal.panels == ['p0']
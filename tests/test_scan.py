@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import pytest
+from stream import synthetic
+from stream.stream import Stream, find_chunk_boundaries
+from test_index import COUNTERS
+from test_table import assert_same_table
+from test_peaks import UNINDEXED_CHUNK, INDEXED_CHUNK, write_stream
+
+
+def assert_same_scan(streamfile, **settings):
+    expected = Stream(streamfile, in_memory=False, **settings)
+    S = Stream(streamfile, in_memory=False, summary_only=True, **settings)
+    for name in COUNTERS:
+        assert getattr(S, name) == getattr(expected, name)
+    assert S.header == expected.header
+    assert S.end_chunk_line == expected.end_chunk_line
+    assert_same_table(S.crystal_table, expected.crystal_table)
+    return S
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_scan_matches_parse(tmp_path, seed):
+    streamfile = str(tmp_path / 'scan.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=150, indexed_fraction=0.6, crystals_per_frame=3,
+                                     reflections_per_crystal=4, peaks_per_frame=4, seed=seed)
+    S = assert_same_scan(streamfile)
+    assert S.images == 150
+
+
+def test_scan_real_format(tmp_path):
+    #a crystal without cell and resolution lines, and an incomplete chunk at the end of the file
+    no_cell = INDEXED_CHUNK.replace('Cell parameters 7.91000 7.91000 3.80000 nm, 90.00000 90.00000 90.00000 deg\n', '')
+    no_cell = no_cell.replace('diffraction_resolution_limit = 5.00 nm^-1 or 2.00 A\n', '')
+    incomplete = INDEXED_CHUNK[:INDEXED_CHUNK.find('--- End crystal')]
+    streamfile = write_stream(tmp_path / 'real.stream', [UNINDEXED_CHUNK, INDEXED_CHUNK, no_cell, incomplete])
+    S = assert_same_scan(streamfile)
+    assert S.images == 3
+    assert S.indexed_images == 2
+    assert list(S.crystal_table.res) == [2., 5.]
+
+
+def test_scan_byte_range(tmp_path):
+    streamfile = str(tmp_path / 'scan.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=100, reflections_per_crystal=2, peaks_per_frame=2)
+    boundaries = find_chunk_boundaries(streamfile, 3)
+    for byte_range in zip(boundaries[:-1], boundaries[1:]):
+        assert_same_scan(streamfile, byte_range=byte_range)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import random
+import pytest
+import save_random_indexed_images
+import save_random_indexed_crystals
+from stream import synthetic
+from stream.stream import Stream
+
+
+@pytest.fixture
+def streamfile(tmp_path):
+    streamfile = str(tmp_path / 'input.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=150, reflections_per_crystal=5, peaks_per_frame=5, seed=4)
+    return streamfile
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('methods', [None, list(reversed(synthetic.METHODS[:2]))])
+def test_save_random_indexed_images_script(streamfile, tmp_path, methods):
+    save_random_indexed_images.select_indexed_images(streamfile, str(tmp_path / 'script'), 25,
+                                                     indexing_methods=methods, seed=11)
+    #the calls of the original script, with all frames in memory
+    S = Stream(streamfile)
+    random.seed(11)
+    if methods:
+        S.select_indexing_methods(methods)
+        expected = S.save_random_indexed_images(str(tmp_path / 'memory'), 25, indexing=True)
+    else:
+        expected = S.save_random_indexed_images(str(tmp_path / 'memory'), 25, frames=True)
+    assert read(str(tmp_path / 'script_25indexed_images.stream')) == read(expected)
+
+
+@pytest.mark.parametrize('methods', [None, list(reversed(synthetic.METHODS[:2]))])
+def test_save_random_indexed_crystals_script(streamfile, tmp_path, methods):
+    save_random_indexed_crystals.select_indexed_images(streamfile, str(tmp_path / 'script'), 30,
+                                                       indexing_methods=methods, seed=12)
+    S = Stream(streamfile)
+    random.seed(12)
+    if methods:
+        S.select_indexing_methods(methods)
+        S.copy_frame_head_to_crystal(indexing=True)
+        S.detach_crystals_from_frames(indexing=True)
+    else:
+        S.copy_frame_head_to_crystal(frames=True)
+        S.detach_crystals_from_frames(frames=True)
+    expected = S.save_random_indexed_crystals(str(tmp_path / 'memory'), 30)
+    assert read(str(tmp_path / 'script_30indexed_crystals.stream')) == read(expected)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+from stream import split, synthetic
+from stream.stream import Stream
+from stream.streamset import StreamSet
+
+
+def write_streams(tmp_path):
+    first = str(tmp_path / 'first.stream')
+    second = str(tmp_path / 'second.stream')
+    stats = [synthetic.write_synthetic_stream(first, chunks=60, reflections_per_crystal=5, peaks_per_frame=5, seed=1),
+             synthetic.write_synthetic_stream(second, chunks=90, reflections_per_crystal=5, peaks_per_frame=5, seed=2)]
+    return [first, second], stats
+
+
+def test_split_stream_set(tmp_path):
+    streamfiles, stats = write_streams(tmp_path)
+    s = StreamSet(streamfiles)
+    bins = s.split_stream([], timeline_root=str(tmp_path / 'split'))
+    assert sum(b.chunks for b in bins) == sum(st['indexed'] for st in stats)
+    assert sum(b.crystals for b in bins) == sum(st['crystals'] for st in stats)
+    for b in bins:
+        assert Stream(b.output, use_cache=False).indexed_images == b.chunks
+
+
+def test_partition_stream_set(tmp_path):
+    streamfiles, stats = write_streams(tmp_path)
+    s = StreamSet(streamfiles)
+    f_outs = s.save_random_partitions(str(tmp_path / 'half'), 2, seed=0)
+    sizes = [Stream(f, use_cache=False).indexed_images for f in f_outs]
+    assert sum(sizes) == sum(st['indexed'] for st in stats)
+    for f, size in zip(f_outs, sizes):
+        assert '_%iindexed_images' %(size) in f
+
+
+def test_partition_stream_set_crystals(tmp_path):
+    streamfiles, stats = write_streams(tmp_path)
+    s = StreamSet(streamfiles)
+    f_outs = s.save_random_partitions(str(tmp_path / 'boot'), 3, crystals=True, bootstrap=True, seed=0)
+    total = sum(st['crystals'] for st in stats)
+    for f in f_outs:
+        assert Stream(f, use_cache=False).indexed_images == total
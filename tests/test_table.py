@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+authors and contact information
+-------
+Elke De Zitter - elke.de-zitter@ibs.fr
+Nicolas Coquelle - nicolas.coquelle@ibs.fr
+Jacques Philippe Colletier - jacques-Philippe.colletier@ibs.fr
+
+
+license information
+-------
+Copyright (c) 2022 Elke De Zitter, Nicolas Coquelle, Jacques-Philippe Collettier
+https://github.com/ElkeDeZitter/SX_toolbox/blob/main/LICENSE
+"""
+
+import numpy as np
+from stream import synthetic
+from stream.stream import Stream
+from stream.table import COLUMNS, CELL_PARAMETERS
+
+
+def assert_same_table(table, expected):
+    """
+    The tables have the same rows, the codes can differ as long as they refer to the same values
+    """
+    assert len(table) == len(expected)
+    for name in COLUMNS:
+        if name not in ('method', 'filename', 'event'):
+            np.testing.assert_array_equal(getattr(table, name), getattr(expected, name))
+    for name, kind in [('method', 'methods'), ('filename', 'filenames'), ('event', 'events')]:
+        values = getattr(table, kind)
+        expected_values = getattr(expected, kind)
+        assert ([values[i] for i in getattr(table, name)]
+                == [expected_values[i] for i in getattr(expected, name)])
+
+
+def get_indexed_chunks(streamfile):
+    with open(streamfile) as f:
+        chunks = f.read().split('----- Begin chunk -----')[1:]
+    return [i for i, chunk in enumerate(chunks) if 'indexed_by = none' not in chunk]
+
+
+def test_table_matches_frames(tmp_path):
+    streamfile = str(tmp_path / 'table.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=150, crystals_per_frame=3, reflections_per_crystal=2,
+                                     peaks_per_frame=2)
+    S = Stream(streamfile)
+    table = S.crystal_table
+    rows = [(i, frame, crystal) for i, frame in enumerate(S.frames) for crystal in frame.crystals]
+    assert len(table) == len(rows) == S.get_total_number_of_cystals()
+    for name in CELL_PARAMETERS:
+        np.testing.assert_array_equal(getattr(table, name), [getattr(crystal, name) for _, _, crystal in rows])
+    np.testing.assert_allclose(table.res, [crystal.res for _, _, crystal in rows], rtol=1e-6)
+    assert list(table.frame) == [i for i, _, _ in rows]
+    assert [table.methods[m] for m in table.method] == [frame.indexing for _, frame, _ in rows]
+    assert [table.filenames[f] for f in table.filename] == [frame.filename for _, frame, _ in rows]
+    assert [table.events[e] for e in table.event] == [frame.event for _, frame, _ in rows]
+    indexed_chunks = get_indexed_chunks(streamfile)
+    assert list(table.chunk) == [indexed_chunks[i] for i, _, _ in rows]
+    assert list(table.get_crystal_numbers()) == [frame.crystals.index(crystal) for _, frame, crystal in rows]
+    np.testing.assert_array_equal(table.get_cell(), [[getattr(crystal, name) for name in CELL_PARAMETERS]
+                                                     for _, _, crystal in rows])
+
+
+def test_table_select(tmp_path):
+    streamfile = str(tmp_path / 'table.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=100, reflections_per_crystal=2, peaks_per_frame=2)
+    table = Stream(streamfile, in_memory=False).crystal_table
+    method = table.methods[-1]
+    mask = table.get_method_mask([method])
+    assert list(mask) == [table.methods[m] == method for m in table.method]
+    selected = table.select(mask)
+    assert len(selected) == np.count_nonzero(mask)
+    np.testing.assert_array_equal(selected.chunk, table.chunk[mask])
+    assert set(selected.methods[m] for m in selected.method) == set([method])
+
+
+def test_table_same_in_all_modes(tmp_path):
+    streamfile = str(tmp_path / 'table.stream')
+    synthetic.write_synthetic_stream(streamfile, chunks=100, reflections_per_crystal=2, peaks_per_frame=2)
+    expected = Stream(streamfile).crystal_table
+    for settings in [{'in_memory': False}, {'in_memory': False, 'use_index': True}, {'lazy': True},
+                     {'in_memory': False, 'summary_only': True}]:
+        assert_same_table(Stream(streamfile, **settings).crystal_table, expected)